@@ -0,0 +1,597 @@
+# benchmark suite for the game systems
+# runs headless so no window opens and every benchmark gets its own fresh game
+# results are written as json so two runs can be compared between commits
+#
+# usage:
+#   python benchmarks.py                         run everything and print results
+#   python benchmarks.py --output before.json    also save the results
+#   python benchmarks.py --compare before.json   show the change against a saved run
+#   python benchmarks.py --filter targeting      only run benchmarks with this in the name
+#   python benchmarks.py --snapshot late.bbs     also time simulating from a saved game
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import numpy
+import pygame
+
+pygame.init()
+
+from src.window import Window
+from src.game import Game
+from src.prefab import Prefab
+from src.wave import Wave, WavePlan
+from src.bullet import Bullet
+from src.explosion import Explosion
+from src.defence import Defence
+from src.pathfinding import heat, Pathfinding
+from src.collision import Collision
+
+LEVELS = ["basic", "path", "maze"]
+WINDOW = None
+
+
+def make_game(level, seed=1, snapshot=None, path_search="astar"):
+    # builds a fresh game on the given level so benchmarks dont share state
+    # args: level - level name to load
+    #       seed - random seed so every run sets up the same way
+    #       snapshot - optional save file to start from instead of a new level
+    #       path_search - how paths are searched, one of Pathfinding.SearchModes
+    # returns: the new game with its menu hidden
+    global WINDOW
+    if WINDOW is None:
+        WINDOW = Window(1280, 768)
+
+    random.seed(seed)
+    heat.clear()
+
+    game = Game(WINDOW, path_search=path_search)
+    game.headless = True
+    if snapshot is not None:
+        game.load_game(snapshot)
+    else:
+        game.load_level(level)
+    game.menu.hide()
+    return game
+
+
+def make_late_wave(number=8):
+    # builds a busy game part way through a late wave
+    # args: number - which wave to start
+    # returns: the game
+    game = make_game("basic")
+    finish_paths(game)
+    game.level.money = 10 ** 6
+    game.level.lives = 10 ** 6
+
+    for i, (x, y) in enumerate([(600, 300), (700, 400), (500, 200), (800, 500), (400, 400), (900, 300)]):
+        game.select_defence(3 if i % 3 == 2 else 0)
+        game.place_defence((x, y))
+
+    game.wave = Wave(game, number)
+    for i in range(120):
+        game.update(1 / 60)
+
+    return game
+
+
+def finish_paths(game, limit=100000):
+    # runs the pathfinding until every path in the pool is done
+    # args: game - the game to update
+    #       limit - most updates to run before giving up
+    pathfinding = game.level.pathfinding
+    while limit > 0 and any(not path.done for path in pathfinding.pool):
+        pathfinding.update()
+        limit -= 1
+
+
+class GridLevel:
+    # stands in for the game, window and level around a synthetic collision grid
+    # so a real Pathfinding runs on it the same way it does on a loaded level
+
+    def __init__(self, width, height, search_mode="astar", seed=1):
+        # builds a big grid with walls every 8 columns with a few gaps plus scattered single blocks
+        # args: width, height - size in tiles
+        #       search_mode - one of Pathfinding.SearchModes
+        #       seed - random seed for the walls
+        self.window = self
+        self.resolution = (width * 32, height * 32)
+        self.collision = Collision(self, self.resolution, 32)
+        self.pathfinding = Pathfinding(self, self.collision, None, search_mode)
+
+        rng = random.Random(seed)
+        blocked = set()
+
+        for column in range(6, width - 2, 8):
+            gaps = {row for start in rng.sample(range(height - 3), 3) for row in range(start, start + 3)}
+            blocked.update(row * 1000 + column for row in range(height) if row not in gaps)
+
+        for i in range(width * height // 12):
+            column = rng.randint(0, width - 1)
+            if column % 8 not in (5, 6, 7):
+                blocked.add(rng.randint(0, height - 1) * 1000 + column)
+
+        self.collision.blocked_tiles = sorted(blocked)
+
+
+def spawn_enemies(game, count, seed=2):
+    # adds enemies spread randomly over the screen
+    # args: game - the game to add them to
+    #       count - how many enemies to add
+    rng = random.Random(seed)
+    game.wave.spawn_many("enemy_small", count)
+
+    for enemy in game.wave.enemies:
+        enemy.rect.center = (rng.randint(0, 1279), rng.randint(0, 767))
+        enemy.x, enemy.y = enemy.rect.x, enemy.rect.y
+        enemy.health = 10 ** 9
+
+
+def timed(function, repeat):
+    # times a function several times
+    # args: function - called with no arguments, may return a setup function for the next run
+    #       repeat - how many times to run it
+    # returns: dictionary of min median and mean in milliseconds
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "min_ms": min(times),
+        "median_ms": statistics.median(times),
+        "mean_ms": statistics.mean(times),
+        "runs": repeat,
+    }
+
+
+# ---------------- benchmarks ----------------
+# each benchmark sets up its own game and returns the timing result
+
+def bench_astar_complete(level, repeat, path_search="astar"):
+    # full search of the whole path pool from scratch
+    game = make_game(level, path_search=path_search)
+    pathfinding = game.level.pathfinding
+
+    def run():
+        for path in pathfinding.pool:
+            path.start_search()
+        finish_paths(game)
+
+    return timed(run, repeat)
+
+
+def bench_astar_repair(level, repeat, blocks=10):
+    # repairing the pool after a number of random tiles get blocked
+    results = []
+    for r in range(repeat):
+        game = make_game(level, seed=r + 1)
+        finish_paths(game)
+
+        collision = game.level.collision
+        pathfinding = game.level.pathfinding
+        rng = random.Random(r)
+
+        # pick tiles that are on a path but not critical so repairs are needed
+        used = list({point for path in pathfinding.pool if path.done for point in path.points if 0 <= point[0] < 1280})
+        rng.shuffle(used)
+        tiles = [p for p in used if not collision.point_blocked(*p) and not pathfinding.is_critical(p)][:blocks]
+
+        start = time.perf_counter()
+        for point in tiles:
+            collision.block_point(*point)
+        finish_paths(game)
+        results.append((time.perf_counter() - start) * 1000)
+
+    return {"min_ms": min(results), "median_ms": statistics.median(results), "mean_ms": statistics.mean(results), "runs": repeat}
+
+
+def bench_path_pool(level, repeat, count):
+    # making a whole pool of full paths in one pass, also reports how much they overlap
+    game = make_game(level)
+    pathfinding = game.level.pathfinding
+
+    def run():
+        pathfinding.pool = []
+        pathfinding.pool_changed()
+        pathfinding.precompute(count)
+
+    result = timed(run, repeat)
+    result["overlap"] = pathfinding.get_overlap()
+    return result
+
+
+def bench_partial_paths(count, repeat):
+    # enemies getting stuck all over the map over a long session
+    # then the per frame path work that has to look at every path
+    results = []
+    for r in range(repeat):
+        game = make_game("basic", seed=r + 1)
+        pathfinding = game.level.pathfinding
+        collision = game.level.collision
+        rng = random.Random(r)
+
+        free = [(x * 32, y * 32) for x in range(40) for y in range(24) if not collision.point_blocked(x * 32, y * 32)]
+        points = [rng.choice(free) for i in range(count)]
+
+        start = time.perf_counter()
+        for point in points:
+            pathfinding.get_partial_path(point)
+        for i in range(100):
+            pathfinding.update()
+            pathfinding.is_critical(points[i])
+        results.append((time.perf_counter() - start) * 1000)
+
+    return {"min_ms": min(results), "median_ms": statistics.median(results), "mean_ms": statistics.mean(results), "runs": repeat}
+
+
+def bench_path_select(count, repeat, ready=2):
+    # picking spawn paths while only a few of the pool are finished
+    # like at startup or just after lots of paths were restarted
+    game = make_game("basic")
+    pathfinding = game.level.pathfinding
+
+    for path in pathfinding.pool[ready:]:
+        path.start_search()
+
+    def run():
+        for i in range(count):
+            pathfinding.get_path()
+
+    return timed(run, repeat)
+
+
+def bench_grid_paths(width, height, repeat, search_mode, paths=3, blocks=5):
+    # full pathfinding on a big synthetic grid, to compare the search modes
+    # times making a pool from scratch, including the goal field or entrance
+    # graph it needs, then repairing it after tiles on the paths get blocked
+    searches, repairs = [], []
+
+    for r in range(repeat):
+        random.seed(r + 1)
+        level = GridLevel(width, height, search_mode)
+        pathfinding = level.pathfinding
+
+        start = time.perf_counter()
+        pathfinding.precompute(paths)
+        searches.append((time.perf_counter() - start) * 1000)
+
+        # tiles on the paths that can all be blocked without sealing the grid
+        rng = random.Random(r)
+        used = sorted({point for path in pathfinding.pool for point in path.points if 0 <= point[0] < level.resolution[0]})
+        rng.shuffle(used)
+        tiles = []
+        for point in used:
+            if len(tiles) < blocks and pathfinding.can_block_all(tiles + [point]):
+                tiles.append(point)
+
+        start = time.perf_counter()
+        with level.collision.batch():
+            for point in tiles:
+                level.collision.block_point(*point)
+        for path in pathfinding.pool:
+            if not path.done:
+                path.search(None)
+        repairs.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "min_ms": min(searches),
+        "median_ms": statistics.median(searches),
+        "mean_ms": statistics.mean(searches),
+        "runs": repeat,
+        "repair_ms": statistics.median(repairs),
+    }
+
+
+def bench_targeting(count, repeat, defences=20):
+    # batched target resolution for many defences against many enemies
+    game = make_game("basic")
+    finish_paths(game)
+    spawn_enemies(game, count)
+
+    rng = random.Random(3)
+    for i in range(defences):
+        defence = Defence(game, "defence_bluechonk", rng.randint(2, 37) * 32, rng.randint(3, 20) * 32)
+        defence.attack_range = 200
+        game.defences.add(defence)
+
+    def run():
+        for defence in game.defences:
+            defence.target = None
+        game.targeting.resolve(game.defences, game.wave.enemies)
+
+    return timed(run, repeat)
+
+
+def bench_bullets(count, repeat, bullets=500):
+    # one projectile update for many bullets against many enemies
+    game = make_game("basic")
+    finish_paths(game)
+    spawn_enemies(game, count)
+    rng = random.Random(4)
+
+    def run():
+        game.projectiles.clear()
+        game.bullets.empty()
+        for i in range(bullets):
+            origin = (rng.randint(64, 1200), rng.randint(64, 700))
+            target = (rng.randint(64, 1200), rng.randint(64, 700))
+            if origin != target:
+                game.bullets.add(Bullet(game, origin, target))
+        game.projectiles.update(1 / 60)
+
+    return timed(run, repeat)
+
+
+def bench_explosions(count, repeat, blasts=100):
+    # resolving many queued explosions against many enemies
+    game = make_game("basic")
+    finish_paths(game)
+    spawn_enemies(game, count)
+    rng = random.Random(5)
+
+    def run():
+        for i in range(blasts):
+            Explosion(game, (rng.randint(0, 1279), rng.randint(0, 767)), 70, 1)
+        game.aoe.resolve()
+
+    return timed(run, repeat)
+
+
+def bench_wave_spawn(number, repeat):
+    # planning a wave and spawning every enemy in it
+    game = make_game("basic")
+    finish_paths(game)
+
+    def run():
+        game.wave = Wave(game, number)
+        for enemy_type, count in game.wave.plan.counts.items():
+            game.wave.spawn_many(enemy_type, count)
+
+    return timed(run, repeat)
+
+
+def bench_rect_blocked(size, repeat, queries=1000):
+    # placement style rectangle checks over a level full of walls
+    game = make_game("maze")
+    collision = game.level.collision
+    rng = random.Random(7)
+    rects = [(rng.randint(0, 39) * 32, rng.randint(0, 23) * 32) for i in range(queries)]
+
+    def run():
+        for x, y in rects:
+            collision.rect_blocked(x, y, size - 2, size - 2)
+
+    return timed(run, repeat)
+
+
+def bench_enemy_state(count, repeat):
+    # reading and writing the fields enemies use every frame
+    # also records how much memory spawning the enemies took
+    game = make_game("basic")
+    finish_paths(game)
+    game.wave.spawn_many("enemy_small", 1)
+    game.wave.enemies.empty()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    game.wave.spawn_many("enemy_small", count)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    enemies = list(game.wave.enemies)
+
+    def run():
+        for i in range(10):
+            for enemy in enemies:
+                enemy.x += enemy.effective_speed * 0.001
+                enemy.y += enemy.speed * 0.001
+                enemy.health -= enemy.max_health * 0.0
+
+    result = timed(run, repeat)
+    result["kib_per_1000"] = used / 1024 / count * 1000
+    return result
+
+
+def bench_prefab_load(repeat):
+    # loading every prefab file from disk with an empty cache
+    names = [f[:-len(".prefab")] for f in os.listdir("prefabs") if f.endswith(".prefab")]
+    make_game("basic")
+
+    def run():
+        Prefab.clear_cache()
+        for name in names:
+            Prefab.load_config(name)
+
+    return timed(run, repeat)
+
+
+def bench_draw(count, repeat, defences=40):
+    # drawing a full frame with many enemies bullets and turning defences
+    game = make_game("basic")
+    finish_paths(game)
+    spawn_enemies(game, count)
+    rng = random.Random(6)
+
+    for i in range(defences):
+        defence = Defence(game, "defence_bluechonk", rng.randint(2, 37) * 32, rng.randint(3, 20) * 32)
+        defence.image = defence.images[rng.randrange(len(defence.images))]
+        game.defences.add(defence)
+
+    for i in range(count):
+        origin = (rng.randint(64, 1200), rng.randint(64, 700))
+        game.bullets.add(Bullet(game, origin, (origin[0] + 1, origin[1] + 1)))
+
+    return timed(game.draw, repeat)
+
+
+def bench_headless_waves(level, repeat, waves=3):
+    # a full simulation of the first few waves at a fixed 60 updates per second
+    results = []
+    frames = []
+    for r in range(repeat):
+        game = make_game(level, seed=r + 1)
+        finish_paths(game)
+        game.level.money = 10 ** 6
+        game.level.lives = 10 ** 6
+
+        # a fixed set of defences so enemies actually die
+        for i, (x, y) in enumerate([(600, 300), (700, 400), (500, 200), (800, 500), (400, 400), (900, 300)]):
+            game.select_defence(3 if i % 3 == 2 else 0)
+            game.place_defence((x, y))
+
+        count = 0
+        start = time.perf_counter()
+        while game.wave.number <= waves and count < 60 * 600:
+            game.update(1 / 60)
+            count += 1
+        results.append((time.perf_counter() - start) * 1000)
+        frames.append(count)
+
+    return {"min_ms": min(results), "median_ms": statistics.median(results), "mean_ms": statistics.mean(results), "runs": repeat, "frames": frames[0]}
+
+
+def bench_snapshot(repeat, filename="bench_snapshot.bbs"):
+    # saving and loading a late wave game
+    game = make_late_wave()
+    save = timed(lambda: game.save_game(filename), repeat)
+    restored = make_game("basic")
+    load = timed(lambda: restored.load_game(filename), repeat)
+
+    save["load_median_ms"] = load["median_ms"]
+    save["bytes"] = os.path.getsize(filename)
+    os.remove(filename)
+    return save
+
+
+def bench_from_snapshot(filename, repeat, frames=600):
+    # simulating from a saved game, eg. a late wave, instead of playing up to it
+    def run():
+        game = make_game("basic", snapshot=filename)
+        start = time.perf_counter()
+        for i in range(frames):
+            game.update(1 / 60)
+        return (time.perf_counter() - start) * 1000
+
+    results = [run() for i in range(repeat)]
+    return {"min_ms": min(results), "median_ms": statistics.median(results), "mean_ms": statistics.mean(results), "runs": repeat, "frames": frames}
+
+
+def get_benchmarks(repeat, snapshot=None):
+    # lists every benchmark by name
+    # args: repeat - how many runs each benchmark should time
+    #       snapshot - optional save file to also benchmark simulating from
+    # returns: list of (name, function) pairs
+    benchmarks = []
+
+    if snapshot is not None:
+        benchmarks.append(("from_snapshot[" + os.path.basename(snapshot) + "]", lambda: bench_from_snapshot(snapshot, repeat)))
+
+    for level in LEVELS:
+        benchmarks.append(("astar_complete[" + level + "]", lambda level=level: bench_astar_complete(level, repeat)))
+        benchmarks.append(("jps_complete[" + level + "]", lambda level=level: bench_astar_complete(level, repeat, "jps")))
+        benchmarks.append(("astar_repair[" + level + "]", lambda level=level: bench_astar_repair(level, repeat)))
+        benchmarks.append(("headless_waves[" + level + "]", lambda level=level: bench_headless_waves(level, max(1, repeat // 5))))
+
+        for count in [10, 30, 60]:
+            benchmarks.append(("path_pool[" + level + "," + str(count) + "]", lambda level=level, count=count: bench_path_pool(level, repeat, count)))
+
+    for count in [10, 100, 500, 2000]:
+        benchmarks.append(("targeting[" + str(count) + "]", lambda count=count: bench_targeting(count, repeat)))
+        benchmarks.append(("bullets[" + str(count) + "]", lambda count=count: bench_bullets(count, repeat)))
+        benchmarks.append(("explosions[" + str(count) + "]", lambda count=count: bench_explosions(count, repeat)))
+        benchmarks.append(("draw[" + str(count) + "]", lambda count=count: bench_draw(count, repeat)))
+
+    for number in [5, 10]:
+        benchmarks.append(("wave_spawn[" + str(number) + "]", lambda number=number: bench_wave_spawn(number, repeat)))
+
+    for size in [64, 160]:
+        benchmarks.append(("rect_blocked[" + str(size) + "]", lambda size=size: bench_rect_blocked(size, repeat)))
+
+    for width, height in [(160, 96), (320, 192)]:
+        size = str(width) + "x" + str(height)
+        for search_mode in ["astar", "hierarchical"]:
+            benchmarks.append(("grid_paths[" + size + "," + search_mode + "]", lambda width=width, height=height, search_mode=search_mode: bench_grid_paths(width, height, repeat, search_mode)))
+
+    benchmarks.append(("path_select[1000]", lambda: bench_path_select(1000, repeat)))
+    benchmarks.append(("partial_paths[1000]", lambda: bench_partial_paths(1000, repeat)))
+    benchmarks.append(("enemy_state[1000]", lambda: bench_enemy_state(1000, repeat)))
+    benchmarks.append(("prefab_load", lambda: bench_prefab_load(repeat)))
+    benchmarks.append(("snapshot_save_load", lambda: bench_snapshot(repeat)))
+
+    return benchmarks
+
+
+def get_meta():
+    # records what the benchmarks ran on so saved results can be told apart
+    # returns: dictionary of version and commit info
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "numpy": numpy.__version__,
+    }
+
+
+def compare(results, filename):
+    # prints how each benchmark changed against a saved run
+    # args: results - results from this run
+    #       filename - json file saved by an earlier run
+    with open(filename, "r") as file:
+        old = json.load(file)["results"]
+
+    print("\n{:<28} {:>12} {:>12} {:>9}".format("benchmark", "before ms", "after ms", "change"))
+    for name, result in results.items():
+        if name not in old:
+            continue
+        before = old[name]["median_ms"]
+        after = result["median_ms"]
+        change = (after - before) / before * 100 if before > 0 else 0
+        print("{:<28} {:>12.3f} {:>12.3f} {:>8.1f}%".format(name, before, after, change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bow Busters benchmarks")
+    parser.add_argument("--output", help="save results to this json file")
+    parser.add_argument("--compare", help="compare against results saved earlier")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--snapshot", help="also time 600 updates starting from this save file")
+    args = parser.parse_args()
+
+    results = { }
+    for name, function in get_benchmarks(args.repeat, args.snapshot):
+        if args.filter not in name:
+            continue
+
+        result = function()
+        results[name] = result
+        print("{:<28} median {:>10.3f} ms   min {:>10.3f} ms".format(name, result["median_ms"], result["min_ms"]) + ("   {:.1f} KiB per 1000".format(result["kib_per_1000"]) if "kib_per_1000" in result else "") + ("   overlap {:.2f}".format(result["overlap"]) if "overlap" in result else "") + ("   repair {:.1f} ms".format(result["repair_ms"]) if "repair_ms" in result else ""))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"meta": get_meta(), "results": results}, file, indent=4)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
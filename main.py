@@ -1,18 +1,33 @@
+import argparse
 import pygame
 from src.game import Game
 from src.window import Window
+from src.replay import Recorder
 
-#init pygame
-pygame.init()
+#guarded so background path processes can import this file without starting a game
+if __name__ == "__main__":
+    #optional session recording for replays
+    parser = argparse.ArgumentParser(description="Bow Busters")
+    parser.add_argument("--record", help="record this session to a log that src.replay can play back")
+    parser.add_argument("--path-workers", choices=["thread", "process"], help="search enemy paths in the background instead of the main loop")
+    parser.add_argument("--path-search", choices=["astar", "hierarchical", "jps"], default="astar", help="how enemy paths are searched, hierarchical scales to bigger maps, jps skips open uncrowded floor but is currently slower than astar on the shipped levels")
+    args = parser.parse_args()
 
-#create window
-window = Window(1280, 768)
-window.set_title("Bow Busters")
-window.set_background(148, 168, 176)
+    #init pygame
+    pygame.init()
 
-#create game instance
-game = Game(window)
-game.run()
+    #create window
+    window = Window(1280, 768)
+    window.set_title("Bow Busters")
+    window.set_background(148, 168, 176)
 
-#quit pygame
-pygame.quit()
+    #create game instance
+    recorder = Recorder(args.record, window.resolution) if args.record else None
+    game = Game(window, recorder, args.path_workers, args.path_search)
+    game.run()
+
+    if recorder is not None:
+        recorder.close()
+
+    #quit pygame
+    pygame.quit()
@@ -82,10 +82,33 @@ class AbilityManager:
                 # Apply the slow modifier to the enemy's Max-Heap
                 enemy.apply_speed_modifier(multiplier, duration, source_id)
 
+    def _choose_tiles(self, candidates, limit):
+        """
+        Picks tiles to block together without cutting enemies off from the goal.
+        Each candidate is checked along with the tiles already picked, as nothing
+        is blocked (or repaired) until they are all placed in one batch.
+        Tiles already blocked are skipped so ending the effect doesn't free them.
+        """
+        level = self.game.level
+        tiles = []
+
+        for point in candidates:
+            if point in tiles or level.collision.point_blocked(*point):
+                continue
+
+            if level.pathfinding.can_block_all(tiles + [point]):
+                tiles.append(point)
+
+            if len(tiles) >= limit:
+                break
+
+        return tiles
+
     def use(self, name):
         """ 
         Uses an ability. 
         """
+        self.game.record("use_ability", name)
         if not self.is_ready(name):
             return False
 
@@ -102,25 +125,20 @@ class AbilityManager:
             # randomly select nahi karay ga
             top_tiles = heat.most_common(self.spike_count * 2)  # Get more candidates to filter
 
-            for (px, py), _ in top_tiles:
-                #Skip critical path tiles to avoid blocking enemies completely,this will jeep the game fairr,not supporting only the protectors
-                if level.pathfinding.is_critical((px, py)):
-                    continue
-                
-                # Add prefab
-                # visulaization is importanttt-is kay bagair humain nazar nahi ae ga but still blocking hogi
-                p = Prefab("crystal_spike", px, py)
-                level.prefabs.add(p)
-                prefabs.append(p)
-                tiles.append((px, py))
+            #Skip tiles that would block enemies completely,this will jeep the game fairr,not supporting only the protectors
+            # Stop once we have enough spikes, over-blocking nahi hogi
+            tiles = self._choose_tiles([point for point, _ in top_tiles], self.spike_count)
 
-                # Block point
-                collision.block_point(px, py)
-                
-                # Stop once we have enough spikes
-                # Over-blocking nahi hogi
-                if len(tiles) >= self.spike_count:
-                    break
+            with collision.batch():
+                for (px, py) in tiles:
+                    # Add prefab
+                    # visulaization is importanttt-is kay bagair humain nazar nahi ae ga but still blocking hogi
+                    p = Prefab("crystal_spike", px, py)
+                    level.prefabs.add(p)
+                    prefabs.append(p)
+
+                    # Block point
+                    collision.block_point(px, py)
 
             # this is a MEMORY- it remembers kay kon si temp block hen kon say visuals bad may remove karnay hen
             self.active.append({
@@ -140,22 +158,24 @@ class AbilityManager:
             tiles = []
 
             # random tile placement for simplicity
+            candidates = []
             for i in range(10):
                 px = random.randint(0, level.collision.width - 1) * level.collision.tile_size
                 py = random.randint(0, level.collision.height - 1) * level.collision.tile_size
-                
-                # Check for critical path
-                if level.pathfinding.is_critical((px, py)):
-                    continue
-
-                # Add prefab
-                p = Prefab("ability_hot_zone", px, py)
-                level.prefabs.add(p)
-                prefabs.append(p)
-                tiles.append((px, py))
+                candidates.append((px, py))
 
-                # Block point
-                collision.block_point(px, py)
+            # Check for critical path
+            tiles = self._choose_tiles(candidates, len(candidates))
+
+            with collision.batch():
+                for (px, py) in tiles:
+                    # Add prefab
+                    p = Prefab("ability_hot_zone", px, py)
+                    level.prefabs.add(p)
+                    prefabs.append(p)
+
+                    # Block point
+                    collision.block_point(px, py)
 
 
             self.active.append({
@@ -196,11 +216,12 @@ class AbilityManager:
 
         # For blocking effects (spikes, hot_zone) — unblock tiles
         if effect["name"] in ("crystal_spike", "hot_zone"):
-            for (px, py) in effect["tiles"]:
-                try:
-                    collision.unblock_point(px, py)
-                except Exception:
-                    pass
+            with collision.batch():
+                for (px, py) in effect["tiles"]:
+                    try:
+                        collision.unblock_point(px, py)
+                    except Exception:
+                        pass
 
         # Remove prefabs that were placed for the effect
         for p in effect.get("prefabs", []):
@@ -0,0 +1,83 @@
+import pygame
+
+class Atlas:
+    # packs lots of small sprites onto a few big page surfaces
+    # each sprite becomes a subsurface of a page so all the drawing code keeps working
+    # but sprite groups blit from a handful of surfaces instead of hundreds
+    # pages are filled shelf by shelf, a shelf is a row as tall as its first sprite
+
+    def __init__(self, alpha, page_size=1024, padding=1):
+        # args: alpha - true for sprites with transparency, false for solid images
+        #       page_size - width and height of each page in pixels
+        #       padding - empty pixels left between sprites
+        self.alpha = alpha
+        self.page_size = page_size
+        self.padding = padding
+        self.pages = []
+        # per page list of shelves, each shelf is [y, height, next free x]
+        self.shelves = []
+        # per page y where the next shelf would start
+        self.page_heights = []
+        self.sprites = 0
+
+    def new_page(self):
+        # adds an empty page to pack into
+        page = pygame.Surface((self.page_size, self.page_size), pygame.SRCALPHA if self.alpha else 0)
+        page = page.convert_alpha() if self.alpha else page.convert()
+        page.fill((0, 0, 0, 0) if self.alpha else (0, 0, 0))
+
+        self.pages.append(page)
+        self.shelves.append([])
+        self.page_heights.append(0)
+
+    def find_space(self, width, height):
+        # finds where a sprite of this size fits, starting a shelf or page if needed
+        # args: width - sprite width including padding
+        #       height - sprite height including padding
+        # returns: tuple of page index, x and y
+        for index in range(len(self.pages)):
+            for shelf in self.shelves[index]:
+                if height <= shelf[1] and shelf[2] + width <= self.page_size:
+                    x = shelf[2]
+                    shelf[2] += width
+                    return index, x, shelf[0]
+
+            if self.page_heights[index] + height <= self.page_size:
+                y = self.page_heights[index]
+                self.shelves[index].append([y, height, width])
+                self.page_heights[index] += height
+                return index, 0, y
+
+        self.new_page()
+        return self.find_space(width, height)
+
+    def pack(self, surface):
+        # copies a sprite onto a page
+        # sprites bigger than half a page arent worth packing and are given back as they are
+        # args: surface - the loaded sprite
+        # returns: a subsurface of a page with the same pixels
+        width, height = surface.get_size()
+        if width > self.page_size // 2 or height > self.page_size // 2:
+            return surface
+
+        index, x, y = self.find_space(width + self.padding, height + self.padding)
+        page = self.pages[index]
+
+        # max blending onto the cleared page copies pixels exactly, a normal
+        # alpha blit would darken the see through edges
+        page.blit(surface, (x, y), special_flags=pygame.BLEND_RGBA_MAX if self.alpha else 0)
+        self.sprites += 1
+
+        return page.subsurface((x, y, width, height))
+
+    def pack_all(self, surfaces):
+        # packs a list of sprites, tallest first so shelves waste less space
+        # args: surfaces - list of loaded sprites like rotation or animation frames
+        # returns: list of packed sprites in the same order as given
+        order = sorted(range(len(surfaces)), key=lambda i: -surfaces[i].get_height())
+        packed = [None] * len(surfaces)
+
+        for i in order:
+            packed[i] = self.pack(surfaces[i])
+
+        return packed
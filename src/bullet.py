@@ -1,12 +1,18 @@
 import math
 import random
 import pygame
-from src.prefab import Prefab
+from src.prefab import Prefab, Shared
 
 
 class Bullet(Prefab):
     # represents a single projectile fired from a turret
     # flies in a straight line until it hits an enemy or obstacle
+    # movement and hits are handled for all bullets at once by ProjectileSystem
+
+    __slots__ = ("game", "xSpeed", "ySpeed", "life")
+
+    speed = Shared()
+    damage = Shared()
 
     def __init__(self, game, origin, target):
         # creates a new bullet that flies from origin toward target
@@ -27,7 +33,6 @@ class Bullet(Prefab):
         self.ySpeed = (dy / magnitude) * self.speed * random.randint(200, 500)
         # calculate how long bullet should live based on distance
         self.life = magnitude / math.sqrt(self.xSpeed ** 2 + self.ySpeed ** 2)
-        self.current_life = 0
 
         # rotate the bullet sprite to point in the direction its traveling
         angle = math.degrees(math.atan2(-dy, dx))
@@ -35,30 +40,4 @@ class Bullet(Prefab):
         self.rect = self.image.get_rect()
         self.rect.center = origin
 
-    def update(self, delta):
-        # moves the bullet and checks for collisions every frame
-        # args: delta - time in seconds since last frame for smooth movement
-        self.rect.x += self.xSpeed * delta
-        self.rect.y += self.ySpeed * delta
-
-        # check if bullet has existed longer than its lifetime
-        self.current_life += delta
-        if self.life < self.current_life:
-            self.kill()
-
-        # check if bullet hit a wall or obstacle after a tiny delay
-        if self.current_life > 0.03 and self.game.level.collision.point_blocked(self.rect.centerx, self.rect.centery):
-            self.kill()
-
-        # check for collisions with enemies using distance calculation
-        for enemy in self.game.wave.enemies:
-            # calculate distance between bullet and enemy center
-            dx = enemy.rect.centerx - self.rect.centerx
-            dy = enemy.rect.centery - self.rect.centery
-            sqrMagnitude = (dx ** 2) + (dy ** 2)
-
-            # if distance is less than enemy radius we hit it
-            if sqrMagnitude < (enemy.rect.width / 2) ** 2:
-                enemy.take_damage(self.damage)
-                self.kill()
-                return
+        game.projectiles.add(self, origin, (self.xSpeed, self.ySpeed), self.life, self.damage)
@@ -1,5 +1,8 @@
 import pygame
+import math
 import random
+import numpy as np
+from contextlib import contextmanager
 
 class Collision:
     # manages collision detection using a grid of tiles
@@ -17,6 +20,28 @@ class Collision:
         self.height = resolution[1] // tile_size
         self.blocked_tiles = []
         self.overlay = None
+        # goes up by one every time a tile is blocked or unblocked
+        # lets other systems cache things built from the grid
+        self.version = 0
+        # (version, tile index) for every change in order, a batch of changes shares one version
+        # changes_base is the version just before the oldest entry
+        self.changes = []
+        self.changes_base = 0
+        # open batch() blocks and the points blocked inside them waiting for one path repair
+        self.batch_depth = 0
+        self.dirty = []
+        self.changed = False
+        self.grid = None
+        self.grid_version = -1
+        # the grid as nested lists [row][column], faster for looking up one tile at a time
+        self.rows = None
+        self.rows_version = -1
+        # summed area table of the grid, table[r, c] is how many tiles are
+        # blocked above and left of row r column c, so any rectangle is four lookups
+        self.table = None
+        self.table_version = -1
+        # blocked tile indices that fall outside the grid, kept with the grid
+        self.outside = set()
 
     def point_to_index(self, x, y):
         # converts x y coordinates into a single unique index number
@@ -33,17 +58,48 @@ class Collision:
         # returns: true if blocked false if clear
         return self.point_to_index(x, y) in self.blocked_tiles
 
+    @contextmanager
+    def batch(self):
+        # groups block and unblock calls into one change
+        # the version goes up once and pathfinding repairs every blocked point in one pass
+        # batches can be nested, only the outermost one finishes the change
+        # usage: with collision.batch(): ...
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if self.batch_depth == 0:
+                self.finish_change()
+
+    def finish_change(self):
+        # bumps the version and hands the blocked points to pathfinding
+        if not self.changed:
+            return
+
+        dirty = self.dirty
+        self.dirty = []
+        self.changed = False
+        self.version += 1
+
+        if len(dirty) > 0:
+            self.level.pathfinding.repair_many(dirty)
+
     def block_point(self, x, y):
         # marks a specific coordinate as blocked
-        # triggers path repair so enemies can find new routes
+        # triggers path repair so enemies can find new routes, straight away
+        # or when the surrounding batch finishes
         # args: x - horizontal position to block
         #       y - vertical position to block
         index = self.point_to_index(x, y)
 
         if index not in self.blocked_tiles:
             self.blocked_tiles.append(index)
-            self.overlay = None
-            self.level.pathfinding.repair((x - (x % self.tile_size), y - (y % self.tile_size)))
+            self.log_change(index)
+            self.dirty.append((x - (x % self.tile_size), y - (y % self.tile_size)))
+
+            if self.batch_depth == 0:
+                self.finish_change()
             
     def unblock_point(self, x, y):
         # marks a specific coordinate as no longer blocked
@@ -54,8 +110,177 @@ class Collision:
 
         if index in self.blocked_tiles:
             self.blocked_tiles.remove(index)
-            self.overlay = None
-    
+            self.log_change(index)
+
+            if self.batch_depth == 0:
+                self.finish_change()
+
+    def log_change(self, index):
+        # remembers which tile changed under the version the change will finish as
+        # the log is cleared once it gets long, readers that fell behind rebuild fully
+        # args: index - tile index that was blocked or unblocked
+        if len(self.changes) >= 4096 and not self.changed:
+            self.changes_base = self.version
+            self.changes = []
+
+        self.changes.append((self.version + 1, index))
+        self.changed = True
+        self.overlay = None
+
+    def changes_since(self, version):
+        # gets the tiles that changed after a version
+        # args: version - the grid version the caller last saw
+        # returns: list of tile indices, or none if the log no longer covers it
+        if version < self.changes_base:
+            return None
+
+        return [index for changed, index in self.changes if version < changed <= self.version]
+
+    def get_grid(self):
+        # gets the blocked tiles as a 2d numpy array indexed [row, column]
+        # patched from the change log when possible, rebuilt when not
+        # returns: boolean array of shape (height, width), true where blocked
+        if self.changed:
+            # asked part way through a batch, build it fresh but dont keep it
+            return self.build_grid()
+
+        if self.grid_version != self.version:
+            changes = None if self.grid is None else self.changes_since(self.grid_version)
+
+            if changes is None:
+                self.grid = self.build_grid()
+                self.outside = self.get_outside()
+            else:
+                for index in set(changes):
+                    yIndex, xIndex = divmod(index, 1000)
+                    if 0 <= xIndex < self.width and 0 <= yIndex < self.height:
+                        self.grid[yIndex, xIndex] = index in self.blocked_tiles
+                    elif index in self.blocked_tiles:
+                        self.outside.add(index)
+                    else:
+                        self.outside.discard(index)
+
+            self.grid_version = self.version
+
+        return self.grid
+
+    def get_rows(self):
+        # gets the blocked grid as nested lists for code that checks tiles one by one
+        # patched from the change log like the array, the lists are changed in place
+        # returns: list of rows, each a list of bools
+        if self.changed:
+            return self.build_grid().tolist()
+
+        if self.rows_version != self.version:
+            changes = None if self.rows is None else self.changes_since(self.rows_version)
+            grid = self.get_grid()
+
+            if changes is None:
+                self.rows = grid.tolist()
+            else:
+                for index in set(changes):
+                    yIndex, xIndex = divmod(index, 1000)
+                    if 0 <= xIndex < self.width and 0 <= yIndex < self.height:
+                        self.rows[yIndex][xIndex] = index in self.blocked_tiles
+
+            self.rows_version = self.version
+
+        return self.rows
+
+    def build_grid(self):
+        # makes the blocked tile array from scratch
+        # returns: boolean array of shape (height, width), true where blocked
+        grid = np.zeros((self.height, self.width), dtype=bool)
+
+        for index in self.blocked_tiles:
+            yIndex, xIndex = divmod(index, 1000)
+            if 0 <= xIndex < self.width and 0 <= yIndex < self.height:
+                grid[yIndex, xIndex] = True
+
+        return grid
+
+    def get_table(self):
+        # gets the summed area table for the grid
+        # only rows from the highest changed row down are summed again
+        # returns: int array of shape (height + 1, width + 1)
+        grid = self.get_grid()
+
+        if self.changed:
+            return self.build_table(grid)
+
+        if self.table_version != self.version:
+            changes = None if self.table is None else self.changes_since(self.table_version)
+
+            if changes is None:
+                self.table = self.build_table(grid)
+            else:
+                rows = [index // 1000 for index in changes if 0 <= index // 1000 < self.height]
+                if len(rows) > 0:
+                    row = min(rows)
+                    self.table[row + 1:, 1:] = self.table[row, 1:] + np.cumsum(np.cumsum(grid[row:], axis=1), axis=0)
+
+            self.table_version = self.version
+
+        return self.table
+
+    def get_outside(self):
+        # finds blocked tiles that are off the grid, walls can hang over the edges
+        # returns: set of tile indices
+        outside = set()
+        for index in self.blocked_tiles:
+            yIndex, xIndex = divmod(index, 1000)
+            if not (0 <= xIndex < self.width and 0 <= yIndex < self.height):
+                outside.add(index)
+
+        return outside
+
+    def build_table(self, grid):
+        # sums the grid into a summed area table from scratch
+        # args: grid - boolean array from get_grid
+        # returns: int array of shape (height + 1, width + 1)
+        table = np.zeros((self.height + 1, self.width + 1), dtype=np.int32)
+        table[1:, 1:] = np.cumsum(np.cumsum(grid, axis=0), axis=1)
+        return table
+
+    def count_blocked(self, x, y, width, height):
+        # counts the blocked tiles a rectangle touches
+        # tiles on the grid come from the summed area table in four lookups
+        # any part hanging off the grid is checked tile by tile
+        # args: x - top left corner horizontal position
+        #       y - top left corner vertical position
+        #       width - how wide the rectangle is
+        #       height - how tall the rectangle is
+        # returns: number of blocked tiles in the area
+        columns = range(x - x % self.tile_size, x + width, self.tile_size)
+        rows = range(y - y % self.tile_size, y + height, self.tile_size)
+        if len(columns) == 0 or len(rows) == 0:
+            return 0
+
+        # part way through a batch the cached tables are behind so count directly
+        if self.changed:
+            return sum(self.point_blocked(xPos, yPos) for xPos in columns for yPos in rows)
+
+        left = columns[0] // self.tile_size
+        top = rows[0] // self.tile_size
+        right = left + len(columns)
+        bottom = top + len(rows)
+
+        total = 0
+        table = self.get_table()
+        inner_left, inner_right = max(left, 0), min(right, self.width)
+        inner_top, inner_bottom = max(top, 0), min(bottom, self.height)
+
+        if inner_left < inner_right and inner_top < inner_bottom:
+            total = int(table[inner_bottom, inner_right] - table[inner_top, inner_right] - table[inner_bottom, inner_left] + table[inner_top, inner_left])
+
+        if len(self.outside) > 0 and (left < 0 or top < 0 or right > self.width or bottom > self.height):
+            for xPos in columns:
+                for yPos in rows:
+                    if not (0 <= xPos // self.tile_size < self.width and 0 <= yPos // self.tile_size < self.height) and self.point_to_index(xPos, yPos) in self.outside:
+                        total += 1
+
+        return total
+
     def rect_blocked(self, x, y, width, height):
         # checks if any part of a rectangular area is blocked
         # used for checking if turrets can be placed in a spot
@@ -64,16 +289,47 @@ class Collision:
         #       width - how wide the rectangle is
         #       height - how tall the rectangle is
         # returns: true if any tile in the area is blocked false if all clear
-        xOffset = x % self.tile_size
-        yOffset = y % self.tile_size
+        return self.count_blocked(x, y, width, height) > 0
+
+    def line_clear(self, a, b):
+        # checks if a tile sized box can slide in a straight line without touching anything blocked
+        # used to skip path points when enemies can walk straight past them
+        # the line is cut wherever the box crosses a tile edge and the middle of
+        # each piece is checked against the up to 4 tiles the box covers there
+        # args: a - top left of the box at the start in pixels
+        #       b - top left of the box at the end in pixels
+        # returns: true if no blocked tile is touched
+        x, y = a[0] / self.tile_size, a[1] / self.tile_size
+        dx, dy = b[0] / self.tile_size - x, b[1] / self.tile_size - y
+
+        cuts = {0.0, 1.0}
+        for start, delta in ((x, dx), (y, dy)):
+            if delta != 0:
+                low, high = sorted((start, start + delta))
+                for edge in range(math.floor(low) + 1, math.ceil(high)):
+                    cuts.add((edge - start) / delta)
 
-        for xPos in range(x - xOffset, x + width, self.tile_size):
-            for yPos in range(y - yOffset, y + height, self.tile_size):
-                
-                if self.point_blocked(xPos, yPos):
-                    return True
+        rows = self.get_rows()
+        outside = self.outside
+        width, height = self.width, self.height
 
-        return False
+        def blocked(column, row):
+            if 0 <= column < width and 0 <= row < height:
+                return rows[row][column]
+            return row * 1000 + column in outside
+
+        cuts = sorted(cuts)
+        for t0, t1 in zip(cuts, cuts[1:]):
+            middle = (t0 + t1) / 2
+            px, py = x + dx * middle, y + dy * middle
+            left, top = math.floor(px), math.floor(py)
+            right = left + 1 if px > left else left
+            bottom = top + 1 if py > top else top
+
+            if blocked(left, top) or blocked(right, top) or blocked(left, bottom) or blocked(right, bottom):
+                return False
+
+        return True
 
     def block_rect(self, x, y, width, height):
         # marks an entire rectangular area as blocked
@@ -85,9 +341,10 @@ class Collision:
         xOffset = x % self.tile_size
         yOffset = y % self.tile_size
 
-        for xPos in range(x - xOffset, x + width - 2, self.tile_size):
-            for yPos in range(y - yOffset, y + height - 2, self.tile_size):
-                self.block_point(xPos, yPos)
+        with self.batch():
+            for xPos in range(x - xOffset, x + width - 2, self.tile_size):
+                for yPos in range(y - yOffset, y + height - 2, self.tile_size):
+                    self.block_point(xPos, yPos)
 
     def unblock_rect(self, x, y, width, height):
         # marks an entire rectangular area as no longer blocked
@@ -99,10 +356,10 @@ class Collision:
         xOffset = x % self.tile_size
         yOffset = y % self.tile_size
 
-        for xPos in range(x - xOffset, x + width, self.tile_size):
-            for yPos in range(y - yOffset, y + height, self.tile_size):
-                
-                self.unblock_point(xPos, yPos)
+        with self.batch():
+            for xPos in range(x - xOffset, x + width, self.tile_size):
+                for yPos in range(y - yOffset, y + height, self.tile_size):
+                    self.unblock_point(xPos, yPos)
 
     
 
@@ -110,3 +367,21 @@ class Collision:
     
 
     
+
+    def get_overlay(self):
+        # gets a see through surface with every blocked tile shaded in
+        # kept in self.overlay which block_point and unblock_point clear
+        # returns: a screen sized surface
+        if self.overlay is None:
+            grid = self.get_grid()
+
+            # one pixel per tile then scaled up, surfarray wants [x, y]
+            small = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+            small.fill((30, 30, 40, 0))
+            alpha = pygame.surfarray.pixels_alpha(small)
+            alpha[:] = grid.T * 110
+            del alpha
+
+            self.overlay = pygame.transform.scale(small, (self.width * self.tile_size, self.height * self.tile_size))
+
+        return self.overlay
@@ -0,0 +1,112 @@
+import pygame
+import numpy as np
+from src.pathfinding import heat
+
+class DebugOverlay:
+    # draws the heat map, blocked tiles, path usage and flow direction over the level
+    # each layer is a cached surface only rebuilt when its version changes
+    # pixels are written in bulk with surfarray one pixel per tile then scaled up
+
+    def __init__(self, game):
+        # args: game - reference to the main game object
+        self.game = game
+        self.heat_surface = None
+        self.heat_version = None
+        self.path_surface = None
+        self.path_state = None
+
+    def get_tile_surface(self, colours, alpha):
+        # turns per tile colours into a screen sized see through surface
+        # args: colours - uint8 array of shape (height, width, 3)
+        #       alpha - uint8 array of shape (height, width)
+        # returns: the scaled up surface
+        collision = self.game.level.collision
+        small = pygame.Surface((collision.width, collision.height), pygame.SRCALPHA)
+
+        pixels = pygame.surfarray.pixels3d(small)
+        pixels[:] = colours.transpose(1, 0, 2)
+        del pixels
+
+        pixels = pygame.surfarray.pixels_alpha(small)
+        pixels[:] = alpha.T
+        del pixels
+
+        return pygame.transform.scale(small, (collision.width * collision.tile_size, collision.height * collision.tile_size))
+
+    def get_heat_surface(self):
+        # gets the heat layer, yellow for a few steps up to red for the busiest tiles
+        # shades follow the heat buckets so it is only rebuilt when a tile changes bucket
+        # returns: a screen sized surface
+        collision = self.game.level.collision
+        key = (heat.coarse_version, id(collision))
+
+        if key != self.heat_version:
+            counts = np.zeros((collision.height, collision.width), dtype=np.float32)
+
+            for (x, y), count in heat.items():
+                column, row = x // collision.tile_size, y // collision.tile_size
+                if 0 <= column < collision.width and 0 <= row < collision.height:
+                    counts[row, column] = heat.bucket(count)
+
+            level = counts / max(counts.max(), 1)
+            colours = np.zeros(counts.shape + (3,), dtype=np.uint8)
+            colours[..., 0] = 255
+            colours[..., 1] = (220 * (1 - level)).astype(np.uint8)
+
+            alpha = np.where(counts > 0, 40 + level * 120, 0).astype(np.uint8)
+
+            self.heat_surface = self.get_tile_surface(colours, alpha)
+            self.heat_version = key
+
+        return self.heat_surface
+
+    def get_path_surface(self):
+        # gets the path layer, blue where finished paths go, darker when more share a tile
+        # with a short line on each tile pointing where enemies head next
+        # returns: a screen sized surface
+        pathfinding = self.game.level.pathfinding
+        collision = pathfinding.collision
+        state = (id(pathfinding),) + pathfinding.get_state()
+
+        if state != self.path_state:
+            tile_size = collision.tile_size
+            usage = np.zeros((collision.height, collision.width), dtype=np.float32)
+            # first direction seen on each tile, most paths agree
+            flow = { }
+
+            for path in pathfinding.pool:
+                if not path.done or path.stale:
+                    continue
+
+                for a, b in zip(path.points, path.points[1:]):
+                    column, row = a[0] // tile_size, a[1] // tile_size
+                    if 0 <= column < collision.width and 0 <= row < collision.height:
+                        usage[row, column] += 1
+                        flow.setdefault((column, row), (b[0] - a[0], b[1] - a[1]))
+
+            level = usage / max(usage.max(), 1)
+            colours = np.zeros(usage.shape + (3,), dtype=np.uint8)
+            colours[..., 1] = 120
+            colours[..., 2] = 255
+
+            alpha = np.where(usage > 0, 30 + level * 90, 0).astype(np.uint8)
+            surface = self.get_tile_surface(colours, alpha)
+
+            half = tile_size // 2
+            for (column, row), (dx, dy) in flow.items():
+                centre = (column * tile_size + half, row * tile_size + half)
+                end = (centre[0] + dx * 3 // 8, centre[1] + dy * 3 // 8)
+                pygame.draw.line(surface, (255, 255, 255, 200), centre, end, 2)
+                pygame.draw.circle(surface, (255, 255, 255, 200), end, 2)
+
+            self.path_surface = surface
+            self.path_state = state
+
+        return self.path_surface
+
+    def draw(self, screen):
+        # draws every layer, bottom to top blocked tiles then paths then heat
+        # args: screen - pygame surface to draw on
+        screen.blit(self.game.level.collision.get_overlay(), (0, 0))
+        screen.blit(self.get_path_surface(), (0, 0))
+        screen.blit(self.get_heat_surface(), (0, 0))
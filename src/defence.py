@@ -1,7 +1,7 @@
 import pygame
 import math
 from pygame import Rect
-from src.prefab import Prefab
+from src.prefab import Prefab, Shared
 from src.bullet import Bullet
 from src.explosion import Explosion
 
@@ -9,6 +9,22 @@ from src.explosion import Explosion
 class Defence(Prefab):
     # base class for all turrets that players can build
     # handles targeting shooting and rotating to face enemies
+
+    __slots__ = ("game", "fire_time", "target")
+
+    # how this defence picks between enemies in range, see TargetIndex.Strategies
+    # prefabs can set their own
+    targeting = Shared("first")
+    # rotation frames for turrets that turn to face their target
+    images = Shared(None)
+    # the rest every defence prefab sets
+    cost = Shared()
+    rotate = Shared()
+    attack = Shared()
+    attack_rate = Shared()
+    attack_range = Shared()
+    explosion_radius = Shared()
+    explosion_damage = Shared()
     
     def __init__(self, game, name, x, y):
         # creates a new turret at the specified position
@@ -22,13 +38,13 @@ class Defence(Prefab):
         self.fire_time = 0
         self.target = None
 
-        if hasattr(self, "images"):
+        if self.images is not None:
             self.image = self.images[0]
             self.rect = self.image.get_rect()
             self.rect.x = x
             self.rect.y = y
 
-        if hasattr(self, "block"):
+        if self.block:
             self.game.level.collision.block_rect(x, y, self.rect.width, self.rect.height)
 
     def update(self, delta):
@@ -55,7 +71,7 @@ class Defence(Prefab):
                     self.game.explosions.add(Explosion(self.game, target, self.explosion_radius, self.explosion_damage))
 
                 # add muzzle flash effect if this turret has one
-                if hasattr(self, "flash_offset"):
+                if self.flash_offset is not None:
                     self.game.explosions.add(DefenceFlash(self.rect.center, target, self.flash_offset))
 
                 # destroy turret after firing if its a one time use like mines
@@ -88,14 +104,14 @@ class Defence(Prefab):
     def get_target(self):
         # tries to find an enemy within range to shoot at
         # keeps the same target if its still valid
+        # otherwise asks the shared target index for the best enemy in range
         # returns: coordinates of target enemy or none if no valid targets
         if self.target is not None and self.is_target_suitable(self.target):
             return self.target.rect.center
 
-        for t in self.game.wave.enemies:
-            if self.is_target_suitable(t):
-                self.target = t
-                return t.rect.center
+        self.target = self.game.targeting.select(self)
+        if self.target is not None:
+            return self.target.rect.center
 
         return None
 
@@ -103,7 +119,7 @@ class Defence(Prefab):
         # checks if an enemy is within range and still alive
         # args: target - the enemy to check
         # returns: true if we can shoot it false if its too far or dead
-        if target not in self.game.wave.enemies:
+        if not target.alive():
             return False
 
         a = target.rect.center
@@ -117,6 +133,8 @@ class DefenceFlash(Prefab):
     # visual effect that shows when turrets fire
     # appears briefly near the turret muzzle
 
+    __slots__ = ()
+
     def __init__(self, defence_position, target, offset):
         # creates a muzzle flash effect between the turret and target
         # args: defence_position - center of the turret
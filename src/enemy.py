@@ -1,5 +1,5 @@
 from pygame.sprite import Sprite
-from src.prefab import Prefab
+from src.prefab import Prefab, Shared
 from src.pathfinding import heat
 
 import pygame
@@ -11,34 +11,47 @@ class Enemy(Prefab):
     # represents a single enemy that follows paths to reach the goal
     # controlled by ai using pathfinding and gets tougher each wave
 
-    def __init__(self, game, name, x, y):
+    # wave scaled stats shared by every enemy of one type in one wave
+    # keyed by (prefab name, wave number) so the maths only runs once per type per wave
+    StatCache = { }
+
+    # state each enemy keeps for itself, config values it never changes like
+    # display_name and money are Shared and read from its types cached config
+    __slots__ = ("game", "path", "target", "x", "y", "speed", "health", "max_health", "speed_modifiers", "effective_speed", "surged", "seen_version")
+
+    money = Shared()
+
+    # surge ability settings, the same for every enemy
+    surge_multiplier = 2.5
+    surge_duration = 2.5
+
+    def __init__(self, game, name, x, y, path=None, stats=None):
         # creates a new enemy and assigns it a path to follow
         # scales stats based on wave number to increase difficulty
+        # args: path - optional path picked ahead of time by a batch spawn
+        #       stats - optional shared stat table from Enemy.get_stats
         super().__init__(name, x, y)
 
         self.game = game
-        self.path = game.level.pathfinding.get_path()
+        self.path = None
+        # collision version the straight line to the target was last checked against
+        self.seen_version = -1
+        self.set_path(path if path is not None else game.level.pathfinding.get_path())
         self.target = self.path.start
         self.rect.topleft = self.target
         self.x = self.target[0]
         self.y = self.target[1]
 
-        
-        # fallback values if prefab doesnt define speed or health
-        if not hasattr(self, 'speed'):
-            self.speed = 150
-        if not hasattr(self, 'health'):
-            self.health = 100
-
-        self.speed += random.randint(-25, 25)
+        if stats is None:
+            stats = Enemy.get_stats(name, self.config, self.game.wave.number)
 
+        # random jitter so enemies of the same type dont move in lockstep
         # make enemies faster in later waves for increased difficulty
-        self.speed += random.randint(0, self.game.wave.number * 2)
-        
-        # save base health then scale it exponentially based on wave number
-        self.max_health = self.health 
-        self.health = self.health ** (1 + (self.game.wave.number / 35))
-        self.max_health = self.health
+        self.speed = stats["speed"] + random.randint(-25, 25) + random.randint(0, stats["wave"] * 2)
+
+        # health is scaled exponentially based on wave number
+        self.health = stats["health"]
+        self.max_health = stats["health"]
 
         # max heap to track speed modifiers like slows and speed boosts
         # stores negative multiplier so python min heap acts like max heap
@@ -46,9 +59,54 @@ class Enemy(Prefab):
         self.speed_modifiers = [(-1.0, 0.0, 'base')] 
         self.effective_speed = self.speed * 1.0
         self.surged = False
-        self.surge_multiplier = 2.5
-        self.surge_duration = 2.5
- 
+
+    @staticmethod
+    def get_stats(name, config, wave):
+        # works out the wave scaled stats for one enemy type
+        # cached so a whole spawn burst shares one table
+        # args: name - prefab name of the enemy type
+        #       config - loaded prefab config for that type
+        #       wave - current wave number
+        # returns: dictionary with base speed scaled health and the wave number
+        key = (name, wave)
+        if key in Enemy.StatCache:
+            return Enemy.StatCache[key]
+
+        # fallback values if prefab doesnt define speed or health
+        health = config.get("health", 100)
+
+        stats = {
+            "wave": wave,
+            "speed": config.get("speed", 150),
+            "health": health ** (1 + (wave / 35)),
+        }
+
+        Enemy.StatCache[key] = stats
+        return stats
+
+    @staticmethod
+    def spawn_batch(game, name, count, wave):
+        # creates several enemies of the same type in one go
+        # stats are worked out once and paths are handed out together
+        # so a big burst in a late wave doesnt stall the frame
+        # args: game - reference to the main game object
+        #       name - which type of enemy to spawn
+        #       count - how many to create
+        #       wave - wave number used to scale stats
+        # returns: list of new enemies ready to be added to a group
+        stats = Enemy.get_stats(name, Prefab.load_config(name), wave)
+        paths = game.level.pathfinding.get_paths(count)
+
+        return [Enemy(game, name, 0, 0, path, stats) for path in paths]
+
+    def set_path(self, path):
+        # switches the enemy to a new path and keeps path load counts right
+        # args: path - the path to follow from now on
+        if self.path is not None:
+            self.path.load -= 1
+
+        self.path = path
+        self.path.load += 1
 
     def apply_speed_modifier(self, multiplier, duration, source_id):
         # adds a new speed effect to the enemy like slow or speed boost
@@ -95,8 +153,20 @@ class Enemy(Prefab):
         # check if our target got blocked by a new turret and find alternate path
         try:
             target = self.target
-            if target and self.game.level.collision.point_blocked(target[0], target[1]):
-                self.path, self.target = self.game.level.pathfinding.get_partial_path(target)
+            collision = self.game.level.collision
+            if target and collision.point_blocked(target[0], target[1]):
+                path, self.target = self.game.level.pathfinding.get_partial_path(target)
+                self.set_path(path)
+
+            # waypoints can be several tiles apart so a turret may land between us and
+            # the target, if so go back to the nearest tile and carry on from there
+            elif target and self.seen_version != collision.version:
+                self.seen_version = collision.version
+                if not collision.line_clear((self.x, self.y), target):
+                    tile_size = collision.tile_size
+                    tile = (round(self.x / tile_size) * tile_size, round(self.y / tile_size) * tile_size)
+                    path, self.target = self.game.level.pathfinding.get_partial_path(tile)
+                    self.set_path(path)
         except Exception:
             pass
             
@@ -152,6 +222,21 @@ class Enemy(Prefab):
                 pass
 
 
+    def get_distance_left(self):
+        # gets how far the enemy still has to walk to reach the goal, in tiles
+        # the steps left on its path after its waypoint plus the way to the waypoint
+        # returns: the distance, the straight line to the left edge if the path isnt known
+        if not self.target:
+            return 0
+
+        tile_size = self.game.level.collision.tile_size
+        steps = self.path.get_steps_left(self.target)
+
+        if steps is None:
+            return self.x / tile_size + 1
+
+        return steps + max(abs(self.target[0] - self.x), abs(self.target[1] - self.y)) / tile_size
+
     def reached_target(self):
         # called when enemy arrives at a waypoint
         # gets the next waypoint or ends the game if they reached the goal
@@ -159,7 +244,8 @@ class Enemy(Prefab):
 
             # check if the path got blocked while we were movinge we were moving
             if self.target[0] < self.game.window.resolution[0] and self.path.points is not None and self.target in self.path.points:
-                self.path, self.target = self.game.level.pathfinding.get_partial_path(self.target)
+                path, self.target = self.game.level.pathfinding.get_partial_path(self.target)
+                self.set_path(path)
 
             return
 
@@ -194,7 +280,11 @@ class Enemy(Prefab):
     def kill(self):
         # removes the enemy from the game
         # gives money reward if enemy died on map instead of escaping
+        if not self.alive():
+            return
+
         super().kill()
+        self.path.load -= 1
 
         self.game.wave.enemy_killed()  
         
@@ -1,12 +1,15 @@
 import math
 import random
 import pygame
+import numpy as np
 from src.prefab import Prefab
 
 #prefabs seperates configuration from logic
 class Explosion(Prefab):
     # represents an explosion effect that damages nearby enemies
-    # uses an animated sprite and calculates damage based on distance
+    # uses an animated sprite and the damage is dealt by ExplosionResolver
+
+    __slots__ = ()
 
     def  __init__(self, game, position, radius, damage):
        # creates an explosion that damages all enemies in its radius
@@ -18,25 +21,63 @@ class Explosion(Prefab):
        super().__init__("attack_explosion", position[0], position[1])
        self.rect.center = position
 
-       # calculate the maximum distance squared for efficiency
-       max_magnitude = radius ** 2
-
-       # check every enemy to see if theyre in blast radius
-       for enemy in game.wave.enemies:
-            # calculate distance squared to avoid expensive sqrt
-            #-----------EUCLIDEAN DISTANCE----------------
-            #jo qareeb hon gay un ko damage karay ga
-            #jo dur hon gay un ko IGNOREE
-            dx = enemy.rect.centerx-self.rect.centerx
-            dy = enemy.rect.centery-self.rect.centery
-            magnitude = (dx ** 2) + (dy ** 2)
-
-            # if enemy is close enough deal damage that decreases with distance
-            #itna qareeb hoga enemy utna hi damage ae ga
-            if magnitude < max_magnitude:
-                enemy.take_damage(damage * (1 - (magnitude / max_magnitude)))
+       # queue the blast so every explosion this frame is dealt with together
+       game.aoe.add(self.rect.center, radius, damage)
 
     def update(self, delta):
         # runs every frame to animate the explosion sprite
         # args: delta - time in seconds since last frame
-        super().update_animation(delta)
\ No newline at end of file
+        super().update_animation(delta)
+
+
+class ExplosionResolver:
+    # collects every explosion made during a frame and deals all their damage at once
+    # each enemy gets one take_damage call with the total from every blast it was in
+    # so kills and money only happen once per enemy per frame
+
+    def __init__(self, game):
+        # sets up an empty queue of blasts
+        # args: game - reference to the main game object
+        self.game = game
+        self.clear()
+
+    def clear(self):
+        # forgets any blasts that havent been resolved yet
+        self.queue = []
+
+    def add(self, position, radius, damage):
+        # queues a blast to be resolved at the end of the frame
+        # args: position - centre of the blast
+        #       radius - how far the blast reaches
+        #       damage - max damage dealt at the centre
+        self.queue.append((position[0], position[1], radius, damage))
+
+    def resolve(self):
+        # deals the damage from every queued blast to every enemy in one pass
+        if len(self.queue) == 0:
+            return
+
+        blasts = np.array(self.queue, dtype=float)
+        self.clear()
+
+        index = self.game.targeting
+        index.refresh(self.game.wave.enemies)
+        if index.count == 0:
+            return
+
+        #-----------EUCLIDEAN DISTANCE----------------
+        #jo qareeb hon gay un ko damage karay ga
+        #jo dur hon gay un ko IGNOREE
+        # squared distance from every blast to every enemy, avoids the sqrt
+        offsets = index.centres[None, :, :] - blasts[:, None, 0:2]
+        magnitude = (offsets ** 2).sum(axis=2)
+        max_magnitude = (blasts[:, 2] ** 2)[:, None]
+
+        #itna qareeb hoga enemy utna hi damage ae ga
+        falloff = blasts[:, 3][:, None] * (1 - (magnitude / max_magnitude))
+        damage = np.where(magnitude < max_magnitude, falloff, 0).sum(axis=0)
+
+        for i in np.flatnonzero(damage > 0):
+            enemy = index.enemies[i]
+            if enemy.alive():
+                enemy.take_damage(damage[i])
@@ -1,4 +1,6 @@
+import os
 import random
+import time
 import pygame
 from src.level import Level
 from src.collision import Collision
@@ -8,29 +10,67 @@ from src.wave import Wave
 from src.menu import Menu
 from src.prefab import Prefab
 from src.abilities import AbilityManager
+from src.targeting import TargetIndex
+from src.placement import PlacementMap
+from src.projectile import ProjectileSystem
+from src.explosion import ExplosionResolver
+from src.profiler import Profiler
+from src.pathfinding import shutdown_executors
+from src import snapshot
+
+SAVE_FILE = "savegame.bbs"
+
 
 class Game:
     # main game controller that handles the game loop and coordinates all systems
     # manages level loading enemy waves tower placement and user input
 
-    def __init__(self, window):
+    def __init__(self, window, recorder=None, path_workers=None, path_search="astar"):
         # sets up the game with all its systems and groups
+        # args: window - the window to draw to
+        #       recorder - optional Recorder that logs commands for replays
+        #       path_workers - none, "thread" or "process" to search paths in the background
+        #       path_search - how paths are searched, one of Pathfinding.SearchModes
         self.window = window
+        # commands arent recorded until setup is done, the seed covers setup
+        self.recorder = None
+        # headless games skip side effects like saving scores, used by replays and benchmarks
+        self.headless = False
+        # handed to each level's pathfinding, searches run in the main loop when none
+        self.path_workers = path_workers
+        self.path_search = path_search
         self.clock = pygame.time.Clock()
+        self.profiler = Profiler()
+
+        # fast forward runs more fixed size simulation steps per drawn frame
+        # so bullets and enemy movement behave the same at every speed
+        self.time_scales = [1, 2, 4, 8]
+        self.time_scale = 1
+        self.sim_step = 1 / 60
+        self.accumulator = 0
+        # if the simulation cant keep up, drawing is skipped to catch up
+        # but never more than this many frames in a row
+        self.max_dropped_frames = 4
+        self.dropped_frames = 0
         # sprite groups for different game objects
         self.defences = pygame.sprite.Group()
         self.bullets = pygame.sprite.Group()
         self.explosions = pygame.sprite.Group()
+        self.projectiles = ProjectileSystem(self)
+        self.aoe = ExplosionResolver(self)
         self.purchase_history = []  # stack of recent defences
 
       
         self.abilities = AbilityManager(self) 
+        self.targeting = TargetIndex(self)
+        self.placement = PlacementMap(self)
         
         # initialize game state
         self.purchase_history = []        # stack of recent defences
         self.music_on = True   # music will start khud ba khud, then we can just turn it off,our choice
 
         # load the starting level
+        self.level = None
         self.load_level("path")
 
         # set up available tower types that players can build
@@ -39,13 +79,29 @@ class Game:
             Defence(self, "defence_" + name, -100, -100)
             for name in ["bluechonk", "wall", "mines", "batcat"]
         ]
+
+        if recorder is not None:
+            self.recorder = recorder
+            recorder.start(self)
+
+    def record(self, name, *args):
+        # logs a player command if this session is being recorded
+        # args: name - command name understood by replay.run_command
+        #       args - json friendly command arguments
+        if self.recorder is not None:
+            self.recorder.command(name, args)
         
     def load_level(self, name):
         # loads a new level and resets all game state
         # args: name - which level file to load
+        self.record("load_level", name)
         self.defences.empty()
         self.bullets.empty()
+        self.projectiles.clear()
+        self.aoe.clear()
         self.explosions.empty()
+        if self.level is not None:
+            self.level.close()
         self.level = Level(self, name)
         self.wave = Wave(self, 1)
         self.menu = Menu(self)
@@ -60,68 +116,202 @@ class Game:
             # calculate time since last frame for smooth movement
             delta = self.clock.tick(60) / 1000.0
 
-            # handle all user input events
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.quit()
-                    
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    # place tower if game is running or interact with menu if paused
-                    if not self.menu.visible:
-                        self.place_defence(pygame.mouse.get_pos())
-                    self.menu.clicked()
-
-                elif event.type == pygame.KEYDOWN:
-                    # undo last tower placement with u key
-                    if event.key == pygame.K_u:
-                        self.undo_last_purchase()
-                    self.menu.key_pressed(event.key)
-
-            # update all game systems each frame
+            self.profiler.begin_frame()
+
+            with self.profiler.scope("events"):
+                self.handle_events()
+
+            behind = self.advance(delta)
+
+            # when the simulation is behind skip drawing so the time goes to catching up
+            if behind and self.dropped_frames < self.max_dropped_frames:
+                self.dropped_frames += 1
+            else:
+                self.dropped_frames = 0
+                with self.profiler.scope("draw"):
+                    self.draw()
+
+            if self.profiler.enabled:
+                self.profiler.set_counts(self.get_counts())
+            self.profiler.end_frame()
+
+    def advance(self, delta):
+        # runs as many fixed simulation steps as the time scale needs for this frame
+        # args: delta - real time in seconds since last frame
+        # returns: true if the simulation ran out of frame time and is behind
+        # a long stall (eg. dragging the window) shouldnt cause a huge catch up
+        self.accumulator += min(delta, 0.25) * self.time_scale
+
+        deadline = time.perf_counter() + self.sim_step
+        steps = 0
+        while self.accumulator >= self.sim_step:
+            self.update(self.sim_step)
+            self.accumulator -= self.sim_step
+            steps += 1
+
+            if time.perf_counter() > deadline:
+                break
+
+        # never fall more than a quarter second of game time behind
+        self.accumulator = min(self.accumulator, 0.25 * self.time_scale)
+
+        if self.profiler.enabled:
+            self.profiler.add_steps(steps, self.time_scale)
+
+        return self.accumulator >= self.sim_step
+
+    def cycle_time_scale(self):
+        # switches to the next fast forward speed, wrapping back to normal speed
+        index = self.time_scales.index(self.time_scale)
+        self.time_scale = self.time_scales[(index + 1) % len(self.time_scales)]
+        self.accumulator = min(self.accumulator, self.sim_step)
+
+    def handle_events(self):
+        # handles all user input events for this frame
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.quit()
+                
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                # place tower if game is running or interact with menu if paused
+                if not self.menu.visible:
+                    self.place_defence(pygame.mouse.get_pos())
+                self.menu.clicked()
+
+            elif event.type == pygame.KEYDOWN:
+                # undo last tower placement with u key
+                if event.key == pygame.K_u:
+                    self.undo_last_purchase()
+                # f cycles fast forward speed
+                elif event.key == pygame.K_f:
+                    self.cycle_time_scale()
+                # f2 shows the heat map and path debug overlay
+                elif event.key == pygame.K_F2:
+                    self.abilities.toggle_heat_overlay()
+                # f3 shows the profiler overlay and f4 saves a trace of it
+                elif event.key == pygame.K_F3:
+                    self.profiler.toggle()
+                elif event.key == pygame.K_F4 and self.profiler.enabled:
+                    self.profiler.export_trace("profile_trace.json")
+                # f5 quick saves and f9 loads the quick save
+                elif event.key == pygame.K_F5:
+                    self.save_game()
+                elif event.key == pygame.K_F9:
+                    self.load_game()
+                self.menu.key_pressed(event.key)
+
+    def update(self, delta):
+        # updates all game systems for one frame
+        # args: delta - time in seconds since last frame
+        if self.recorder is not None:
+            self.recorder.step(delta)
+
+        profiler = self.profiler
+
+        with profiler.scope("menu"):
             self.menu.update()
+        with profiler.scope("pathfinding"):
             self.level.pathfinding.update()
+        with profiler.scope("abilities"):
             self.abilities.update(delta)
 
-            # only update gameplay when menu is not visible
-            if not self.menu.visible:
-                self.level.time += delta
+        # only update gameplay when menu is not visible
+        if not self.menu.visible:
+            self.level.time += delta
+
+            with profiler.scope("targeting"):
+                self.targeting.resolve(self.defences, self.wave.enemies)
+            with profiler.scope("defences"):
                 self.defences.update(delta)
-                self.bullets.update(delta)
+            with profiler.scope("explosions"):
+                self.aoe.resolve()
                 self.explosions.update(delta)
+            with profiler.scope("bullets"):
+                self.projectiles.update(delta)
 
-                # spawn next wave when current one is finished
+            # spawn next wave when current one is finished
+            with profiler.scope("wave"):
                 self.wave.update(delta)
                 if self.wave.done:
                     self.wave = Wave(self, self.wave.number + 1)
 
-            # draw everything in the correct order from back to front
-            self.window.clear()
-            self.level.prefabs.draw(self.window.screen)
-            self.defences.draw(self.window.screen)
-            self.bullets.draw(self.window.screen)
-            self.wave.enemies.draw(self.window.screen)
-            self.explosions.draw(self.window.screen)
-            self.menu.draw(self.window.screen)
-            
-            # draw heat map overlay if ability is toggled on
-            if self.abilities.show_heat_overlay:
-                self.menu.draw_heat_overlay(self.window.screen)
-
-            pygame.display.flip()
+    def draw(self):
+        # draws everything in the correct order from back to front
+        self.window.clear()
+        self.level.prefabs.draw(self.window.screen)
+        self.defences.draw(self.window.screen)
+        self.bullets.draw(self.window.screen)
+        self.wave.enemies.draw(self.window.screen)
+        self.explosions.draw(self.window.screen)
+
+        # show where the selected defence can go while the game is being played
+        if not self.menu.visible:
+            self.menu.draw_placement(self.window.screen)
+
+        self.menu.draw(self.window.screen)
+        
+        # draw heat map overlay if ability is toggled on
+        if self.abilities.show_heat_overlay:
+            self.menu.draw_heat_overlay(self.window.screen)
+
+        if self.profiler.enabled:
+            self.menu.draw_profiler(self.window.screen)
+
+        pygame.display.flip()
+
+    def get_counts(self):
+        # counts the live entities in the game for the profiler
+        # returns: dictionary of entity name to count
+        pathfinding = self.level.pathfinding
+
+        return {
+            "enemies": len(self.wave.enemies),
+            "bullets": len(self.projectiles),
+            "explosions": len(self.explosions),
+            "defences": len(self.defences),
+            "paths": len(pathfinding.pool),
+            "partial paths": len(pathfinding.partials),
+            "open set": sum(len(path.open_set) for path in pathfinding.get_all_paths() if not path.done),
+        }
+
+    def save_game(self, filename=SAVE_FILE):
+        # saves the full game state so it can be carried on later
+        # args: filename - where to write the save
+        snapshot.save(self, filename)
+
+    def load_game(self, filename=SAVE_FILE):
+        # replaces the current game with a saved one
+        # args: filename - save written by save_game
+        # returns: true if a save was loaded
+        if not os.path.exists(filename):
+            return False
+
+        self.record("load_game", filename)
+        snapshot.load(self, filename)
+        return True
+
+    def has_save(self, filename=SAVE_FILE):
+        # returns: true if there is a save to load
+        return os.path.exists(filename)
 
     def quit(self):
         # stops the game loop and closes the window
+        # background path searches are stopped so no worker processes are left behind
         self.running = False
+        self.level.close()
+        shutdown_executors()
 
     def select_defence(self, type):
         # changes which type of tower will be placed on next click
         # args: type - index of tower type in defence_prototypes list
+        self.record("select_defence", type)
         self.defence_type = type
 
     def place_defence(self, position):
         # attempts to place a tower at the clicked position
         # checks if player has enough money and spot is not blocked
         # args: position - mouse click coordinates
+        self.record("place_defence", list(position))
         if self.defence_type < 0:
             return
 
@@ -141,7 +331,7 @@ class Game:
             return
 
         # prevent blocking the only path enemies can takeemies can take
-        if hasattr(defence_proto, "block") and self.level.pathfinding.is_critical((x, y)):
+        if defence_proto.block and self.level.pathfinding.is_critical((x, y)):
             return
 
         # all checks passed create the tower and deduct money
@@ -161,6 +351,7 @@ class Game:
     def undo_last_purchase(self):
         # removes the most recently placed tower and refunds its cost
         # triggered by pressing u key
+        self.record("undo")
         if not self.purchase_history:
             return
         # get the last tower that was placed
@@ -170,7 +361,7 @@ class Game:
         # remove it from the game if it still exists
         if defence and defence.alive():
             # unblock the collision grid if this tower blocks movement
-            if hasattr(defence, "block"):
+            if defence.block:
                 self.level.collision.unblock_rect(
                     defence.rect.x, defence.rect.y, defence.rect.width, defence.rect.height
                 )
@@ -0,0 +1,371 @@
+import heapq
+
+# moves as (dx, dy, cost) in tiles, diagonals also need both side tiles clear
+Moves = [(dx, dy, 3 if dx == 0 or dy == 0 else 4) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)]
+
+# stands for the column past the left edge in the entrance graph
+Goal = (-1, -1)
+
+
+class Hierarchy:
+    # hierarchical pathfinding for big grids, known as hpa star
+    # the collision grid is split into square clusters, the tiles either side of a
+    # gap in a cluster border are entrances, and the cost between every pair of
+    # entrances in a cluster is worked out in advance
+    # a search only crosses the small graph of entrances then fills in the tiles
+    # one cluster at a time, so only the clusters the route uses are searched
+    # a cluster's costs are only worked out the first time a search reaches it
+    # and when tiles change only the clusters around them are dropped
+
+    def __init__(self, collision, cluster_size=10):
+        # args: collision - the grid to search
+        #       cluster_size - width and height of each cluster in tiles
+        self.collision = collision
+        self.size = cluster_size
+        self.version = -1
+        self.rows = None
+        self.columns_count = -(-collision.width // cluster_size)
+        self.rows_count = -(-collision.height // cluster_size)
+        # (cluster, cluster) to the (tile, tile) crossings over their shared border
+        self.borders = { }
+        # cluster to {entrance: {other entrance or Goal: cost}}, only for clusters worked out
+        self.edges = { }
+        # cluster to the moves inside it, from get_moves
+        self.moves = { }
+        # how many clusters the last refresh dropped to be worked out again
+        self.invalidated = 0
+
+    def get_cluster(self, tile):
+        # args: tile - (column, row)
+        # returns: the (column, row) of the cluster holding it
+        return (tile[0] // self.size, tile[1] // self.size)
+
+    def get_bounds(self, cluster):
+        # args: cluster - (column, row) of the cluster
+        # returns: first and one past last tile column, then the same for rows
+        size = self.size
+        return (
+            cluster[0] * size, min((cluster[0] + 1) * size, self.collision.width),
+            cluster[1] * size, min((cluster[1] + 1) * size, self.collision.height),
+        )
+
+    def get_borders(self, cluster):
+        # args: cluster - (column, row) of the cluster
+        # returns: keys of the borders it shares, smaller cluster first
+        i, j = cluster
+        borders = []
+
+        if i > 0:
+            borders.append(((i - 1, j), cluster))
+        if i + 1 < self.columns_count:
+            borders.append((cluster, (i + 1, j)))
+        if j > 0:
+            borders.append(((i, j - 1), cluster))
+        if j + 1 < self.rows_count:
+            borders.append((cluster, (i, j + 1)))
+
+        return borders
+
+    def find_crossings(self, a, b):
+        # finds where a route can cross the border between two clusters
+        # runs of open tile pairs along the border get one crossing in the middle,
+        # long runs get one at each end instead so routes dont bend to reach the middle
+        # args: a - the cluster left of or above b
+        #       b - the other cluster
+        # returns: list of (tile in a, tile in b)
+        rows = self.rows
+        left, right, top, bottom = self.get_bounds(a)
+
+        if a[1] == b[1]:
+            pairs = [((right - 1, row), (right, row)) for row in range(top, bottom)]
+        else:
+            pairs = [((column, bottom - 1), (column, bottom)) for column in range(left, right)]
+
+        crossings = []
+        run = []
+        for pair in pairs + [None]:
+            if pair is not None and not rows[pair[0][1]][pair[0][0]] and not rows[pair[1][1]][pair[1][0]]:
+                run.append(pair)
+                continue
+
+            if len(run) >= 6:
+                crossings += [run[0], run[-1]]
+            elif len(run) > 0:
+                crossings.append(run[len(run) // 2])
+            run = []
+
+        return crossings
+
+    def get_entrances(self, cluster):
+        # returns: list of the entrance tiles inside a cluster
+        entrances = []
+        for key in self.get_borders(cluster):
+            side = 0 if key[0] == cluster else 1
+            entrances += [pair[side] for pair in self.borders[key] if pair[side] not in entrances]
+
+        return entrances
+
+    def get_links(self, tile):
+        # gets the entrances across a border from an entrance, one step away
+        # args: tile - an entrance tile
+        # returns: list of tiles
+        cluster = self.get_cluster(tile)
+        links = []
+
+        for key in self.get_borders(cluster):
+            for a, b in self.borders[key]:
+                if a == tile:
+                    links.append(b)
+                elif b == tile:
+                    links.append(a)
+
+        return links
+
+    def get_moves(self, cluster):
+        # lists the moves from every open tile that stay inside a cluster
+        # worked out once so each search in the cluster only follows the lists
+        # args: cluster - (column, row) of the cluster
+        # returns: {tile: [(next tile, cost)]}
+        if cluster in self.moves:
+            return self.moves[cluster]
+
+        rows = self.rows
+        left, right, top, bottom = self.get_bounds(cluster)
+        moves = { }
+
+        for y in range(top, bottom):
+            for x in range(left, right):
+                if rows[y][x]:
+                    continue
+
+                moves[(x, y)] = []
+                for dx, dy, cost in Moves:
+                    nx, ny = x + dx, y + dy
+                    if not (left <= nx < right and top <= ny < bottom) or rows[ny][nx]:
+                        continue
+                    if dx != 0 and dy != 0 and (rows[y][nx] or rows[ny][x]):
+                        continue
+                    moves[(x, y)].append(((nx, ny), cost))
+
+        self.moves[cluster] = moves
+        return moves
+
+    def local_search(self, cluster, source, targets=None, usage=None, every_target=False):
+        # dijkstra from one tile that never leaves a cluster
+        # args: cluster - the cluster to stay in
+        #       source - tile to start from
+        #       targets - set of tiles to stop at, none to reach every tile
+        #       usage - optional counter of pixel point to crowding cost for stepping there
+        #       every_target - keep going until every target is reached, not just the first
+        # returns: distances, came_from and the target reached or none
+        moves = self.get_moves(cluster)
+        tile_size = self.collision.tile_size
+        remaining = len(targets) if targets is not None else -1
+        distances = {source: 0}
+        came_from = { }
+        heap = [(0, source)]
+
+        while len(heap) > 0:
+            distance, tile = heapq.heappop(heap)
+            if distance > distances[tile]:
+                continue
+
+            if targets is not None and tile in targets:
+                remaining -= 1
+                if not every_target or remaining == 0:
+                    return distances, came_from, tile
+
+            for neighbour, cost in moves[tile]:
+                new_distance = distance + cost
+                if usage is not None:
+                    new_distance += usage.get((neighbour[0] * tile_size, neighbour[1] * tile_size), 0)
+
+                if new_distance < distances.get(neighbour, new_distance + 1):
+                    distances[neighbour] = new_distance
+                    came_from[neighbour] = tile
+                    heapq.heappush(heap, (new_distance, neighbour))
+
+        return distances, came_from, None
+
+    def get_targets(self, cluster, entrances):
+        # gets the tiles a search across a cluster has to reach to find its edges
+        # args: cluster - the cluster searched
+        #       entrances - the entrance tiles wanted
+        # returns: set of tiles, with the left edge tiles for clusters on it
+        targets = set(entrances)
+        if cluster[0] == 0:
+            left, right, top, bottom = self.get_bounds(cluster)
+            targets.update((0, y) for y in range(top, bottom) if not self.rows[y][0])
+
+        return targets
+
+    def get_goal_cost(self, cluster, distances):
+        # clusters on the left edge can step straight off it to the goal
+        # args: cluster - the cluster searched
+        #       distances - from local_search
+        # returns: cheapest cost to the goal, or none
+        if cluster[0] != 0:
+            return None
+
+        costs = [distance for (column, row), distance in distances.items() if column == 0]
+        return min(costs) + 3 if len(costs) > 0 else None
+
+    def get_edges(self, cluster):
+        # gets the costs between a cluster's entrances, working them out if needed
+        # args: cluster - (column, row) of the cluster
+        # returns: {entrance: {other entrance or Goal: cost}}
+        if cluster not in self.edges:
+            self.build_cluster(cluster)
+
+        return self.edges[cluster]
+
+    def build_cluster(self, cluster):
+        # works out the cost between every pair of entrances in a cluster
+        # args: cluster - (column, row) of the cluster
+        entrances = self.get_entrances(cluster)
+        edges = {entrance: { } for entrance in entrances}
+
+        # moves cost the same both ways so each search only has to
+        # reach the entrances after it, the rest are already known
+        for i, entrance in enumerate(entrances):
+            later = entrances[i + 1:]
+            distances = self.local_search(cluster, entrance, self.get_targets(cluster, later), every_target=True)[0]
+
+            for other in later:
+                if other in distances:
+                    edges[entrance][other] = edges[other][entrance] = distances[other]
+
+            goal_cost = self.get_goal_cost(cluster, distances)
+            if goal_cost is not None:
+                edges[entrance][Goal] = goal_cost
+
+        self.edges[cluster] = edges
+
+    def refresh(self):
+        # brings the entrance graph up to date with the collision grid
+        # a changed tile only moves crossings on borders it sits against, and
+        # only clusters whose crossings or tiles changed are dropped
+        collision = self.collision
+        if self.version == collision.version:
+            return
+
+        changes = None if self.rows is None else collision.changes_since(self.version)
+        self.rows = collision.get_rows()
+        self.invalidated = 0
+
+        if changes is None:
+            self.borders = { }
+            self.edges = { }
+            self.moves = { }
+            for i in range(self.columns_count):
+                for j in range(self.rows_count):
+                    for key in self.get_borders((i, j)):
+                        if key[0] == (i, j):
+                            self.borders[key] = self.find_crossings(*key)
+        else:
+            clusters = set()
+            for index in set(changes):
+                row, column = divmod(index, 1000)
+                if not (0 <= column < collision.width and 0 <= row < collision.height):
+                    continue
+
+                cluster = self.get_cluster((column, row))
+                clusters.add(cluster)
+
+                for key in self.get_borders(cluster):
+                    crossings = self.find_crossings(*key)
+                    if crossings != self.borders[key]:
+                        self.borders[key] = crossings
+                        clusters.update(key)
+
+            for cluster in clusters:
+                self.edges.pop(cluster, None)
+                self.moves.pop(cluster, None)
+            self.invalidated = len(clusters)
+
+        self.version = collision.version
+
+    def find_path(self, start, usage=None):
+        # finds a full route from a point to the left edge
+        # args: start - pixel point on the grid or just past its right edge
+        #       usage - optional counter of pixel point to crowding cost, used when filling in tiles
+        # returns: list of pixel points ending past the left edge, or none if there is no route
+        self.refresh()
+        collision = self.collision
+        tile_size = collision.tile_size
+        column, row = start[0] // tile_size, start[1] // tile_size
+        points = []
+
+        # starts past the right edge walk straight in
+        if column >= collision.width:
+            points.append(start)
+            column = collision.width - 1
+
+        if not (0 <= column < collision.width and 0 <= row < collision.height) or self.rows[row][column]:
+            return None
+
+        first = (column, row)
+        cluster = self.get_cluster(first)
+
+        # join the start onto its cluster's entrances for this search only
+        distances = self.local_search(cluster, first, self.get_targets(cluster, self.get_entrances(cluster)), every_target=True)[0]
+        start_edges = {entrance: distances[entrance] for entrance in self.get_edges(cluster) if entrance in distances and entrance != first}
+        goal_cost = self.get_goal_cost(cluster, distances)
+        if goal_cost is not None:
+            start_edges[Goal] = goal_cost
+
+        # a star over the entrances, every column left to cross costs at least 3
+        scores = {first: 0}
+        came_from = { }
+        heap = [(3 * (column + 1), 0, first)]
+
+        while len(heap) > 0:
+            estimate, score, node = heapq.heappop(heap)
+            if node == Goal:
+                break
+            if score > scores[node]:
+                continue
+
+            neighbours = dict(start_edges) if node == first else dict(self.get_edges(self.get_cluster(node)).get(node, { }))
+            for link in self.get_links(node):
+                neighbours[link] = 3
+
+            for neighbour, cost in neighbours.items():
+                new_score = score + cost
+                if new_score < scores.get(neighbour, new_score + 1):
+                    scores[neighbour] = new_score
+                    came_from[neighbour] = node
+                    heapq.heappush(heap, (new_score + 3 * (neighbour[0] + 1), new_score, neighbour))
+
+        if Goal not in came_from:
+            return None
+
+        route = [Goal]
+        while route[-1] != first:
+            route.append(came_from[route[-1]])
+        route.reverse()
+
+        # fill in the tiles between each pair of entrances
+        tiles = [first]
+        for a, b in zip(route, route[1:]):
+            cluster = self.get_cluster(a)
+
+            if b != Goal and self.get_cluster(b) != cluster:
+                tiles.append(b)
+                continue
+
+            if b == Goal:
+                left, right, top, bottom = self.get_bounds(cluster)
+                targets = {(0, y) for y in range(top, bottom)}
+            else:
+                targets = {b}
+
+            came, end = self.local_search(cluster, a, targets, usage)[1:]
+            steps = [end]
+            while steps[-1] != a:
+                steps.append(came[steps[-1]])
+            tiles += steps[-2::-1]
+
+        points += [(x * tile_size, y * tile_size) for x, y in tiles]
+        points.append((-tile_size, points[-1][1]))
+        return points
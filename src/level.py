@@ -9,6 +9,10 @@ class Level:
     # represents a game level loaded from a text file
     # contains all the walls decorations collision data and enemy paths
 
+    # settings a level file can change and their defaults
+    # pool_size - how many full enemy paths are made when the level starts
+    Settings = {"pool_size": 30}
+
     def __init__(self, game, name):
         # creates and loads a level by its filename
         # args: game - reference to the main game object
@@ -22,11 +26,20 @@ class Level:
         # reads the level file and parses it into a list of objects to place
         # level files are text based with one object per line
         # format is: prefab_name x_position y_position
+        # or: setting_name value for anything in Level.Settings
         # lines starting with # are comments and get skipped
+        self.settings = dict(Level.Settings)
+
         try:
             with open("levels\\" + self.name + ".level", "r") as file:
                 self.data = [line.strip().split(" ") for line in file.readlines() if len(line.strip()) > 0 and line[0] != "#"]
 
+            for args in self.data:
+                if args[0] in Level.Settings:
+                    self.settings[args[0]] = int(args[1])
+
+            self.data = [args for args in self.data if args[0] not in Level.Settings]
+
         except IOError:
             print("Error loading level")
 
@@ -35,30 +48,36 @@ class Level:
         # creates collision grid pathfinding and places all objects
         self.collision = Collision(self, self.game.window.resolution, 32)
         self.prefabs = OrderedUpdates()
-        self.pathfinding = Pathfinding(self.game, self.collision)
+        self.pathfinding = Pathfinding(self.game, self.collision, self.game.path_workers, self.game.path_search)
 
         # create all the objects defined in the level file
-        for args in self.data:
-            name = args[0]
-            x = int(args[1])
-            y = int(args[2])
+        # every wall goes into the collision grid as one change
+        with self.collision.batch():
+            for args in self.data:
+                name = args[0]
+                x = int(args[1])
+                y = int(args[2])
 
-            prefab = Prefab(name, x, y)
-            self.prefabs.add(prefab)
+                prefab = Prefab(name, x, y)
+                self.prefabs.add(prefab)
 
-            # if this object blocks movement add it to collision grid
-            if hasattr(prefab, "block"):
-                # block textures are 1 pixel wider to make a full border
-                self.collision.block_rect(x, y, prefab.rect.width - 1, prefab.rect.height - 1)
+                # if this object blocks movement add it to collision grid
+                if prefab.block:
+                    # block textures are 1 pixel wider to make a full border
+                    self.collision.block_rect(x, y, prefab.rect.width - 1, prefab.rect.height - 1)
 
         # precalculate paths for enemies to follow
-        self.pathfinding.precompute(30)
+        self.pathfinding.precompute(self.settings["pool_size"])
         self.wave = Wave(self.game, 1)
         # starting values for player resources
         self.lives = 20
         self.money = 600
         self.time = 0
 
+    def close(self):
+        # stops work the level started in the background, called before it is replaced
+        self.pathfinding.close()
+
     def get_score(self):
         # calculates the players score based on time survived and waves completed
         # returns: integer score value
@@ -1,5 +1,6 @@
 from src.prefab import Prefab
 from src.leaderboard import Leaderboard
+from src.debug_overlay import DebugOverlay
 from pygame.sprite import OrderedUpdates
 import pygame
 import math
@@ -61,15 +62,23 @@ class Menu(Prefab):
         self.leaderboard_name = None
         self.defence_buttons = []
         self.ability_buttons = []
+        # style of the profiler stats box
+        self.profiler_style = Prefab("menu_profiler", 0, 0)
+        # cached heat map and path debug layers
+        self.debug_overlay = DebugOverlay(game)
+        # see through placement previews keyed by defence type and whether it fits
+        self.placement_previews = { }
         
     def show(self):
         # displays the menu and pauses the game
+        self.game.record("show_menu")
         self.visible = True
         self.show_main_screen()
 
     def hide(self):
         # closes the menu and shows the in game ui instead
         # creates tower selection buttons and stat displays
+        self.game.record("hide_menu")
         self.visible = False
         self.clear()
 
@@ -91,6 +100,7 @@ class Menu(Prefab):
         self.ability_buttons = [
             MenuButton(self, "menu_pause_button", "Spike", 960, 0, lambda: self.game.abilities.use("crystal_spike")),
             MenuButton(self, "menu_pause_button", "Undo", 960, 64, self.game.undo_last_purchase),
+            MenuButton(self, "menu_pause_button", "Speed x1", 1088, 64, self.game.cycle_time_scale),
         ]
         for btn in self.ability_buttons:
             self.components.add(btn)
@@ -143,6 +153,9 @@ class Menu(Prefab):
                 # disable undo button if no towers have been placed
                 has_history = len(self.game.purchase_history) > 0
                 btn.disabled = not has_history
+            elif btn.text.startswith("Speed"):
+                # show the current fast forward speed
+                btn.set_text("Speed x" + str(self.game.time_scale))
 
 
     def clicked(self):
@@ -177,6 +190,55 @@ class Menu(Prefab):
 
         self.components.draw(screen)
 
+    def draw_profiler(self, screen):
+        # draws the profiler stats in a see through box in the top left
+        # args: screen - pygame surface to draw on
+        style = self.profiler_style
+        colour = (style.col_r, style.col_g, style.col_b)
+        lines = [style.font.render(line, True, colour) for line in self.game.profiler.report_lines()]
+
+        width = max(line.get_width() for line in lines) + style.padding * 2
+        height = sum(line.get_height() for line in lines) + style.padding * 2
+
+        background = pygame.Surface((width, height), pygame.SRCALPHA)
+        background.fill((0, 0, 0, style.bg_alpha))
+        screen.blit(background, (0, 80))
+
+        y = 80 + style.padding
+        for line in lines:
+            screen.blit(line, (style.padding, y))
+            y += line.get_height()
+
+    def draw_heat_overlay(self, screen):
+        # draws the heat map and path debug layers over the level
+        # the layers are cached and only rebuilt when what they show changes
+        # args: screen - pygame surface to draw on
+        self.debug_overlay.draw(screen)
+
+    def draw_placement(self, screen):
+        # shades tiles the selected defence cant go on and previews it under the mouse
+        # the validity comes from the cached placement map so this is cheap every frame
+        # args: screen - pygame surface to draw on
+        game = self.game
+        if game.defence_type < 0:
+            return
+
+        screen.blit(game.placement.get_overlay(game.defence_type), (0, 0))
+
+        position = pygame.mouse.get_pos()
+        x = position[0] - position[0] % 32
+        y = position[1] - position[1] % 32
+        valid = game.placement.can_place(game.defence_type, x, y)
+
+        key = (game.defence_type, valid)
+        if key not in self.placement_previews:
+            rect = game.defence_prototypes[game.defence_type].rect
+            preview = pygame.Surface((rect.width, rect.height), pygame.SRCALPHA)
+            preview.fill((60, 200, 90, 110) if valid else (200, 40, 40, 110))
+            self.placement_previews[key] = preview
+
+        screen.blit(self.placement_previews[key], (x, y))
+
     def add_button(self, text, callback, tint=None, icon=None, left_align=False, text_colour=None):
         # creates a new button and adds it to the current menu screen
         # can customize colors icons and alignment for special buttons
@@ -236,9 +298,13 @@ class Menu(Prefab):
         if self.game.level.time > 0:
             self.add_button("Continue", self.hide)
             self.add_button("Restart Game", lambda: self.game.load_level(self.game.level.name))
+            self.add_button("Save Game", self.save_game_button)
         else:
             self.add_button("Start Game", self.hide)
 
+        if self.game.has_save():
+            self.add_button("Load Game", self.game.load_game)
+
         self.add_button("How To Play", self.show_how_to_play_screen)
         self.add_button("Change Level", self.show_change_level_screen)
         self.add_button("Leaderboard", self.show_leaderboard_screen)
@@ -312,9 +378,11 @@ class Menu(Prefab):
         current_score = self.game.level.get_score()
         current_wave = self.game.wave.number
         current_level = self.game.level.name
-        self.leaderboard.add_score(current_score, current_level, current_wave)
+        if not self.game.headless:
+            self.leaderboard.add_score(current_score, current_level, current_wave)
         
-        self.show()
+        # shown directly instead of through show so replays dont record it as a player command
+        self.visible = True
         self.clear()
         self.add_button("Game Over", None)
         self.add_button("You Reached Wave " + str(current_wave), None)
@@ -349,6 +417,11 @@ class Menu(Prefab):
         # scores are added automatically now
         pass
     
+    def save_game_button(self):
+        # saves the game and refreshes the menu so load game shows up
+        self.game.save_game()
+        self.show_main_screen()
+
     def toggle_music_button(self):
         # turns music on or off and updates the menu button text
         self.game.toggle_music()
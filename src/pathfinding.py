@@ -1,7 +1,485 @@
-from collections import Counter
-heat = Counter() 
-
 import random
+import heapq
+import numpy as np
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from src.hierarchy import Hierarchy
+
+
+class HeatMap(Counter):
+    # counter of how many times enemies stepped onto each tile
+    # keeps a version number so drawings of it can be cached
+    # the coarse version only changes when a tile moves to another bucket,
+    # buckets double in size so busy tiles stop causing redraws every step
+
+    def __init__(self, *args, **kwargs):
+        self.version = 0
+        self.coarse_version = 0
+        super().__init__(*args, **kwargs)
+
+    def bucket(self, count):
+        # gets which bucket a count falls in, 0 for none then 1, 2-3, 4-7 and so on
+        # args: count - how many steps
+        # returns: the bucket number
+        return int(count).bit_length()
+
+    def __setitem__(self, key, value):
+        self.version += 1
+        if self.bucket(self.get(key, 0)) != self.bucket(value):
+            self.coarse_version += 1
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.version += 1
+        self.coarse_version += 1
+        super().__delitem__(key)
+
+    def clear(self):
+        self.version += 1
+        self.coarse_version += 1
+        super().clear()
+
+    def update(self, *args, **kwargs):
+        self.version += 1
+        self.coarse_version += 1
+        super().update(*args, **kwargs)
+
+
+heat = HeatMap()
+
+# background pools shared by every level, made the first time a worker mode is used
+Executors = { }
+
+
+def get_executor(mode):
+    # gets the shared thread or process pool for background path searches
+    # args: mode - "thread" or "process"
+    # returns: an executor that runs search_grid jobs
+    if mode not in Executors:
+        if mode == "process":
+            Executors[mode] = ProcessPoolExecutor(max_workers=2)
+        else:
+            Executors[mode] = ThreadPoolExecutor(max_workers=1)
+
+    return Executors[mode]
+
+
+def shutdown_executors():
+    # stops the shared background pools and any searches still waiting in them
+    # the next level to use a worker mode makes a new pool
+    for executor in Executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    Executors.clear()
+
+
+def field_estimate(distances, column, row):
+    # gets the goal field cost of a tile from a plain copy of GoalField.distances
+    # tiles off the top bottom or right of the grid use the straight line cost
+    # args: distances - nested lists [row][column] of goal distances, or none if there is no field
+    #       column, row - the tile
+    # returns: the cost, or GoalField.Unreachable if the goal cant be reached
+    if column < 0:
+        return 0
+
+    if distances is None:
+        return 3 * (column + 1)
+
+    width = len(distances[0])
+    on_row = 0 <= row < len(distances)
+
+    # start points past the right edge can only walk straight in
+    if column >= width and on_row:
+        return 3 * (column - width + 1) + distances[row][width - 1]
+
+    if column >= width or not on_row:
+        return 3 * (column + 1)
+
+    return distances[row][column]
+
+
+def grid_neighbours(position, is_blocked, res, right):
+    # gets all tiles next to a position that arent blocked
+    # diagonals are only allowed if both tiles beside the corner are clear
+    # shared by Path and the background search so both move the same way
+    # args: position - the coordinates to find neighbours for
+    #       is_blocked - function taking x and y that says if a tile is blocked
+    #       res - tile size in pixels
+    #       right - x coordinate of the right edge where paths start
+    # returns: list of coordinates that can be moved to next
+    if position[0] >= right:
+        return [(position[0] - res, position[1])]
+
+    x_diff = range(position[0] - res, position[0] + res + 1, res)
+    y_diff = range(position[1] - res, position[1] + res + 1, res)
+
+    return [(x, y) for x in x_diff for y in y_diff if (x, y) != position and (x == position[0] or y == position[1] or (not is_blocked(x, position[1]) and not is_blocked(position[0], y))) and not is_blocked(x, y)]
+
+
+# moves in the order grid_neighbours gives them, x outer then y inner
+Directions = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)]
+
+
+class Adjacency:
+    # caches which moves are allowed from every tile on the collision grid
+    # each tile keeps an 8 bit mask, one bit per direction in Directions
+    # when tiles change only the 3x3 block around each one is worked out again
+    # tiles off the grid dont have masks and use grid_neighbours instead
+
+    def __init__(self, collision, right):
+        # args: collision - the grid the moves come from
+        #       right - x coordinate of the right edge where paths start
+        self.collision = collision
+        self.right = right
+        self.version = -1
+        self.masks = None
+        # for every possible mask, the pixel offsets it allows
+        res = collision.tile_size
+        self.moves = [[(dx * res, dy * res) for bit, (dx, dy) in enumerate(Directions) if mask & (1 << bit)] for mask in range(256)]
+
+    def get_mask(self, column, row, rows, outside):
+        # works out which moves are allowed from one tile
+        # same rules as grid_neighbours, diagonals need both side tiles clear
+        # args: column, row - the tile
+        #       rows - blocked grid as nested lists [row][column]
+        #       outside - set of blocked tile indices off the grid
+        # returns: the move mask
+        width, height = self.collision.width, self.collision.height
+
+        def blocked(c, r):
+            if 0 <= c < width and 0 <= r < height:
+                return rows[r][c]
+            return r * 1000 + c in outside
+
+        mask = 0
+        for bit, (dx, dy) in enumerate(Directions):
+            if blocked(column + dx, row + dy):
+                continue
+            if dx != 0 and dy != 0 and (blocked(column + dx, row) or blocked(column, row + dy)):
+                continue
+            mask |= 1 << bit
+
+        return mask
+
+    def refresh(self):
+        # brings the masks up to date with the collision grid
+        collision = self.collision
+        if self.version == collision.version:
+            return
+
+        changes = None if self.masks is None else collision.changes_since(self.version)
+        rows = collision.get_rows()
+        outside = collision.outside
+
+        if changes is None:
+            self.masks = [[self.get_mask(column, row, rows, outside) for column in range(collision.width)] for row in range(collision.height)]
+        else:
+            tiles = set()
+            for index in changes:
+                row, column = divmod(index, 1000)
+                for dy in (-1, 0, 1):
+                    for dx in (-1, 0, 1):
+                        if 0 <= column + dx < collision.width and 0 <= row + dy < collision.height:
+                            tiles.add((column + dx, row + dy))
+
+            for column, row in tiles:
+                self.masks[row][column] = self.get_mask(column, row, rows, outside)
+
+        self.version = collision.version
+
+    def get_neighbours(self, position):
+        # gets all tiles that can be moved to from a position
+        # args: position - pixel coordinates of a tile
+        # returns: list of coordinates that can be moved to next
+        collision = self.collision
+        res = collision.tile_size
+        column, row = position[0] // res, position[1] // res
+
+        # off the grid or part way through a batch so work it out directly
+        if collision.changed or not (0 <= column < collision.width and 0 <= row < collision.height):
+            return grid_neighbours(position, collision.point_blocked, res, self.right)
+
+        if self.version != collision.version:
+            self.refresh()
+
+        x, y = position
+        return [(x + dx, y + dy) for dx, dy in self.moves[self.masks[row][column]]]
+
+
+class GoalField:
+    # cost of the cheapest route from every tile to the goal column, ignoring crowding
+    # made with one reverse dijkstra from the left edge so Path.search can use it
+    # as an a star estimate that is never too high and usually exact
+    # when tiles change only the tiles whose route went past them are worked out again
+
+    # distance given to tiles that cant reach the goal at all
+    Unreachable = 10 ** 9
+
+    def __init__(self, adjacency):
+        # args: adjacency - the move masks the routes follow
+        self.adjacency = adjacency
+        self.collision = adjacency.collision
+        self.version = -1
+        # nested lists [row][column] of distances and the tile each route steps to next
+        self.distances = None
+        self.parents = None
+        # tile to the set of tiles whose route steps to it next, kept with parents
+        # so a change only walks the routes that went through it
+        self.children = None
+        # which bit in a mask is the move by each direction
+        self.bits = {direction: 1 << bit for bit, direction in enumerate(Directions)}
+
+    def get_seed(self, column, row):
+        # gets the known distance of a tile just off the grid
+        # the column past the left edge is the goal, above and below the grid
+        # nothing is known so the straight line cost is used, which is never too high
+        # args: column, row - the tile
+        # returns: the distance, or none if the tile isnt a seed
+        if column == -1:
+            return 0
+        if 0 <= column < self.collision.width and (row == -1 or row == self.collision.height):
+            return 3 * (column + 1)
+
+        return None
+
+    def spread(self, heap, rows):
+        # runs dijkstra outwards from the tiles in the heap
+        # a tile only takes a new distance if it is lower than the one it has
+        # so this both fills in reset tiles and carries shortcuts further out
+        # args: heap - list of (distance, column, row) to start from
+        #       rows - blocked grid as nested lists [row][column]
+        width, height = self.collision.width, self.collision.height
+        masks = self.adjacency.masks
+        distances, parents, children = self.distances, self.parents, self.children
+        heapq.heapify(heap)
+
+        while len(heap) > 0:
+            distance, column, row = heapq.heappop(heap)
+            on_grid = 0 <= column < width and 0 <= row < height
+            if on_grid and distance > distances[row][column]:
+                continue
+
+            for dx, dy in Directions:
+                c, r = column + dx, row + dy
+                if not (0 <= c < width and 0 <= r < height) or rows[r][c]:
+                    continue
+
+                # moves are worked out from the tile doing the moving
+                if not masks[r][c] & self.bits[(-dx, -dy)]:
+                    continue
+
+                new_distance = distance + (3 if dx == 0 or dy == 0 else 4)
+                if new_distance < distances[r][c]:
+                    if parents[r][c] is not None:
+                        children[parents[r][c]].discard((c, r))
+
+                    distances[r][c] = new_distance
+                    parents[r][c] = (column, row)
+                    children.setdefault((column, row), set()).add((c, r))
+                    heapq.heappush(heap, (new_distance, c, r))
+
+    def rebuild(self, rows):
+        # works out every distance from scratch
+        # args: rows - blocked grid as nested lists [row][column]
+        width, height = self.collision.width, self.collision.height
+        self.distances = [[GoalField.Unreachable] * width for row in range(height)]
+        self.parents = [[None] * width for row in range(height)]
+        self.children = { }
+
+        heap = [(0, -1, row) for row in range(-1, height + 1)]
+        heap += [(self.get_seed(column, row), column, row) for column in range(width) for row in (-1, height)]
+        self.spread(heap, rows)
+
+    def patch(self, changes, rows):
+        # updates the distances after some tiles changed
+        # every tile whose route stepped through the 3x3 block around a change
+        # is reset then filled back in from the tiles around it
+        # args: changes - tile indices that were blocked or unblocked
+        #       rows - blocked grid as nested lists [row][column]
+        width, height = self.collision.width, self.collision.height
+        parents, children = self.parents, self.children
+
+        reset = set()
+        for index in changes:
+            row, column = divmod(index, 1000)
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    if 0 <= column + dx < width and 0 <= row + dy < height:
+                        reset.add((column + dx, row + dy))
+
+        if len(reset) == 0:
+            return
+
+        stack = list(reset)
+        while len(stack) > 0:
+            for child in children.get(stack.pop(), ()):
+                if child not in reset:
+                    reset.add(child)
+                    stack.append(child)
+
+        for column, row in reset:
+            if parents[row][column] is not None:
+                children[parents[row][column]].discard((column, row))
+
+            self.distances[row][column] = GoalField.Unreachable
+            parents[row][column] = None
+
+        heap = []
+        for column, row in reset:
+            for dx, dy in Directions:
+                c, r = column + dx, row + dy
+                if (c, r) in reset:
+                    continue
+
+                if 0 <= c < width and 0 <= r < height:
+                    if self.distances[r][c] < GoalField.Unreachable:
+                        heap.append((self.distances[r][c], c, r))
+                else:
+                    seed = self.get_seed(c, r)
+                    if seed is not None:
+                        heap.append((seed, c, r))
+
+        self.spread(heap, rows)
+
+    def refresh(self):
+        # brings the distances up to date with the collision grid
+        collision = self.collision
+        if self.version == collision.version:
+            return
+
+        self.adjacency.refresh()
+        changes = None if self.distances is None else collision.changes_since(self.version)
+        rows = collision.get_rows()
+
+        if changes is None:
+            self.rebuild(rows)
+        else:
+            self.patch(set(changes), rows)
+
+        self.version = collision.version
+
+    def get(self, position):
+        # gets the cheapest possible cost from a position to the goal
+        # args: position - pixel coordinates of a tile
+        # returns: the cost, or GoalField.Unreachable if the goal cant be reached
+        collision = self.collision
+        res = collision.tile_size
+        column, row = position[0] // res, position[1] // res
+
+        if column < 0:
+            return 0
+
+        if self.version != collision.version:
+            self.refresh()
+
+        return field_estimate(self.distances, column, row)
+
+
+def search_grid(blocked, usage, start, res, right, distances=None):
+    # finds a path from start to the left edge without touching any game objects
+    # works only on plain data so it can run on a background thread or process
+    # uses the same costs and goal field estimate as Path.search, 3 straight 4 diagonal plus crowding
+    # args: blocked - set of blocked tile indices as made by Collision.point_to_index
+    #       usage - dictionary of point to how many finished paths use it
+    #       start - where the path begins
+    #       res - tile size in pixels
+    #       right - x coordinate of the right edge
+    #       distances - copy of GoalField.distances for the same blocked tiles,
+    #                   none to use the straight line cost to the left edge
+    # returns: list of points from start to goal, or none if there is no route
+    def is_blocked(x, y):
+        return (y // res) * 1000 + (x // res) in blocked
+
+    remaining = field_estimate(distances, start[0] // res, start[1] // res)
+    heap = [(remaining, remaining, start)]
+    scores = {start: 0}
+    came_from = { }
+    closed = set()
+
+    while len(heap) > 0:
+        _, remaining, current = heapq.heappop(heap)
+        if current in closed:
+            continue
+
+        score = scores[current]
+
+        # reached the left edge so walk back along the trail
+        if current[0] < 0:
+            points = [current]
+            while current in came_from:
+                current = came_from[current]
+                points.append(current)
+            points.reverse()
+            return points
+
+        closed.add(current)
+
+        for neighbour in grid_neighbours(current, is_blocked, res, right):
+            if neighbour in closed:
+                continue
+
+            # no route to the goal from here so theres no point looking
+            remaining = field_estimate(distances, neighbour[0] // res, neighbour[1] // res)
+            if remaining >= GoalField.Unreachable:
+                continue
+
+            base = 3 if neighbour[0] == current[0] or neighbour[1] == current[1] else 4
+            new_score = score + base + usage.get(neighbour, 0)
+
+            if neighbour not in scores or scores[neighbour] > new_score:
+                scores[neighbour] = new_score
+                came_from[neighbour] = current
+                heapq.heappush(heap, (new_score + remaining, remaining, neighbour))
+
+    return None
+
+
+class PartialCache:
+    # partial paths made for enemies whose next tile got blocked, kept apart from the pool
+    # keyed by start tile so enemies stuck in the same place share one search
+    # a path is in use while any enemy has it as path.load, the least recently
+    # used paths nobody is on are dropped once there are more than the limit
+
+    def __init__(self, limit=32):
+        # args: limit - how many partial paths to keep before dropping unused ones
+        self.limit = limit
+        # start point to path, oldest used first
+        self.paths = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.paths)
+
+    def get(self, start):
+        # finds the partial path starting at a point and marks it as just used
+        # args: start - the start point
+        # returns: the path, or none if there isnt one
+        path = self.paths.get(start)
+        if path is not None:
+            self.paths.move_to_end(start)
+            self.hits += 1
+
+        return path
+
+    def add(self, path):
+        # stores a new partial path then drops old unused ones if over the limit
+        # args: path - the path to keep
+        self.paths[path.start] = path
+        self.misses += 1
+
+        for start in list(self.paths.keys()):
+            if len(self.paths) <= self.limit:
+                break
+
+            old = self.paths[start]
+            if old is not path and old.load <= 0:
+                old.job = None
+                del self.paths[start]
+                self.evictions += 1
+                old.pathfinding.uncount(old)
 
 
 class Pathfinding:
@@ -11,20 +489,66 @@ class Pathfinding:
     # if a turret blocks part of a path the system will try to repair it
     # or recalculate a new route so enemies can keep moving
 
-    def __init__(self, game, collision):
+    # ways Path.search can find routes
+    # astar - tile by tile a star, spread over frames
+    # hierarchical - through the cluster entrance graph in one go, for big grids
+    # jps - a star that jumps along straight lines across open uncrowded floor
+    #       currently slower than astar on the shipped levels, a full pool crowds
+    #       most of the floor and crowded tiles are expanded one at a time
+    SearchModes = ("astar", "hierarchical", "jps")
+
+    def __init__(self, game, collision, workers=None, search_mode="astar"):
         # sets up the pathfinding system
         # args: game - reference to the main game object
         #       collision - handles collision detection for path validation
+        #       workers - none to search in the main loop, or "thread" / "process"
+        #                 to search in the background against a copy of the grid
+        #       search_mode - one of SearchModes
         self.game = game
         self.collision = collision
+        self.search_mode = search_mode
+        # cluster entrance graph, only made for the hierarchical search
+        self.hierarchy = Hierarchy(collision) if search_mode == "hierarchical" else None
+        # full paths from the right edge, enemies spawn on these
         self.pool = []
-        self.partials = 0
+        # paths from wherever enemies got stuck
+        self.partials = PartialCache()
+        self.workers = workers
+        # allowed moves from each tile, shared by every path
+        self.adjacency = Adjacency(collision, game.window.resolution[0])
+        # distance from each tile to the goal, the estimate the tile searches use
+        # the hierarchical search has its own graph so it never builds one
+        self.field = GoalField(self.adjacency) if self.hierarchy is None else None
+        # how many usable finished paths go through each point, none when it needs counting again
+        # kept up to date one path at a time, with the points each path added
+        self.usage = None
+        self.counted = { }
+        # usable full paths enemies can spawn on in pool order, none when it needs finding again
+        # kept up to date one path at a time, with each one's place in the pool
+        self.ready = None
+        self.ready_positions = None
+        self.positions = None
+        # tiles on or next to a used tile, none when it needs finding again
+        self.crowded = None
+        # blocked grid with a ring round it for the jump point search
+        self.walls = None
+        self.walls_version = -1
+        # most background searches waiting at once
+        self.max_jobs = 8
 
     def precompute(self, count):
-        # begins calculating paths in advance so theyre ready when enemies spawn
+        # calculates paths in advance so theyre ready when enemies spawn
+        # without workers the whole pool is searched in one pass, each route
+        # pays for the crowding of the ones before it so they spread out
+        # with workers the searches are left to the background as usual
         # args: count - how many paths to generate for the pool
-        for i in range(count):
-            self.pool.append(Path(self, self.find_start()))
+        paths = [Path(self, self.find_start()) for i in range(count)]
+        self.pool.extend(paths)
+        self.paths_changed()
+
+        if self.workers is None:
+            for path in paths:
+                path.search(None)
 
     def find_start(self):
         # picks a random starting position on the right edge of the screen
@@ -44,53 +568,332 @@ class Pathfinding:
         # couldnt find clear spot so just pick any random position
         return (x, random.randint(0, cells - 1) * self.collision.tile_size)
 
+    def paths_changed(self, path=None):
+        # call whenever a path finishes, changes, restarts or the pool changes
+        # so the ready paths and usage counts follow
+        # args: path - the path that changed, its points are counted again and it
+        #              goes in or out of the ready list, none if the pool changed
+        self.crowded = None
+
+        if path is None:
+            self.ready = None
+            return
+
+        self.uncount(path)
+        if path.done and not path.stale:
+            self.count(path)
+
+        self.update_ready(path)
+
+    def update_ready(self, path):
+        # puts a full path in the ready list or takes it out, keeping pool order
+        # args: path - the path that changed
+        if self.ready is None:
+            return
+
+        position = self.positions.get(path)
+        if position is None:
+            return
+
+        positions = self.ready_positions
+        index = bisect_left(positions, position)
+        present = index < len(positions) and positions[index] == position
+        usable = path.done and not path.stale and path.start[0] >= self.game.window.resolution[0]
+
+        if usable and not present:
+            positions.insert(index, position)
+            self.ready.insert(index, path)
+        elif present and not usable:
+            del positions[index]
+            del self.ready[index]
+
+    def pool_changed(self):
+        # call when paths were put in or taken out of the pool or cache directly
+        # so the usage counts are made again from every path
+        self.paths_changed()
+        self.usage = None
+        self.counted = { }
+
+    def count(self, path):
+        # adds the points of a usable path to the usage counts
+        # args: path - the path to count
+        if self.usage is None:
+            return
+
+        points = set(path.points)
+        self.counted[path] = points
+        self.usage.update(points)
+
+    def uncount(self, path):
+        # takes the points a path added out of the usage counts
+        # args: path - the path that went stale, restarted or was dropped
+        points = self.counted.pop(path, None)
+        if points is None:
+            return
+
+        usage = self.usage
+        for point in points:
+            if usage[point] > 1:
+                usage[point] -= 1
+            else:
+                del usage[point]
+
+        self.crowded = None
+
+    def get_ready(self):
+        # gets the finished full paths enemies can spawn on
+        # found from the whole pool only after it changes, paths_changed keeps it after that
+        # returns: list of paths
+        if self.ready is None:
+            right = self.game.window.resolution[0]
+            self.positions = {path: i for i, path in enumerate(self.pool)}
+            self.ready_positions = [i for i, path in enumerate(self.pool) if path.done and not path.stale and path.start[0] >= right]
+            self.ready = [self.pool[i] for i in self.ready_positions]
+
+        return self.ready
+
+    def is_ready(self):
+        # returns: true if there is at least one full path to spawn enemies on
+        return len(self.get_ready()) > 0
+
+    def get_all_paths(self):
+        # gets every path being followed or searched, partial paths first
+        # returns: list of paths
+        return list(self.partials.paths.values()) + self.pool
+
+    def get_usage(self):
+        # gets how many usable finished paths go through each point
+        # counted from every path only the first time or after pool_changed,
+        # after that paths_changed adds and takes away one path at a time
+        # returns: counter of point to number of paths
+        if self.usage is None:
+            self.usage = Counter()
+            self.counted = { }
+            for path in self.get_all_paths():
+                if path.done and not path.stale:
+                    self.count(path)
+
+        return self.usage
+
     def get_point_usage(self, point):
         # counts how many paths go through a specific point
         # used to avoid crowding too many enemies on the same tiles
         # args: point - the coordinates to check
         # returns: number of paths that pass through this point
-        total = 0
+        return self.get_usage()[point]
+
+    def get_crowded(self):
+        # gets every tile where crowding could change the cost of a move
+        # the jump point search expands these one tile at a time
+        # returns: nested lists [row + 1][column + 1], true on or next to a used
+        #          tile and in the ring of tiles just off the grid
+        if self.crowded is None:
+            collision = self.collision
+            used = np.zeros((collision.height + 2, collision.width + 2), dtype=bool)
+
+            for x, y in self.get_usage():
+                column, row = x // collision.tile_size, y // collision.tile_size
+                if -1 <= column <= collision.width and -1 <= row <= collision.height:
+                    used[row + 1, column + 1] = True
+
+            # grow each used tile by one in every direction
+            crowded = np.ones((collision.height + 2, collision.width + 2), dtype=bool)
+            crowded[1:-1, 1:-1] = False
+            for dy in range(3):
+                for dx in range(3):
+                    crowded[1:-1, 1:-1] |= used[dy:dy + collision.height, dx:dx + collision.width]
+
+            self.crowded = crowded.tolist()
+
+        return self.crowded
+
+    def get_walls(self):
+        # gets the blocked grid with the ring of tiles just off it for the jump point search
+        # returns: nested lists [row + 1][column + 1], true where blocked
+        collision = self.collision
+
+        if self.walls_version != collision.version:
+            rows = collision.get_rows()
+            outside = collision.outside
+            width, height = collision.width, collision.height
+
+            self.walls = [[row * 1000 + column in outside for column in range(-1, width + 1)] for row in (-1, height)]
+            self.walls[1:1] = [[row * 1000 - 1 in outside] + rows[row] + [row * 1000 + width in outside] for row in range(height)]
+            self.walls_version = collision.version
+
+        return self.walls
+
+    def get_overlap(self):
+        # measures how much the full paths in the pool share tiles
+        # returns: 0 when no two paths share a tile, close to 1 when they are all the same
+        right = self.game.window.resolution[0]
+        visits = 0
+        tiles = set()
 
         for path in self.pool:
-            if path.done and point in path.points:
-                total += 1
+            if path.done and not path.stale and path.start[0] >= right:
+                points = [point for point in path.points if 0 <= point[0] < right]
+                visits += len(points)
+                tiles.update(points)
 
-        return total
+        return 1 - len(tiles) / visits if visits > 0 else 0
     
     def update(self):
         # continues calculating any unfinished paths
         # call this every frame to gradually build up the path pool
-        for path in self.pool:
+        if self.workers is not None:
+            self.update_workers()
+            return
+
+        for path in self.get_all_paths():
             if not path.done:
                 path.search()
                 return
 
+    def update_workers(self):
+        # collects finished background searches and hands out new ones
+        # results are checked against the collision grid version they were made for
+        paths = self.get_all_paths()
+        jobs = 0
+        for path in paths:
+            if path.job is not None and path.job.done():
+                self.finish_job(path)
+
+            if path.job is not None:
+                jobs += 1
+
+        for path in paths:
+            if jobs >= self.max_jobs:
+                return
+
+            # a search that found no route is only retried once the grid changes
+            if path.job is None and (not path.done or path.stale) and path.job_version != self.collision.version:
+                self.submit_job(path)
+                jobs += 1
+
+    def submit_job(self, path):
+        # starts a background search for a path using a copy of the current grid
+        # args: path - the path that needs calculating
+        # the path being searched is never done and usable so it isnt counted
+        usage = self.get_usage()
+
+        # the field is copied since patches change it in place while the search runs
+        distances = None
+        if self.field is not None:
+            self.field.refresh()
+            distances = [row[:] for row in self.field.distances]
+
+        path.job_version = self.collision.version
+        path.job = get_executor(self.workers).submit(
+            search_grid,
+            frozenset(self.collision.blocked_tiles),
+            dict(usage),
+            path.start,
+            path.res,
+            self.game.window.resolution[0],
+            distances,
+        )
+
+    def finish_job(self, path):
+        # takes the result of a background search
+        # if the grid changed since the search started the result is only kept
+        # when none of its points got blocked, otherwise it is searched again
+        # args: path - the path whose search finished
+        job = path.job
+        path.job = None
+
+        try:
+            points = job.result()
+        except Exception as e:
+            print("Background path search failed:", e)
+            return
+
+        if points is None:
+            return
+
+        if path.job_version != self.collision.version:
+            if any(self.collision.point_blocked(x, y) for x, y in points):
+                path.job_version = -1
+                return
+
+        path.points = points
+        path.corners = None
+        path.done = True
+        path.stale = False
+        self.paths_changed(path)
+
+    def close(self):
+        # cancels background searches that havent started so they dont run for a level thats gone
+        # searches already running finish in the background and their results are dropped
+        for path in self.get_all_paths():
+            if path.job is not None:
+                path.job.cancel()
+                path.job = None
+
     def get_path(self):
-        # selects a random path from the pool for a newly spawned enemy
-        # tries to find a completed path but will create a partial one if needed
+        # selects a path from the pool for a newly spawned enemy
+        # picks the ready path with the fewest enemies on it, ties broken randomly
+        # one pass over the ready list since loads change with every spawn and death
+        # only makes a partial path if nothing is ready, Wave waits for is_ready to avoid that
         # returns: a path object the enemy can follow
-        attempts = 500
-        while attempts > 0:
-            attempts -= 1
+        ready = self.get_ready()
+        if len(ready) == 0:
+            return self.get_partial_path(self.find_start())[0]
+
+        lowest = min(path.load for path in ready)
+        return random.choice([path for path in ready if path.load == lowest])
+
+    def get_paths(self, count):
+        # picks paths for a whole batch of enemies at once
+        # finished paths are found in one pass over the pool and handed out
+        # to whichever path has the fewest enemies on it so load stays even
+        # args: count - how many enemies need a path
+        # returns: list of paths, one per enemy
+        ready = self.get_ready()
 
-            path = self.pool[random.randint(self.partials, len(self.pool) - 1)] 
-            
-            if path.done and path.start[0] >= self.game.window.resolution[0]:
-                return path
+        if len(ready) == 0:
+            return [self.get_path() for i in range(count)]
+
+        # heap of (enemies assigned, tie breaker, pool position)
+        # ties are broken randomly so equal paths share the batch evenly
+        heap = [(path.load, random.random(), i) for i, path in enumerate(ready)]
+        heapq.heapify(heap)
+
+        paths = []
+        for i in range(count):
+            load, order, index = heapq.heappop(heap)
+            paths.append(ready[index])
+            heapq.heappush(heap, (load + 1, random.random(), index))
 
-        return self.get_partial_path(self.find_start())[0]
+        return paths
 
     def repair(self, point):
         # called when a player places a turret and blocks part of a path
         # tries to fix all affected paths or restarts their calculation
         # args: point - the coordinates that just got blocked
-        for path in self.pool:
-            # fix any completed paths that go through this blocked point
-            if path.done and point in path.points:
-                path.repair(point)
+        self.repair_many([point])
+
+    def repair_many(self, points):
+        # fixes every path touched by a group of newly blocked points
+        # each path is checked once against the whole group so a batch of
+        # blocked tiles costs about the same as one
+        # args: points - list of coordinates that just got blocked
+        dirty = set(points)
+
+        for path in self.get_all_paths():
+            # fix any completed paths that go through the blocked points
+            if path.done and not path.stale:
+                for point in [point for point in path.points if point in dirty]:
+                    # an earlier fix in this batch may have already routed around it
+                    if point in path.points:
+                        path.repair(point)
+
+                    # gave up patching and started a new search
+                    if not path.done or path.stale:
+                        break
 
-            # restart any paths that were considering this point during calculation
-            if not path.done and (point in path.open_set or point in path.closed_set):
+            # restart any paths that were considering these points during calculation
+            elif not path.done and not (dirty.isdisjoint(path.open_set) and dirty.isdisjoint(path.closed_set)):
                 path.start_search()
 
     def get_partial_path(self, point):
@@ -98,34 +901,91 @@ class Pathfinding:
         # used when an enemy gets stuck and needs a new route from their current position
         # args: point - the coordinates where the enemy is currently located
         # returns: the path to follow and the immediate next position to move toward
+        # another enemy already got stuck here
+        path = self.partials.get(point)
+        if path is not None:
+            return path, point
+
+        paths = self.get_all_paths()
+
         # check if any existing path goes through this exact spot
-        for path in self.pool:
+        for path in paths:
             if (path.done and point in path.points) or path.start == point:
                 return path, point
 
-        # check if any path goes through a neighboring tile
-        for neighbour in self.pool[0].get_neighbours(point):
-            for path in self.pool:
+        # check if any path starts at or goes through a neighboring tile
+        for neighbour in self.adjacency.get_neighbours(point):
+            path = self.partials.get(neighbour)
+            if path is not None:
+                return path, neighbour
+
+            for path in paths:
                 if path.done and neighbour in path.points:
                     return path, neighbour
 
         # no existing path works so create a brand new one
         path = Path(self, point)
-        self.pool.insert(0, path)
-        self.partials += 1
+        self.partials.add(path)
+        self.paths_changed(path)
         return path, point
 
+    def get_state(self):
+        # gets something that changes whenever the usable full paths could have changed
+        # used to know when things built from the paths need rebuilding
+        # returns: tuple of the grid version and which full paths are usable
+        right = self.game.window.resolution[0]
+
+        return (self.collision.version, len(self.pool)) + tuple(path.done and not path.stale for path in self.pool if path.start[0] >= right)
+
     def is_critical(self, point):
         # checks if blocking this point would make it impossible for enemies to reach the goal
         # prevents players from completely blocking all possible paths
         # args: point - the coordinates to check
         # returns: true if blocking this would trap all enemies false if theres another way
-        for path in self.pool:
-            if path.done and path.start[0] >= self.game.window.resolution[0] and point not in path.points:
+        for path in self.get_ready():
+            if point not in path.points:
                 return False
 
         return True
 
+    def can_block_all(self, points):
+        # checks if several points could be blocked together and enemies still reach the goal
+        # unlike is_critical this doesnt rely on the paths, which arent repaired
+        # until the points are really blocked, so tiles can be picked before a batch
+        # args: points - list of coordinates that would all be blocked
+        # returns: true if a full path would still have a route
+        ready = self.get_ready()
+
+        # a finished path missing every point is still a route
+        for path in ready:
+            if set(points).isdisjoint(path.points):
+                return True
+
+        collision = self.collision
+        res = collision.tile_size
+        right = self.game.window.resolution[0]
+        blocked = set(collision.blocked_tiles)
+        blocked.update(collision.point_to_index(*point) for point in points)
+
+        def is_blocked(x, y):
+            return (y // res) * 1000 + (x // res) in blocked
+
+        # flood out from where the full paths start, staying within a tile of the grid
+        seen = {path.start for path in ready}
+        stack = list(seen)
+        while len(stack) > 0:
+            current = stack.pop()
+            if current[0] < 0:
+                return True
+
+            for neighbour in grid_neighbours(current, is_blocked, res, right):
+                if neighbour in seen or not (-res <= neighbour[1] <= collision.height * res):
+                    continue
+                seen.add(neighbour)
+                stack.append(neighbour)
+
+        return False
+
 
 class Path:
     #represents one route from the right side of the screen to the left goal
@@ -142,100 +1002,370 @@ class Path:
         self.collision = self.pathfinding.collision
         self.res = self.collision.tile_size
         self.points = None
+        # positions in points where the path turns, enemies walk straight between them
+        # with the position of every point, none until next needs them
+        # worked out again when the grid changes as a straight line may now be blocked
+        self.corners = None
+        self.corners_version = -1
+        self.indices = None
+        # how many enemies are currently following this path
+        self.load = 0
+        # background search state, only used when pathfinding has workers
+        # a stale path keeps its old points for enemies until the new ones arrive
+        self.job = None
+        self.job_version = -1
+        self.stale = False
+        self.done = False
         self.start_search()
 
     def next(self, current):
         # gets the next waypoint an enemy should move toward
+        # waypoints are the corners of the path so enemies walk straight lines
+        # any point on the tile path leads to the first corner after it
         # args: current - where the enemy is right now
         # returns: the next coordinates to move to or false if we reached the end
-        if current not in self.points:
-            return False
+        if self.corners is None or self.corners_version != self.collision.version:
+            self.compress()
 
-        index = self.points.index(current)
-        length = len(self.points)
+        index = self.indices.get(current)
+        if index is None:
+            return False
 
-        if index + 1 == length:
+        position = bisect_right(self.corners, index)
+        if position == len(self.corners):
             return False
 
-        return self.points[index + 1]
+        return self.points[self.corners[position]]
+
+    def get_steps_left(self, point):
+        # counts how many steps along the path a point still is from the goal
+        # args: point - a point on the path
+        # returns: number of steps, or none if the point isnt on the path
+        if self.points is None:
+            return None
+
+        if self.corners is None or self.corners_version != self.collision.version:
+            self.compress()
+
+        index = self.indices.get(point)
+        return None if index is None else len(self.points) - 1 - index
+
+    def compress(self):
+        # finds the corners of the path by string pulling
+        # from each corner the furthest point a straight clear line reaches becomes
+        # the next corner, found by doubling the distance then halving back
+        # so a long straight run takes a few checks instead of one per tile
+        # the tile points are kept as they are for repairs and crowding
+        points = self.points
+        self.corners_version = self.collision.version
+        self.indices = { }
+        for index in range(len(points) - 1, -1, -1):
+            self.indices[points[index]] = index
+
+        last = len(points) - 1
+        self.corners = [0]
+        while self.corners[-1] < last:
+            corner = self.corners[-1]
+            # the next point is always reachable, it is one step along the path
+            clear, step = corner + 1, 1
+
+            while clear + step <= last and self.collision.line_clear(points[corner], points[clear + step]):
+                clear += step
+                step *= 2
+
+            blocked = min(clear + step, last + 1)
+            while blocked - clear > 1:
+                middle = (clear + blocked) // 2
+                if self.collision.line_clear(points[corner], points[middle]):
+                    clear = middle
+                else:
+                    blocked = middle
+
+            self.corners.append(clear)
 
     def start_search(self):
         # resets all variables and begins calculating the path from scratch
+        # with background workers a finished path is only marked stale
+        # so enemies already on it keep walking until the new route arrives
+        if self.pathfinding.workers is not None and self.done:
+            self.stale = True
+            self.job = None
+            self.pathfinding.paths_changed(self)
+            return
+
         self.done = False
+        self.pathfinding.paths_changed(self)
         self.closed_set = set()
         self.open_set = {self.start}
         self.scores = {self.start: 0}
         self.came_from = { }
+        self.build_heap()
 
-    def search(self):
+    def search(self, iterations=25):
         # runs a few iterations of the a star pathfinding algorithm
         # called repeatedly each frame until the path is complete
-        iterations = 25
-        while len(self.open_set) > 0 and iterations > 0:
-            iterations -= 1
+        # the estimate is the goal distance field, exact on an uncrowded grid
+        # but crowding isnt in it so later paths in a busy pool explore more
+        # the grid, usage and field cant change part way through so they are looked up once
+        # args: iterations - most points to explore, none to keep going until done
+        pathfinding = self.pathfinding
+        if pathfinding.hierarchy is not None:
+            self.search_hierarchy()
+            return
+
+        if pathfinding.search_mode == "jps":
+            self.search_jump(iterations)
+            return
 
+        collision = self.collision
+        field = pathfinding.field
+        field.refresh()
+        distances = field.distances
+        usage = pathfinding.get_usage()
+        get_neighbours = pathfinding.adjacency.get_neighbours
+        res, width, height = collision.tile_size, collision.width, collision.height
+        scores, open_set, closed_set, open_heap = self.scores, self.open_set, self.closed_set, self.open_heap
+
+        while len(open_heap) > 0 and (iterations is None or iterations > 0):
             # pick the most promising point to explore next
-            current, current_score = self.get_lowest_score(self.open_set, self.scores)
+            estimate, remaining, current = heapq.heappop(open_heap)
+
+            # skip entries left behind when a point was given a better score
+            if current not in open_set or estimate != scores[current] + remaining:
+                continue
+
+            if iterations is not None:
+                iterations -= 1
+            current_score = scores[current]
 
             # if we reached the left edge were done
             if current[0] < 0:
                 self.points = self.trace_path(current, self.came_from)
+                self.corners = None
                 self.done = True
+                pathfinding.paths_changed(self)
                 return
 
             # mark this point as being explored
-            self.open_set.remove(current)
+            open_set.remove(current)
 
             # add to the list of already checked points
-            self.closed_set.add(current)
+            closed_set.add(current)
 
             # look at all adjacent tiles
-            for neighbour in self.get_neighbours(current):
+            for neighbour in get_neighbours(current):
 
                 # dont recheck points weve already fully explored
-                if neighbour in self.closed_set:
+                if neighbour in closed_set:
+                    continue
+
+                # no route to the goal from here so theres no point looking
+                column, row = neighbour[0] // res, neighbour[1] // res
+                if 0 <= column < width and 0 <= row < height:
+                    remaining = distances[row][column]
+                else:
+                    remaining = field_estimate(distances, column, row)
+                if remaining >= GoalField.Unreachable:
+                    continue
+
+                # same as get_cost, 3 straight 4 diagonal plus crowding
+                base = 3 if current[0] == neighbour[0] or current[1] == neighbour[1] else 4
+                score = current_score + base + usage.get(neighbour, 0)
+
+                if neighbour not in open_set or scores[neighbour] > score:
+                    scores[neighbour] = score
+                    self.came_from[neighbour] = current
+                    open_set.add(neighbour)
+                    heapq.heappush(open_heap, (score + remaining, remaining, neighbour))
+
+    def search_hierarchy(self):
+        # finds the whole path at once through the cluster entrance graph
+        # crowding only changes the tiles picked inside each cluster
+        # if there is no route the open set is emptied so it isnt tried again every frame
+        if len(self.open_set) == 0:
+            return
+
+        points = self.pathfinding.hierarchy.find_path(self.start, self.pathfinding.get_usage())
+        self.open_set = set()
+        self.open_heap = []
+
+        if points is not None:
+            self.points = points
+            self.corners = None
+            self.done = True
+            self.pathfinding.paths_changed(self)
+
+    def search_jump(self, iterations=25):
+        # runs a few iterations of a star with jump point search
+        # on open uncrowded floor every route of the same length costs the same,
+        # so instead of adding each neighbour a point follows a direction until it
+        # hits a wall or finds a turn it cant skip and only that point is added
+        # points near crowding, off the grid or with no parent to give a direction
+        # are expanded one tile at a time like the plain search
+        # args: iterations - most points to explore, none to keep going until done
+        pathfinding = self.pathfinding
+        collision = self.collision
+        field = pathfinding.field
+        field.refresh()
+        distances = field.distances
+        usage = pathfinding.get_usage()
+        get_neighbours = pathfinding.adjacency.get_neighbours
+        res, width, height = self.res, collision.width, collision.height
+        scores, open_set, closed_set, open_heap = self.scores, self.open_set, self.closed_set, self.open_heap
+
+        # part way through a batch the grid and outside tiles arent up to date
+        if collision.changed:
+            walls = None
+        else:
+            walls = pathfinding.get_walls()
+            crowded = pathfinding.get_crowded()
+
+        while len(open_heap) > 0 and (iterations is None or iterations > 0):
+            estimate, remaining, current = heapq.heappop(open_heap)
+
+            if current not in open_set or estimate != scores[current] + remaining:
+                continue
+
+            if iterations is not None:
+                iterations -= 1
+            current_score = scores[current]
+
+            if current[0] < 0:
+                self.points = self.fill_jumps(self.trace_path(current, self.came_from))
+                self.corners = None
+                self.done = True
+                pathfinding.paths_changed(self)
+                return
+
+            open_set.remove(current)
+            closed_set.add(current)
+
+            column, row = current[0] // res, current[1] // res
+            parent = self.came_from.get(current)
+
+            # pairs of point and how many steps away in a straight line it is
+            if walls is None or parent is None or not (0 <= column < width and 0 <= row < height) or crowded[row + 1][column + 1]:
+                successors = [(neighbour, 1) for neighbour in get_neighbours(current)]
+            else:
+                successors = []
+                for dx, dy in self.get_jump_directions(current, parent):
+                    jump = self.jump(column, row, dx, dy, walls, crowded)
+                    if jump is not None:
+                        successors.append(((jump[0] * res, jump[1] * res), jump[2]))
+
+            for neighbour, steps in successors:
+                if neighbour in closed_set:
                     continue
 
-                score = current_score + self.get_cost(current, neighbour)
-                exists = (neighbour in self.open_set)
+                column, row = neighbour[0] // res, neighbour[1] // res
+                if 0 <= column < width and 0 <= row < height:
+                    remaining = distances[row][column]
+                else:
+                    remaining = field_estimate(distances, column, row)
+                if remaining >= GoalField.Unreachable:
+                    continue
+
+                base = 3 if neighbour[0] == current[0] or neighbour[1] == current[1] else 4
+                score = current_score + steps * base + usage.get(neighbour, 0)
 
-                if not exists or self.scores[neighbour] > score:
-                    self.scores[neighbour] = score
+                if neighbour not in open_set or scores[neighbour] > score:
+                    scores[neighbour] = score
                     self.came_from[neighbour] = current
+                    open_set.add(neighbour)
+                    heapq.heappush(open_heap, (score + remaining, remaining, neighbour))
+
+    def get_jump_directions(self, current, parent):
+        # gets the directions worth jumping in after arriving from a parent
+        # the rest are reached just as cheaply without going through this point
+        # args: current - the point being expanded
+        #       parent - the point it was reached from
+        # returns: list of (dx, dy) in tiles
+        dx = (current[0] > parent[0]) - (current[0] < parent[0])
+        dy = (current[1] > parent[1]) - (current[1] < parent[1])
+
+        if dx != 0 and dy != 0:
+            return [(dx, 0), (0, dy), (dx, dy)]
+
+        # diagonals dont cut corners so a wall beside a straight run can hide
+        # a turn, the sideways moves are always kept to find those
+        if dx != 0:
+            return [(dx, 0), (dx, -1), (dx, 1), (0, -1), (0, 1)]
+        return [(0, dy), (-1, dy), (1, dy), (-1, 0), (1, 0)]
+
+    def jump(self, column, row, dx, dy, walls, crowded):
+        # follows one direction until reaching a point that has to be expanded
+        # that is a point off the grid, near crowding, or beside a wall corner
+        # where a turn becomes possible that couldnt be made before
+        # args: column, row - tile to jump from
+        #       dx, dy - direction in tiles
+        #       walls - grid from Pathfinding.get_walls
+        #       crowded - grid from Pathfinding.get_crowded
+        # returns: tuple of column, row and steps taken, or none if a wall is hit first
+        # both grids have a ring of tiles round them so work one along from the tile
+        x, y = column + 1, row + 1
+        steps = 0
+
+        while True:
+            if walls[y + dy][x + dx]:
+                return None
+            if dx != 0 and dy != 0 and (walls[y][x + dx] or walls[y + dy][x]):
+                return None
 
-                if not exists:
-                    self.open_set.add(neighbour)
+            x, y = x + dx, y + dy
+            steps += 1
 
-    def get_lowest_score(self, open_set, scores):
-        # finds which point in the open set has the best score
-        # lower scores mean shorter estimated distance to goal
-        # args: open_set - all points we havent fully explored yet
-        #       scores - dictionary mapping each point to its calculated score
-        # returns: the best point to explore next and its score value
-        lowest_score = 999999999
-        lowest_point = (0, 0)
+            if crowded[y][x]:
+                return x - 1, y - 1, steps
 
-        for p in open_set:
-            score = scores[p]
+            if dx != 0 and dy != 0:
+                # a diagonal stops where either of its straight parts would
+                if self.jump(x - 1, y - 1, dx, 0, walls, crowded) is not None or self.jump(x - 1, y - 1, 0, dy, walls, crowded) is not None:
+                    return x - 1, y - 1, steps
+            elif dx != 0:
+                if (not walls[y - 1][x] and walls[y - 1][x - dx]) or (not walls[y + 1][x] and walls[y + 1][x - dx]):
+                    return x - 1, y - 1, steps
+            else:
+                if (not walls[y][x - 1] and walls[y - dy][x - 1]) or (not walls[y][x + 1] and walls[y - dy][x + 1]):
+                    return x - 1, y - 1, steps
 
-            if lowest_score > score:
-                lowest_score = score
-                lowest_point = p
+    def fill_jumps(self, points):
+        # puts back the tiles skipped by each jump so the path is one tile per step
+        # args: points - jump points from trace_path
+        # returns: list of every point along the path
+        res = self.res
+        filled = [points[0]]
 
-        return lowest_point, lowest_score
+        for point in points[1:]:
+            x, y = filled[-1]
+            dx = (point[0] > x) - (point[0] < x)
+            dy = (point[1] > y) - (point[1] < y)
+            steps = max(abs(point[0] - x), abs(point[1] - y)) // res
+            filled += [(x + dx * res * step, y + dy * res * step) for step in range(1, steps + 1)]
+
+        return filled
+
+    def build_heap(self):
+        # makes the open heap again from the open set and scores
+        # used after they are loaded from a snapshot
+        # the hierarchical search doesnt use it so it stays empty
+        field = self.pathfinding.field
+        self.open_heap = []
+
+        if field is None:
+            return
+
+        for point in self.open_set:
+            remaining = field.get(point)
+            self.open_heap.append((self.scores[point] + remaining, remaining, point))
+
+        heapq.heapify(self.open_heap)
 
     def get_neighbours(self, position):
         # gets all tiles adjacent to the current position that arent blocked
         # includes diagonal movement if both intermediate tiles are clear
         # args: position - the coordinates to find neighbors for
         # returns: list of valid coordinates the enemy could move to next
-        if position[0] >= self.pathfinding.game.window.resolution[0]:
-            return [(position[0] - self.res, position[1])]
-
-        x_diff = range(position[0] - self.res, position[0] + self.res + 1, self.res)
-        y_diff = range(position[1] - self.res, position[1] + self.res + 1, self.res)
-
-        return [(x, y) for x in x_diff for y in y_diff if (x, y) != position and (x == position[0] or y == position[1] or self.can_use_diagonal(position, (x, y))) and not self.collision.point_blocked(x, y)]
+        return self.pathfinding.adjacency.get_neighbours(position)
         
     def can_use_diagonal(self, a, b):
         # checks if an enemy can move diagonally without cutting through walls
@@ -273,6 +1403,7 @@ class Path:
         # tries to fix a path when one of its points gets blocked by a turret
         # looks for alternate routes nearby or recalculates if necessary
         # args: point - the coordinates that are now blocked
+        self.corners = None
         index = self.points.index(point)
 
         if index != 0 and index < len(self.points) - 1:
@@ -285,12 +1416,14 @@ class Path:
             # easiest fix just connect the previous and next points directly
             if next in previous_neighbours:
                 self.points.remove(point)
+                self.pathfinding.paths_changed(self)
                 return
 
             # look for a single tile that connects both points
             for neighbour in previous_neighbours:
                 if neighbour in next_neighbours:
                     self.points[index] = neighbour
+                    self.pathfinding.paths_changed(self)
                     return
 
             # try using two tiles to bridge the gap
@@ -299,6 +1432,7 @@ class Path:
                     if neighbour_neighbour in next_neighbours:
                         self.points[index] = neighbour
                         self.points.insert(index + 1, neighbour_neighbour)
+                        self.pathfinding.paths_changed(self)
                         return
 
         # couldnt find a simple fix so recalculate the whole path
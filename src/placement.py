@@ -0,0 +1,199 @@
+import pygame
+import numpy as np
+
+class PlacementMap:
+    # caches where each defence type can be placed so hover previews are one lookup
+    # blocked maps are patched around tiles in the collision change log
+    # the critical map is rebuilt only when the finished enemy paths change
+
+    def __init__(self, game):
+        # sets up an empty map, it gets built the first time it is used
+        # args: game - reference to the main game object
+        self.game = game
+        self.collision = None
+        self.version = -1
+        # blocked tiles padded past the right and bottom edges so footprints can hang off
+        self.grid = None
+        # per prototype (columns, rows) of tiles covered and a bool array
+        # of tile top lefts where that footprint overlaps something blocked
+        self.sizes = []
+        self.blocked = []
+        # true where blocking a tile would cut off every finished path
+        self.critical = None
+        self.path_state = None
+        self.overlay = None
+        self.overlay_key = None
+
+    def get_size(self, prototype):
+        # works out how many tiles a defence covers the same way rect_blocked does
+        # args: prototype - the defence prototype
+        # returns: tuple of columns and rows
+        tile_size = self.collision.tile_size
+
+        return (
+            len(range(0, prototype.rect.width - 2, tile_size)),
+            len(range(0, prototype.rect.height - 2, tile_size)),
+        )
+
+    def rebuild(self):
+        # builds every map from scratch for the current level
+        collision = self.game.level.collision
+        self.collision = collision
+        self.version = collision.version
+        self.sizes = [self.get_size(prototype) for prototype in self.game.defence_prototypes]
+
+        pad_x = max([size[0] for size in self.sizes] + [1])
+        pad_y = max([size[1] for size in self.sizes] + [1])
+        self.grid = np.zeros((collision.height + pad_y, collision.width + pad_x), dtype=bool)
+
+        for index in collision.blocked_tiles:
+            self.set_tile(index, True)
+
+        self.blocked = []
+        for columns, rows in self.sizes:
+            blocked = np.zeros((collision.height, collision.width), dtype=bool)
+
+            for y in range(rows):
+                for x in range(columns):
+                    blocked |= self.grid[y:y + collision.height, x:x + collision.width]
+
+            self.blocked.append(blocked)
+
+        self.path_state = None
+
+    def set_tile(self, index, value):
+        # writes one tile into the padded grid, ignoring tiles outside it
+        # args: index - tile index made by Collision.point_to_index
+        #       value - true if the tile is blocked
+        # returns: the tile row and column, or none if outside the grid
+        y, x = divmod(index, 1000)
+
+        if 0 <= y < self.grid.shape[0] and 0 <= x < self.grid.shape[1]:
+            self.grid[y, x] = value
+            return y, x
+
+        return None
+
+    def patch(self, index):
+        # updates the blocked maps around one changed tile
+        # only footprints that could cover the tile are looked at again
+        # args: index - tile index that was blocked or unblocked
+        tile = self.set_tile(index, index in self.collision.blocked_tiles)
+        if tile is None:
+            return
+
+        height, width = self.collision.height, self.collision.width
+        for (columns, rows), blocked in zip(self.sizes, self.blocked):
+            for y in range(max(tile[0] - rows + 1, 0), min(tile[0] + 1, height)):
+                for x in range(max(tile[1] - columns + 1, 0), min(tile[1] + 1, width)):
+                    blocked[y, x] = self.grid[y:y + rows, x:x + columns].any()
+
+    def build_critical(self):
+        # marks tiles that every finished full path goes through
+        # same answer as Pathfinding.is_critical for each tile top left
+        # returns: bool array of shape (height, width)
+        collision = self.collision
+        right = self.game.window.resolution[0]
+        critical = np.ones((collision.height, collision.width), dtype=bool)
+
+        for path in self.game.level.pathfinding.pool:
+            if not path.done or path.stale or path.start[0] < right:
+                continue
+
+            used = np.zeros_like(critical)
+            for x, y in path.points:
+                if x % collision.tile_size == 0 and y % collision.tile_size == 0:
+                    column, row = x // collision.tile_size, y // collision.tile_size
+                    if 0 <= column < collision.width and 0 <= row < collision.height:
+                        used[row, column] = True
+
+            critical &= used
+
+        return critical
+
+    def refresh(self):
+        # brings the maps up to date with the collision grid and the path pool
+        collision = self.game.level.collision
+
+        if collision is not self.collision or len(self.sizes) != len(self.game.defence_prototypes):
+            self.rebuild()
+
+        elif self.version != collision.version:
+            changes = collision.changes_since(self.version)
+
+            if changes is None:
+                self.rebuild()
+            else:
+                for index in set(changes):
+                    self.patch(index)
+                self.version = collision.version
+
+        state = self.game.level.pathfinding.get_state()
+        if state != self.path_state:
+            self.critical = self.build_critical()
+            self.path_state = state
+
+    def is_affordable(self, type):
+        # args: type - index into defence_prototypes
+        # returns: true if the player has enough money for this defence
+        return self.game.level.money >= self.game.defence_prototypes[type].cost
+
+    def can_place(self, type, x, y):
+        # checks if a defence could be placed at a position without running the full checks
+        # matches what place_defence allows
+        # args: type - index into defence_prototypes
+        #       x - horizontal position in pixels
+        #       y - vertical position in pixels
+        # returns: true if placing there would work
+        self.refresh()
+        column, row = x // self.collision.tile_size, y // self.collision.tile_size
+
+        if not (0 <= column < self.collision.width and 0 <= row < self.collision.height):
+            return False
+
+        if not self.is_affordable(type) or self.blocked[type][row, column]:
+            return False
+
+        if self.game.defence_prototypes[type].block and self.critical[row, column]:
+            return False
+
+        return True
+
+    def get_invalid(self, type):
+        # gets every tile a defence type cant be placed on
+        # args: type - index into defence_prototypes
+        # returns: bool array of shape (height, width)
+        self.refresh()
+        invalid = self.blocked[type].copy()
+
+        if self.game.defence_prototypes[type].block:
+            invalid |= self.critical
+
+        if not self.is_affordable(type):
+            invalid[:] = True
+
+        return invalid
+
+    def get_overlay(self, type):
+        # gets a see through red surface over tiles a defence type cant use
+        # only redrawn when the maps or the selected type change
+        # args: type - index into defence_prototypes
+        # returns: a screen sized surface
+        self.refresh()
+        key = (type, self.version, self.path_state, self.is_affordable(type))
+
+        if key != self.overlay_key:
+            tile_size = self.collision.tile_size
+            invalid = self.get_invalid(type)
+
+            # one pixel per tile then scaled up, surfarray wants [x, y]
+            small = pygame.Surface((self.collision.width, self.collision.height), pygame.SRCALPHA)
+            small.fill((200, 40, 40, 0))
+            alpha = pygame.surfarray.pixels_alpha(small)
+            alpha[:] = invalid.T * 70
+            del alpha
+
+            self.overlay = pygame.transform.scale(small, (self.collision.width * tile_size, self.collision.height * tile_size))
+            self.overlay_key = key
+
+        return self.overlay
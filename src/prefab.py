@@ -1,16 +1,63 @@
 from pygame.sprite import Sprite
 from pygame.rect import Rect
+from src.atlas import Atlas
 import pygame
 
+# marks a shared config value that every prefab file of that class has to set
+Required = object()
+
+
+class Shared:
+    # a config value read straight from the cached config of an objects prefab type
+    # declared on the class so the value is stored once per type, not on every object
+    # read only, an object keeps anything it changes in its own __slots__ instead
+
+    def __init__(self, default=Required):
+        # args: default - value used when the prefab file leaves it out
+        self.default = default
+
+    def __set_name__(self, owner, name):
+        self.key = name
+
+    def __get__(self, obj, owner):
+        if obj is None:
+            return self
+
+        value = obj.config.get(self.key, self.default)
+        if value is Required:
+            raise AttributeError(self.key)
+
+        return value
+
 
 class Prefab(Sprite):
     # a game object loaded from a config file
     # prefab files define properties like images stats and behavior
     # each prefab type is cached so we only load it once
+    # changing state is kept in __slots__, config values declared as Shared on the class
+    # are read from the cached config and any others go in the instance dictionary
+    # (pygame sprites always have one, used mostly by menus)
+
+    __slots__ = ("rect", "image", "anim_change_time", "anim_index", "name", "config")
 
     # stores loaded prefab configs so we dont reload them
     Cache = { }
 
+    # names of the Shared values each class has, those are never copied onto objects
+    SharedKeys = { }
+
+    # loaded images are packed onto shared pages, solid and see through kept apart
+    Atlases = { False: Atlas(False), True: Atlas(True) }
+
+    # config values every kind of prefab can have
+    display_name = Shared()
+    anim_source = Shared(None)
+    anim_loop = Shared(False)
+    anim_rate = Shared()
+    anim_count = Shared()
+    block = Shared(False)
+    flash_offset = Shared(None)
+
     def __init__(self, name, x, y):
         # creates a new prefab by loading its config file
         # sets up position and initializes animations if needed
@@ -19,18 +66,17 @@ class Prefab(Sprite):
         #       y - vertical spawn position
         super().__init__()
 
-        self.name = name
-        self.config = self.load_config(name)
-        self.apply_config(self.config)
+        self.image = None
+        self.apply_config(name, self.load_config(name))
 
         # set up animation system if this prefab has animated sprites
-        if hasattr(self, "anim_source"):
+        if self.anim_source is not None:
             self.anim_change_time = self.anim_rate
             self.anim_index = 0
             self.image = self.anim_source[0]
 
         # Handle sprite images
-        if hasattr(self, "image"):
+        if self.image is not None:
             self.rect = self.image.get_rect()
             self.rect.x = x
             self.rect.y = y
@@ -41,7 +87,7 @@ class Prefab(Sprite):
         # advances animation frames based on time
         # loops or destroys object when animation finishes
         # args: delta - time in seconds since last frame
-        if hasattr(self, "anim_source"):
+        if self.anim_source is not None:
             self.anim_change_time -= delta
 
             if self.anim_change_time < 0:
@@ -51,13 +97,21 @@ class Prefab(Sprite):
                 if self.anim_index == len(self.anim_source):
                     self.anim_index = 0
 
-                    if not hasattr(self, "anim_loop") or not self.anim_loop:
+                    if not self.anim_loop:
                         self.kill()
 
                 self.image = self.anim_source[self.anim_index]
 
 
-    def load_config(self, name):
+    @staticmethod
+    def clear_cache():
+        # forgets every loaded prefab and empties the atlas pages
+        # so the next load reads everything from disk again
+        Prefab.Cache.clear()
+        Prefab.Atlases = { False: Atlas(False), True: Atlas(True) }
+
+    @staticmethod
+    def load_config(name):
         # loads a prefab config file and parses all its properties
         # caches the result so we dont reload the same file multiple times
         # args: name - prefab filename without extension
@@ -84,16 +138,16 @@ class Prefab(Sprite):
                     elif type == "bool":
                         entries[key] = (value == "1")
                     elif type == "img":
-                        entries[key] = pygame.image.load(value).convert()
+                        entries[key] = Prefab.Atlases[False].pack(pygame.image.load(value).convert())
                     elif type == "aimg":
-                        entries[key] = pygame.image.load(value).convert_alpha()
+                        entries[key] = Prefab.Atlases[True].pack(pygame.image.load(value).convert_alpha())
                     elif type == "font":
                         entries[key] = pygame.font.Font(pygame.font.match_font(value, "font_bold" in entries.keys()), entries["font_size"])
                     elif type == "spritesheet":
-                        entries[key] = [pygame.image.load(value + str(i) + ".png").convert_alpha() for i in range(entries["anim_count"])]
+                        entries[key] = Prefab.Atlases[True].pack_all([pygame.image.load(value + str(i) + ".png").convert_alpha() for i in range(entries["anim_count"])])
                     elif type == "rotimg":
                         original = pygame.image.load(value).convert_alpha()
-                        entries[key] = [original] + [pygame.transform.rotate(original, angle) for angle in range(5, 361, 5)]
+                        entries[key] = Prefab.Atlases[True].pack_all([original] + [pygame.transform.rotate(original, angle) for angle in range(5, 361, 5)])
 
         except OSError:
             print("Could not read prefab " + name)
@@ -101,9 +155,26 @@ class Prefab(Sprite):
         Prefab.Cache[name] = entries
         return entries
 
-    def apply_config(self, config):
-        # takes all properties from config file and sets them on this object
-        # makes the prefab data become actual object attributes
-        # args: config - dictionary of property names and values
-        for name in config.keys():
-            setattr(self, name, config[name])
+    @staticmethod
+    def get_shared_keys(cls):
+        # gets the names of every Shared config value a class has
+        # args: cls - the prefab class like Enemy or Bullet
+        # returns: set of names
+        if cls not in Prefab.SharedKeys:
+            Prefab.SharedKeys[cls] = {key for key in dir(cls) if isinstance(getattr(cls, key, None), Shared)}
+
+        return Prefab.SharedKeys[cls]
+
+    def apply_config(self, name, config):
+        # links this object to the cached config of its prefab type
+        # Shared values are read from there, the rest like images kept in __slots__
+        # are set on the object so it can change its own copy
+        # args: name - prefab name
+        #       config - dictionary of property names and values
+        self.name = name
+        self.config = config
+
+        shared = Prefab.get_shared_keys(type(self))
+        for key, value in config.items():
+            if key not in shared:
+                setattr(self, key, value)
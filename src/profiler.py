@@ -0,0 +1,203 @@
+import json
+import time
+from collections import deque
+
+
+class ProfilerScope:
+    # times one section of a frame, used with a with statement
+    # created by Profiler.scope only while profiling is turned on
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_time(self.name, self.start, time.perf_counter())
+        return False
+
+
+class NullScope:
+    # does nothing, handed out while profiling is off so timing costs almost nothing
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Profiler:
+    # measures how long each part of the main loop takes
+    # keeps rolling frame times for percentiles, per section times and entity counts
+    # can write everything it recorded as chrome trace event json (chrome://tracing)
+
+    Null = NullScope()
+
+    def __init__(self, history=300, trace_limit=200000):
+        # sets up the profiler turned off
+        # args: history - how many frames to keep for the rolling stats
+        #       trace_limit - how many trace events to keep before dropping the oldest
+        self.enabled = False
+        self.frame_times = deque(maxlen=history)
+        self.sections = { }
+        self.history = history
+        self.counts = { }
+        self.events = deque(maxlen=trace_limit)
+        # (time, simulation steps) per frame for working out steps per second
+        self.steps = deque(maxlen=history)
+        self.time_scale = 1
+        self.frame = 0
+        self.frame_start = 0
+        self.origin = time.perf_counter()
+
+    def toggle(self):
+        # turns profiling on or off, clearing old stats when turned on
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.reset()
+
+    def reset(self):
+        # clears every recorded frame section count and trace event
+        self.frame_times.clear()
+        self.sections = { }
+        self.counts = { }
+        self.events.clear()
+        self.steps.clear()
+
+    def scope(self, name):
+        # gets a timer for one section of the frame
+        # args: name - section name shown in the overlay and trace
+        # returns: context manager that records the time spent inside it
+        if not self.enabled:
+            return Profiler.Null
+
+        return ProfilerScope(self, name)
+
+    def add_time(self, name, start, end):
+        # records how long a section took
+        # args: name - section name
+        #       start - perf_counter value when the section began
+        #       end - perf_counter value when the section finished
+        if name not in self.sections:
+            self.sections[name] = deque(maxlen=self.history)
+        self.sections[name].append((end - start) * 1000)
+
+        self.events.append({
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.origin) * 1000000,
+            "dur": (end - start) * 1000000,
+            "pid": 0,
+            "tid": 0,
+        })
+
+    def begin_frame(self):
+        # marks the start of a frame
+        if self.enabled:
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        # marks the end of a frame and records its total time
+        self.frame += 1
+        if not self.enabled:
+            return
+
+        end = time.perf_counter()
+        self.frame_times.append((end - self.frame_start) * 1000)
+        self.events.append({
+            "name": "frame",
+            "ph": "X",
+            "ts": (self.frame_start - self.origin) * 1000000,
+            "dur": (end - self.frame_start) * 1000000,
+            "pid": 0,
+            "tid": 1,
+        })
+
+    def add_steps(self, steps, time_scale):
+        # records how many simulation steps ran this frame
+        # args: steps - number of fixed steps run
+        #       time_scale - fast forward speed being asked for
+        self.steps.append((time.perf_counter(), steps))
+        self.time_scale = time_scale
+
+    def steps_per_second(self):
+        # works out how many simulation steps actually ran each second lately
+        # returns: steps per second, 0 if there isnt enough history
+        if len(self.steps) < 2:
+            return 0
+
+        elapsed = self.steps[-1][0] - self.steps[0][0]
+        if elapsed <= 0:
+            return 0
+
+        # the first entry only marks the start of the window
+        return sum(steps for _, steps in list(self.steps)[1:]) / elapsed
+
+    def set_counts(self, counts):
+        # records how many of each kind of entity exist this frame
+        # args: counts - dictionary of name to count
+        self.counts = counts
+        self.events.append({
+            "name": "entities",
+            "ph": "C",
+            "ts": (time.perf_counter() - self.origin) * 1000000,
+            "pid": 0,
+            "args": counts,
+        })
+
+    def percentiles(self, values=None):
+        # works out rolling p50 p95 and p99 times
+        # args: values - list of times in ms, defaults to the frame times
+        # returns: dictionary with p50 p95 and p99 in milliseconds
+        values = sorted(self.frame_times if values is None else values)
+        if len(values) == 0:
+            return {"p50": 0, "p95": 0, "p99": 0}
+
+        def pick(fraction):
+            return values[min(len(values) - 1, int(fraction * len(values)))]
+
+        return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+    def summary(self):
+        # gathers everything recorded into plain data
+        # returns: dictionary with frame percentiles section averages and counts
+        sections = { }
+        for name, times in self.sections.items():
+            stats = self.percentiles(times)
+            stats["mean"] = sum(times) / len(times)
+            sections[name] = stats
+
+        return {
+            "frames": len(self.frame_times),
+            "frame": self.percentiles(),
+            "sections": sections,
+            "counts": dict(self.counts),
+            "sim_steps_per_second": self.steps_per_second(),
+            "time_scale": self.time_scale,
+        }
+
+    def report_lines(self):
+        # builds the text lines shown in the on screen overlay
+        # returns: list of strings
+        frame = self.percentiles()
+        lines = ["Frame ms  p50 {:.2f}  p95 {:.2f}  p99 {:.2f}".format(frame["p50"], frame["p95"], frame["p99"])]
+        lines.append("Sim steps/s {:6.1f}  x{}".format(self.steps_per_second(), self.time_scale))
+
+        for name, times in self.sections.items():
+            if len(times) > 0:
+                lines.append("{:<12} {:6.2f} ms".format(name, sum(times) / len(times)))
+
+        for name, count in self.counts.items():
+            lines.append("{:<12} {:6d}".format(name, count))
+
+        return lines
+
+    def export_trace(self, filename):
+        # writes every recorded event as chrome trace event json
+        # args: filename - where to save the trace
+        with open(filename, "w") as file:
+            json.dump({"traceEvents": list(self.events), "displayTimeUnit": "ms"}, file)
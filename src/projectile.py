@@ -0,0 +1,213 @@
+import math
+import numpy as np
+
+
+class ProjectileSystem:
+    # moves every live bullet together using numpy arrays
+    # bullets are stored as rows of position velocity age life and damage
+    # the bullet sprites are only used for drawing and get synced after each update
+
+    # bullets ignore walls for this long so they can leave the turret that fired them
+    wall_grace = 0.03
+
+    def __init__(self, game):
+        # sets up empty bullet arrays
+        # args: game - reference to the main game object
+        self.game = game
+        # hit radius of each enemy in the target index, made again when the index is
+        self.radii = np.zeros(0)
+        self.radii_enemies = None
+        self.clear()
+
+    def clear(self):
+        # removes every bullet from the system
+        self.sprites = []
+        self.position = np.zeros((0, 2))
+        self.velocity = np.zeros((0, 2))
+        self.age = np.zeros(0)
+        self.life = np.zeros(0)
+        self.damage = np.zeros(0)
+
+        # bullets fired this frame wait here until the next update
+        self.pending = []
+
+    def add(self, sprite, origin, velocity, life, damage):
+        # registers a new bullet with the system
+        # args: sprite - the bullet sprite that gets drawn
+        #       origin - starting centre position
+        #       velocity - x and y speed in pixels per second
+        #       life - how long the bullet lives in seconds
+        #       damage - damage dealt on hit
+        self.pending.append((sprite, origin, velocity, life, damage))
+
+    def merge_pending(self):
+        # moves bullets fired since the last update into the arrays in one go
+        if len(self.pending) == 0:
+            return
+
+        sprites, origins, velocities, lives, damages = zip(*self.pending)
+        self.pending = []
+
+        self.sprites.extend(sprites)
+        self.position = np.concatenate((self.position, np.array(origins, dtype=float)))
+        self.velocity = np.concatenate((self.velocity, np.array(velocities, dtype=float)))
+        self.age = np.concatenate((self.age, np.zeros(len(sprites))))
+        self.life = np.concatenate((self.life, np.array(lives, dtype=float)))
+        self.damage = np.concatenate((self.damage, np.array(damages, dtype=float)))
+
+    def __len__(self):
+        return len(self.sprites) + len(self.pending)
+
+    def update(self, delta):
+        # moves all bullets one frame and resolves wall and enemy hits
+        # args: delta - time in seconds since last frame
+        self.merge_pending()
+
+        # drop bullets whose sprites were killed from outside, eg. level restart
+        alive = np.array([sprite.alive() for sprite in self.sprites], dtype=bool)
+        if not alive.all():
+            self.keep(alive)
+
+        count = len(self.sprites)
+        if count == 0:
+            return
+
+        # bullets only move for the life they have left so they cant hit
+        # anything after running out part way through the frame
+        start = self.position
+        step = self.velocity * np.clip(self.life - self.age, 0, delta)[:, None]
+        end = start + step
+        self.age = self.age + delta
+
+        # fraction of the step travelled before hitting a wall, 2 means no wall hit
+        wall_t = self.sweep_walls(start, step, delta)
+
+        # fraction of the step travelled before hitting an enemy and which one
+        enemy_t, enemy_index = self.sweep_enemies(start, step)
+
+        hits = enemy_t <= np.minimum(wall_t, 1)
+        enemies = self.game.targeting.enemies
+        for i in np.flatnonzero(hits):
+            enemy = enemies[enemy_index[i]]
+
+            # enemy may have died to another bullet earlier this frame
+            if enemy.alive():
+                enemy.take_damage(self.damage[i])
+            else:
+                hits[i] = False
+
+        self.position = end
+        expired = self.age > self.life
+        self.keep(~(hits | (wall_t <= 1) | expired))
+
+        # only the sprites are touched per bullet so they can be drawn
+        for sprite, (x, y) in zip(self.sprites, self.position):
+            sprite.rect.center = (int(x), int(y))
+
+    def sweep_walls(self, start, step, delta):
+        # checks each bullet against blocked tiles in small sub steps
+        # so fast bullets cant skip over a whole tile in one frame
+        # args: start - bullet positions at the start of the frame
+        #       step - how far each bullet moves this frame
+        #       delta - time in seconds since last frame
+        # returns: fraction of the step at the first wall hit, 2 where nothing was hit
+        collision = self.game.level.collision
+        grid = collision.get_grid()
+        tile_size = collision.tile_size
+
+        # never move more than half a tile between checks
+        longest = np.sqrt((step ** 2).sum(axis=1)).max()
+        steps = max(1, int(math.ceil(longest / (tile_size / 2))))
+
+        wall_t = np.full(len(start), 2.0)
+        for s in range(1, steps + 1):
+            t = s / steps
+
+            # walls are ignored until the bullet is old enough
+            checking = (self.age - delta * (1 - t)) > ProjectileSystem.wall_grace
+            tiles = np.floor((start + step * t) / tile_size).astype(int)
+            inside = checking & (tiles[:, 0] >= 0) & (tiles[:, 0] < collision.width) & (tiles[:, 1] >= 0) & (tiles[:, 1] < collision.height)
+
+            blocked = np.zeros(len(start), dtype=bool)
+            blocked[inside] = grid[tiles[inside, 1], tiles[inside, 0]]
+
+            wall_t = np.where(blocked & (wall_t > 1), t, wall_t)
+
+        return wall_t
+
+    def sweep_enemies(self, start, step):
+        # finds the first enemy each bullet passes through this frame
+        # tests the whole line the bullet moves along against each enemy circle
+        # so even bullets moving several enemy widths per frame cant tunnel through
+        # args: start - bullet positions at the start of the frame
+        #       step - how far each bullet moves this frame
+        # returns: fraction of the step at the hit (2 where nothing was hit) and enemy index
+        index = self.game.targeting
+        index.refresh(self.game.wave.enemies)
+
+        if index.count == 0:
+            return np.full(len(start), 2.0), np.zeros(len(start), dtype=int)
+
+        if self.radii_enemies is not index.enemies:
+            self.radii = np.array([e.rect.width / 2 for e in index.enemies], dtype=float)
+            self.radii_enemies = index.enemies
+
+        # broad phase, enemies sorted by x so each bullet only looks at the
+        # enemies whose centres are within reach of its line across x
+        reach = self.radii.max()
+        order = np.argsort(index.centres[:, 0], kind="stable")
+        xs = index.centres[order, 0]
+        low = np.searchsorted(xs, np.minimum(start[:, 0], start[:, 0] + step[:, 0]) - reach, side="left")
+        high = np.searchsorted(xs, np.maximum(start[:, 0], start[:, 0] + step[:, 0]) + reach, side="right")
+
+        # every bullet and enemy pair left, as flat arrays
+        counts = high - low
+        bullets = np.repeat(np.arange(len(start)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        enemies = order[np.repeat(low, counts) + offsets]
+
+        # and the ones whose centres are within reach across y too
+        top = np.minimum(start[bullets, 1], start[bullets, 1] + step[bullets, 1]) - reach
+        bottom = np.maximum(start[bullets, 1], start[bullets, 1] + step[bullets, 1]) + reach
+        near = (index.centres[enemies, 1] >= top) & (index.centres[enemies, 1] <= bottom)
+        bullets, enemies = bullets[near], enemies[near]
+
+        hit_t = np.full(len(start), 2.0)
+        nearest = np.zeros(len(start), dtype=int)
+        if len(bullets) == 0:
+            return hit_t, nearest
+
+        # closest point on each bullets line to each enemy centre
+        line = step[bullets]
+        centres = index.centres[enemies]
+        length = (line ** 2).sum(axis=1)
+        t = ((centres - start[bullets]) * line).sum(axis=1) / np.maximum(length, 1e-9)
+        t = np.clip(t, 0, 1)
+
+        closest = start[bullets] + line * t[:, None]
+        sqrdist = ((centres - closest) ** 2).sum(axis=1)
+
+        # enemy hit if the line passes inside its radius
+        t = np.where(sqrdist < self.radii[enemies] ** 2, t, 2.0)
+
+        # the earliest hit for each bullet, ties go to the first enemy like argmin would
+        first = np.lexsort((enemies, t, bullets))
+        bullets, enemies, t = bullets[first], enemies[first], t[first]
+        starts = np.flatnonzero(np.r_[True, bullets[1:] != bullets[:-1]])
+
+        hit_t[bullets[starts]] = t[starts]
+        nearest[bullets[starts]] = enemies[starts]
+        return hit_t, nearest
+
+    def keep(self, mask):
+        # removes bullets that arent in the mask and kills their sprites
+        # args: mask - boolean array, true for bullets to keep
+        for i in np.flatnonzero(~mask):
+            self.sprites[i].kill()
+
+        self.sprites = [sprite for sprite, k in zip(self.sprites, mask) if k]
+        self.position = self.position[mask]
+        self.velocity = self.velocity[mask]
+        self.age = self.age[mask]
+        self.life = self.life[mask]
+        self.damage = self.damage[mask]
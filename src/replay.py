@@ -0,0 +1,169 @@
+# records a play session so it can be replayed headless for profiling
+# a log is jsonl: the first line is a header with the random seed level and resolution
+# every line after is either a run of frames ["d", delta, count]
+# or a game command ["c", name, args] in the order they happened
+#
+# replay a log with:
+#   python -m src.replay session.jsonl --trace trace.json --output timings.json
+
+import json
+import random
+
+from src.pathfinding import heat
+
+
+class Recorder:
+    # writes the random seed and every game command to a log file
+    # frames with the same delta are stored as one run to keep logs small
+
+    def __init__(self, filename, resolution, seed=None):
+        # opens the log and seeds the random generator so the session can be replayed
+        # must be created before the game so level setup uses the same seed
+        # args: filename - where to write the log
+        #       resolution - window size, stored so the replay uses the same grid
+        #       seed - random seed to use, picked at random if not given
+        self.file = open(filename, "w")
+        self.seed = random.randrange(2 ** 31) if seed is None else seed
+        self.resolution = resolution
+        self.delta = None
+        self.frames = 0
+        self.started = False
+
+        random.seed(self.seed)
+
+    def start(self, game):
+        # writes the header once the game has been created
+        # args: game - the game being recorded
+        self.write({"version": 1, "seed": self.seed, "level": game.level.name, "resolution": list(self.resolution)})
+        self.started = True
+
+    def step(self, delta):
+        # records one simulation update
+        # args: delta - time in seconds passed to the update
+        if delta != self.delta:
+            self.flush()
+            self.delta = delta
+
+        self.frames += 1
+
+    def command(self, name, args):
+        # records a game command, called before the frame it happened in is stepped
+        # args: name - command name, see run_command
+        #       args - list of json friendly arguments
+        self.flush()
+        self.write(["c", name, list(args)])
+
+    def flush(self):
+        # writes out the current run of frames
+        if self.frames > 0:
+            self.write(["d", self.delta, self.frames])
+            self.frames = 0
+
+    def write(self, entry):
+        self.file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def close(self):
+        # finishes the log
+        self.flush()
+        self.file.close()
+
+
+def load(filename):
+    # reads a recorded log
+    # args: filename - log file written by Recorder
+    # returns: the header and a list of the entries after it
+    with open(filename, "r") as file:
+        lines = [json.loads(line) for line in file if len(line.strip()) > 0]
+
+    return lines[0], lines[1:]
+
+
+def run_command(game, name, args):
+    # applies one recorded command to a game
+    # args: game - the game being replayed
+    #       name - command name written by Recorder
+    #       args - list of arguments for the command
+    if name == "place_defence":
+        game.place_defence(tuple(args[0]))
+    elif name == "undo":
+        game.undo_last_purchase()
+    elif name == "select_defence":
+        game.select_defence(args[0])
+    elif name == "use_ability":
+        game.abilities.use(args[0])
+    elif name == "load_level":
+        game.load_level(args[0])
+    elif name == "load_game":
+        game.load_game(args[0])
+    elif name == "show_menu":
+        game.menu.show()
+    elif name == "hide_menu":
+        game.menu.hide()
+    else:
+        print("Unknown replay command " + name)
+
+
+def replay(filename, game_type, window_type):
+    # plays a recorded session back as fast as possible without drawing
+    # the profiler is on for the whole replay so every update is timed
+    # args: filename - log file written by Recorder
+    #       game_type - the Game class
+    #       window_type - the Window class
+    # returns: the replayed game, its profiler holds the timings
+    header, entries = load(filename)
+
+    random.seed(header["seed"])
+    heat.clear()
+
+    window = window_type(*header["resolution"])
+    game = game_type(window)
+    game.headless = True
+    game.profiler.toggle()
+
+    if game.level.name != header["level"]:
+        print("Warning: replay started on " + game.level.name + " but was recorded on " + header["level"])
+
+    for entry in entries:
+        if entry[0] == "c":
+            run_command(game, entry[1], entry[2])
+            continue
+
+        delta = entry[1]
+        for i in range(entry[2]):
+            game.profiler.begin_frame()
+            game.update(delta)
+            game.profiler.set_counts(game.get_counts())
+            game.profiler.end_frame()
+
+    return game
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    import pygame
+    from src.game import Game
+    from src.window import Window
+
+    parser = argparse.ArgumentParser(description="Replay a recorded Bow Busters session")
+    parser.add_argument("log", help="log file written with main.py --record")
+    parser.add_argument("--trace", help="save a chrome trace of the replay")
+    parser.add_argument("--output", help="save the timing summary as json")
+    args = parser.parse_args()
+
+    pygame.init()
+    game = replay(args.log, Game, Window)
+
+    for line in game.profiler.report_lines():
+        print(line)
+
+    if args.trace:
+        game.profiler.export_trace(args.trace)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(game.profiler.summary(), file, indent=4)
+
+    pygame.quit()
@@ -0,0 +1,339 @@
+# saves and restores the whole simulation state
+# used for save games and so benchmarks can start from a late wave
+#
+# file layout:
+#   8 byte magic "BBSNAP01"
+#   4 byte little endian length of the json header
+#   json header with the small state and a table of binary blobs
+#   zlib compressed blobs, one contiguous numpy buffer each
+# the big things (collision grid, path point lists, enemies, bullets) are blobs
+# explosion and muzzle flash animations are only visual so they arent saved
+
+import json
+import random
+import struct
+import zlib
+import numpy as np
+
+from src.pathfinding import Path, heat
+from src.enemy import Enemy
+from src.defence import Defence
+from src.bullet import Bullet
+from src.prefab import Prefab
+from src.wave import Wave
+
+MAGIC = b"BBSNAP01"
+
+
+def pack_points(lists):
+    # joins several lists of (x, y) points into one array with offsets
+    # args: lists - list of iterables of points
+    # returns: (points array of shape (n, 2), offsets array of length len(lists) + 1)
+    offsets = [0]
+    flat = []
+    for points in lists:
+        flat.extend(points)
+        offsets.append(len(flat))
+
+    return np.array(flat, dtype=np.int32).reshape(-1, 2), np.array(offsets, dtype=np.int64)
+
+
+def unpack_points(points, offsets, index):
+    # gets one list of points back out of a packed array
+    # returns: list of (x, y) tuples
+    return [tuple(p) for p in points[offsets[index]:offsets[index + 1]].tolist()]
+
+
+def capture(game):
+    # reads the full simulation state out of a game
+    # args: game - the game to save
+    # returns: (header dictionary, dictionary of name to numpy array)
+    level = game.level
+    pathfinding = level.pathfinding
+    # partial paths first, oldest used first, then the full pool
+    pool = pathfinding.get_all_paths()
+    enemies = game.wave.enemies.sprites()
+    defences = game.defences.sprites()
+    blobs = { }
+
+    blobs["blocked"] = np.array(level.collision.blocked_tiles, dtype=np.int64)
+
+    # path pool, every per path structure is packed into one buffer
+    blobs["path_start"] = np.array([path.start for path in pool], dtype=np.int32).reshape(-1, 2)
+    blobs["path_done"] = np.array([path.done for path in pool], dtype=bool)
+    blobs["path_stale"] = np.array([path.stale for path in pool], dtype=bool)
+    blobs["path_has_points"] = np.array([path.points is not None for path in pool], dtype=bool)
+    blobs["path_points"], blobs["path_points_offsets"] = pack_points([path.points or [] for path in pool])
+    blobs["path_open"], blobs["path_open_offsets"] = pack_points([sorted(path.open_set) for path in pool])
+    blobs["path_closed"], blobs["path_closed_offsets"] = pack_points([sorted(path.closed_set) for path in pool])
+    blobs["path_score_keys"], blobs["path_score_offsets"] = pack_points([list(path.scores.keys()) for path in pool])
+    blobs["path_score_values"] = np.array([v for path in pool for v in path.scores.values()], dtype=np.int64)
+    blobs["path_from_keys"], blobs["path_from_offsets"] = pack_points([list(path.came_from.keys()) for path in pool])
+    blobs["path_from_values"], _ = pack_points([list(path.came_from.values()) for path in pool])
+
+    # enemies as columns
+    path_index = {id(path): i for i, path in enumerate(pool)}
+    enemy_types = sorted({enemy.name for enemy in enemies})
+    modifier_ids = sorted({m[2] for enemy in enemies for m in enemy.speed_modifiers})
+
+    blobs["enemy_type"] = np.array([enemy_types.index(e.name) for e in enemies], dtype=np.int32)
+    blobs["enemy_path"] = np.array([path_index.get(id(e.path), -1) for e in enemies], dtype=np.int32)
+    blobs["enemy_target"] = np.array([e.target if e.target else (0, 0) for e in enemies], dtype=np.int32).reshape(-1, 2)
+    blobs["enemy_has_target"] = np.array([bool(e.target) for e in enemies], dtype=bool)
+    blobs["enemy_stats"] = np.array([(e.x, e.y, e.health, e.max_health, e.speed, e.effective_speed) for e in enemies], dtype=np.float64).reshape(-1, 6)
+    blobs["enemy_surged"] = np.array([e.surged for e in enemies], dtype=bool)
+    blobs["enemy_modifier_offsets"] = np.cumsum([0] + [len(e.speed_modifiers) for e in enemies]).astype(np.int64)
+    blobs["enemy_modifiers"] = np.array([(m[0], m[1], modifier_ids.index(m[2])) for e in enemies for m in e.speed_modifiers], dtype=np.float64).reshape(-1, 3)
+
+    # bullets already live in arrays
+    projectiles = game.projectiles
+    projectiles.merge_pending()
+    blobs["bullet_position"] = projectiles.position
+    blobs["bullet_velocity"] = projectiles.velocity
+    blobs["bullet_age"] = projectiles.age
+    blobs["bullet_life"] = projectiles.life
+    blobs["bullet_damage"] = projectiles.damage
+
+    blobs["heat_tiles"] = np.array(list(heat.keys()), dtype=np.int32).reshape(-1, 2)
+    blobs["heat_counts"] = np.array(list(heat.values()), dtype=np.int64)
+
+    rng_version, rng_state, rng_gauss = random.getstate()
+    blobs["rng_state"] = np.array(rng_state, dtype=np.uint32)
+
+    enemy_index = {id(e): i for i, e in enumerate(enemies)}
+    defence_index = {id(d): i for i, d in enumerate(defences)}
+
+    header = {
+        "level": level.name,
+        "money": level.money,
+        "lives": level.lives,
+        "time": level.time,
+        "partials": len(pathfinding.partials),
+        "wave": {
+            "number": game.wave.number,
+            "time": game.wave.time,
+            "spawn_index": game.wave.spawn_index,
+            "started": game.wave.started,
+            "done": game.wave.done,
+            "counts": [game.wave.spawn_count_small, game.wave.spawn_count_medium, game.wave.spawn_count_large],
+        },
+        "enemy_types": enemy_types,
+        "modifier_ids": modifier_ids,
+        "defences": [{
+            "name": d.name,
+            "center": list(d.rect.center),
+            "fire_time": d.fire_time,
+            "target": enemy_index.get(id(d.target), -1),
+        } for d in defences],
+        "purchase_history": [{
+            "name": entry.get("name"),
+            "x": entry.get("x"),
+            "y": entry.get("y"),
+            "cost": entry.get("cost", 0),
+            "ref": defence_index.get(id(entry.get("ref")), -1),
+        } for entry in game.purchase_history],
+        "abilities": {
+            "cooldown_timers": game.abilities.cooldown_timers,
+            "active": [{
+                key: ([list(t) for t in value] if key == "tiles" else value)
+                for key, value in effect.items() if key != "prefabs"
+            } for effect in game.abilities.active],
+            "prefabs": [[p.name for p in effect.get("prefabs", [])] for effect in game.abilities.active],
+        },
+        "rng": [rng_version, rng_gauss],
+        "defence_type": game.defence_type,
+        "menu_visible": game.menu.visible,
+    }
+
+    return header, blobs
+
+
+def save(game, filename):
+    # writes a snapshot of the game to a file
+    # args: game - the game to save
+    #       filename - where to write the snapshot
+    header, blobs = capture(game)
+
+    table = { }
+    chunks = []
+    offset = 0
+    for name, array in blobs.items():
+        data = np.ascontiguousarray(array).tobytes()
+        table[name] = {"dtype": str(array.dtype), "shape": list(array.shape), "offset": offset, "size": len(data)}
+        chunks.append(data)
+        offset += len(data)
+
+    header["blobs"] = table
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    with open(filename, "wb") as file:
+        file.write(MAGIC)
+        file.write(struct.pack("<I", len(header_bytes)))
+        file.write(header_bytes)
+        file.write(zlib.compress(b"".join(chunks), 1))
+
+
+def read(filename):
+    # reads a snapshot file
+    # args: filename - snapshot written by save
+    # returns: (header dictionary, dictionary of name to numpy array)
+    with open(filename, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a Bow Busters snapshot: " + filename)
+
+        length = struct.unpack("<I", file.read(4))[0]
+        header = json.loads(file.read(length).decode("utf-8"))
+        payload = zlib.decompress(file.read())
+
+    blobs = { }
+    for name, info in header["blobs"].items():
+        data = payload[info["offset"]:info["offset"] + info["size"]]
+        blobs[name] = np.frombuffer(data, dtype=info["dtype"]).reshape(info["shape"])
+
+    return header, blobs
+
+
+def load(game, filename):
+    # replaces the state of a game with a saved snapshot
+    # args: game - the game to restore into
+    #       filename - snapshot written by save
+    header, blobs = read(filename)
+
+    game.load_level(header["level"])
+    level = game.level
+    level.money = header["money"]
+    level.lives = header["lives"]
+    level.time = header["time"]
+
+    # defences first, placing them blocks tiles but the saved grid replaces that below
+    defences = []
+    for entry in header["defences"]:
+        config = Prefab.load_config(entry["name"])
+        image = config["images"][0] if "images" in config else config.get("image")
+        width, height = image.get_size() if image is not None else (32, 32)
+        x = entry["center"][0] - width // 2
+        y = entry["center"][1] - height // 2
+
+        defence = Defence(game, entry["name"], x, y)
+        defence.fire_time = entry["fire_time"]
+        defences.append(defence)
+    game.defences.add(defences)
+
+    collision = level.collision
+    collision.blocked_tiles = blobs["blocked"].tolist()
+    collision.overlay = None
+    collision.version += 1
+    collision.changes = []
+    collision.changes_base = collision.version
+
+    # path pool including searches that were still in progress
+    pathfinding = level.pathfinding
+    paths = []
+    for i, start in enumerate(blobs["path_start"].tolist()):
+        path = Path(pathfinding, tuple(start))
+        path.done = bool(blobs["path_done"][i])
+        # background searches arent saved, stale paths get searched again after loading
+        path.stale = bool(blobs["path_stale"][i])
+        if blobs["path_has_points"][i]:
+            path.points = unpack_points(blobs["path_points"], blobs["path_points_offsets"], i)
+        path.open_set = set(unpack_points(blobs["path_open"], blobs["path_open_offsets"], i))
+        path.closed_set = set(unpack_points(blobs["path_closed"], blobs["path_closed_offsets"], i))
+
+        keys = unpack_points(blobs["path_score_keys"], blobs["path_score_offsets"], i)
+        values = blobs["path_score_values"][blobs["path_score_offsets"][i]:blobs["path_score_offsets"][i + 1]].tolist()
+        path.scores = dict(zip(keys, values))
+
+        keys = unpack_points(blobs["path_from_keys"], blobs["path_from_offsets"], i)
+        values = unpack_points(blobs["path_from_values"], blobs["path_from_offsets"], i)
+        path.came_from = dict(zip(keys, values))
+        # the open heap is only an ordering of the open set so it is made again
+        path.build_heap()
+
+        paths.append(path)
+
+    # the first few are partial paths in the order they were last used
+    pathfinding.partials.paths.clear()
+    for path in paths[:header["partials"]]:
+        pathfinding.partials.paths[path.start] = path
+    pathfinding.pool = paths[header["partials"]:]
+    pathfinding.pool_changed()
+
+    # wave and its enemies
+    saved = header["wave"]
+    game.wave = Wave(game, saved["number"])
+    wave = game.wave
+    wave.time = saved["time"]
+    wave.spawn_index = saved["spawn_index"]
+    wave.started = saved["started"]
+    wave.done = saved["done"]
+    wave.spawn_count_small, wave.spawn_count_medium, wave.spawn_count_large = saved["counts"]
+
+    enemies = []
+    modifiers = blobs["enemy_modifiers"].tolist()
+    modifier_offsets = blobs["enemy_modifier_offsets"]
+    for i, type_index in enumerate(blobs["enemy_type"].tolist()):
+        name = header["enemy_types"][type_index]
+        path_index = int(blobs["enemy_path"][i])
+        path = paths[path_index] if path_index >= 0 else pathfinding.get_path()
+        stats = Enemy.get_stats(name, Prefab.load_config(name), wave.number)
+
+        enemy = Enemy(game, name, 0, 0, path, stats)
+        x, y, health, max_health, speed, effective_speed = blobs["enemy_stats"][i].tolist()
+        enemy.x, enemy.y = x, y
+        enemy.rect.x, enemy.rect.y = x, y
+        enemy.target = tuple(blobs["enemy_target"][i].tolist()) if blobs["enemy_has_target"][i] else False
+        enemy.health = health
+        enemy.max_health = max_health
+        enemy.speed = speed
+        enemy.effective_speed = effective_speed
+        enemy.surged = bool(blobs["enemy_surged"][i])
+        enemy.speed_modifiers = [(m[0], m[1], header["modifier_ids"][int(m[2])]) for m in modifiers[modifier_offsets[i]:modifier_offsets[i + 1]]]
+        enemies.append(enemy)
+    wave.enemies.add(enemies)
+
+    for defence, entry in zip(defences, header["defences"]):
+        if entry["target"] >= 0:
+            defence.target = enemies[entry["target"]]
+
+    game.purchase_history = [{
+        "name": entry["name"],
+        "x": entry["x"],
+        "y": entry["y"],
+        "cost": entry["cost"],
+        "ref": defences[entry["ref"]] if entry["ref"] >= 0 else None,
+    } for entry in header["purchase_history"]]
+
+    # bullets, sprites are made again for drawing then the saved arrays replace their motion
+    position = blobs["bullet_position"]
+    velocity = blobs["bullet_velocity"]
+    bullets = [Bullet(game, tuple(p), tuple(p + v)) for p, v in zip(position, velocity)]
+    game.bullets.add(bullets)
+    projectiles = game.projectiles
+    projectiles.merge_pending()
+    projectiles.position = position.copy()
+    projectiles.velocity = velocity.copy()
+    projectiles.age = blobs["bullet_age"].copy()
+    projectiles.life = blobs["bullet_life"].copy()
+    projectiles.damage = blobs["bullet_damage"].copy()
+
+    # abilities and the prefabs that show their effects
+    abilities = game.abilities
+    abilities.cooldown_timers = dict(header["abilities"]["cooldown_timers"])
+    abilities.active = []
+    for effect, names in zip(header["abilities"]["active"], header["abilities"]["prefabs"]):
+        effect["tiles"] = [tuple(t) for t in effect.get("tiles", [])]
+        prefabs = [Prefab(name, px, py) for name, (px, py) in zip(names, effect["tiles"])]
+        level.prefabs.add(prefabs)
+        if len(names) > 0:
+            effect["prefabs"] = prefabs
+        abilities.active.append(effect)
+
+    heat.clear()
+    heat.update(dict(zip([tuple(t) for t in blobs["heat_tiles"].tolist()], blobs["heat_counts"].tolist())))
+
+    rng_version, rng_gauss = header["rng"]
+    random.setstate((rng_version, tuple(blobs["rng_state"].tolist()), rng_gauss))
+
+    game.defence_type = header["defence_type"]
+    if not header["menu_visible"]:
+        game.menu.hide()
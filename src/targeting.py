@@ -0,0 +1,117 @@
+import numpy as np
+
+
+class TargetIndex:
+    # per frame snapshot of every enemy position health and spawn order
+    # lets all defences pick targets together with one numpy distance matrix
+    # instead of each defence looping over every enemy on its own
+
+    # ways a defence can choose between enemies in range
+    # first - the enemy that spawned earliest
+    # closest - the enemy with the least of its path left to walk to the goal
+    # strongest - the enemy with the most health left
+    # weakest - the enemy with the least health left
+    Strategies = ("first", "closest", "strongest", "weakest")
+
+    def __init__(self, game):
+        # sets up an empty index
+        # args: game - reference to the main game object
+        self.game = game
+        self.group = None
+        self.count = -1
+        self.build([])
+
+    def build(self, enemies):
+        # takes a snapshot of the enemies so they can be searched with arrays
+        # args: enemies - sprite group or list of enemies
+        self.group = enemies
+        self.enemies = list(enemies)
+        self.count = len(self.enemies)
+
+        self.centres = np.array([e.rect.center for e in self.enemies], dtype=float).reshape(-1, 2)
+        self.health = np.array([e.health for e in self.enemies], dtype=float)
+        # how far each enemy has left to walk, only worked out if a defence asks
+        self.distance_left = None
+
+    def refresh(self, enemies):
+        # rebuilds the snapshot only if the enemy group changed since the last build
+        # args: enemies - the current wave enemy group
+        if self.group is not enemies or self.count != len(enemies):
+            self.build(enemies)
+
+    def keys(self, strategy):
+        # gets a score for each enemy where lower means a better target
+        # args: strategy - one of TargetIndex.Strategies
+        # returns: numpy array with one score per enemy
+        if strategy == "closest":
+            # routes wind so the distance left along the path, not x, says who escapes first
+            if self.distance_left is None:
+                self.distance_left = np.array([e.get_distance_left() for e in self.enemies], dtype=float)
+            return self.distance_left
+        if strategy == "strongest":
+            return -self.health
+        if strategy == "weakest":
+            return self.health
+
+        # first in range keeps spawn order which is the order of the group
+        return np.arange(self.count, dtype=float)
+
+    def resolve(self, defences, enemies):
+        # picks targets for every defence that needs a new one in one batched pass
+        # defences that still have a suitable target keep it
+        # args: defences - all placed defences
+        #       enemies - the current wave enemy group
+        self.build(enemies)
+
+        # group defences by strategy so each group is one distance matrix
+        searching = { }
+        for defence in defences:
+            if defence.attack == "none":
+                continue
+            if defence.target is not None and defence.is_target_suitable(defence.target):
+                continue
+
+            defence.target = None
+            searching.setdefault(defence.targeting, []).append(defence)
+
+        if self.count == 0:
+            return
+
+        for strategy, group in searching.items():
+            positions = np.array([d.rect.center for d in group], dtype=float)
+            ranges = np.array([d.attack_range for d in group], dtype=float)
+
+            # squared distance from every defence to every enemy
+            offsets = positions[:, None, :] - self.centres[None, :, :]
+            sqrdist = (offsets ** 2).sum(axis=2)
+            in_range = sqrdist <= (ranges ** 2)[:, None]
+
+            scores = np.where(in_range, self.keys(strategy)[None, :], np.inf)
+            best = scores.argmin(axis=1)
+            found = in_range[np.arange(len(group)), best]
+
+            for defence, index, ok in zip(group, best, found):
+                if ok:
+                    defence.target = self.enemies[index]
+
+    def select(self, defence):
+        # picks a target for a single defence using the current snapshot
+        # used when a target dies part way through a frame
+        # args: defence - the defence looking for a target
+        # returns: the chosen enemy or none if nothing is in range
+        self.refresh(self.game.wave.enemies)
+
+        if self.count == 0:
+            return None
+
+        centre = defence.rect.center
+        sqrdist = ((self.centres - centre) ** 2).sum(axis=1)
+        in_range = np.flatnonzero(sqrdist <= defence.attack_range ** 2)
+
+        # enemies killed earlier this frame are still in the snapshot so skip them
+        keys = self.keys(defence.targeting)[in_range]
+        for index in in_range[np.argsort(keys, kind="stable")]:
+            if self.enemies[index].alive():
+                return self.enemies[index]
+
+        return None
@@ -1,11 +1,92 @@
 import pygame
 import random
+from bisect import bisect_right
+from collections import Counter
 from src.enemy import Enemy
 
 
+class WavePlan:
+    # works out the full spawn timeline for one wave before it starts
+    # the timeline is a list of (time, enemy_type) sorted by time so the wave
+    # only has to look up which spawns are due instead of counting down gaps
+    # can be built without a game so tools and benchmarks can inspect waves
+
+    # shortest gap allowed between spawn ticks
+    # later waves used to go negative and spawn every frame, one frame at 60fps
+    # keeps that pace but makes it independent of the frame rate
+    min_spawn_gap = 1 / 60
+
+    def __init__(self, number):
+        # calculates enemy counts and spawn times for a wave
+        # args: number - which wave this is (starts at 1)
+        self.number = number
+
+        # enemies spawn faster in later waves
+        self.gap = max(3 - (number ** 0.6), WavePlan.min_spawn_gap)
+
+        # exponential scaling makes higher waves much harder
+        self.counts = {
+            "enemy_small": max(0, int(number ** 2.5)),
+            "enemy_medium": max(0, int(number ** 2 - number)),
+            "enemy_large": max(0, int(number ** 1.7 - 4)),
+        }
+
+        self.timeline = self.build_timeline()
+        self.times = [entry[0] for entry in self.timeline]
+
+    def build_timeline(self):
+        # lays out every spawn using the same ordering rules waves always had
+        # small enemies first, medium once fewer smalls are left than mediums
+        # and large once fewer mediums are left than larges
+        # returns: list of (time, enemy_type) sorted by time
+        small = self.counts["enemy_small"]
+        medium = self.counts["enemy_medium"]
+        large = self.counts["enemy_large"]
+
+        timeline = []
+        tick = 0
+
+        while small > 0 or medium > 0 or large > 0:
+            # first spawn happens one gap after the wave starts
+            tick += 1
+            time = tick * self.gap
+
+            if small > 0:
+                timeline.append((time, "enemy_small"))
+                small -= 1
+
+            if medium > 0 and small <= medium:
+                timeline.append((time, "enemy_medium"))
+                medium -= 1
+
+            if large > 0 and medium <= large:
+                timeline.append((time, "enemy_large"))
+                large -= 1
+
+        return timeline
+
+    def due(self, index, time):
+        # finds which spawns should have happened by a given time
+        # args: index - position of the first spawn not yet done
+        #       time - seconds since the wave started
+        # returns: index one past the last spawn that is due
+        return max(index, bisect_right(self.times, time))
+
+    def duration(self):
+        # returns: seconds from wave start until the last enemy spawns
+        return self.times[-1] if self.times else 0
+
+    def total(self):
+        # returns: how many enemies this wave spawns in total
+        return len(self.timeline)
+
+    def __len__(self):
+        return len(self.timeline)
+
+
 class Wave:
     # manages spawning enemies in waves that get harder over time
-    # spawns small medium and large enemies at calculated intervals
+    # follows a precomputed plan so spawning works the same at any frame rate
     def __init__(self, game, number):
         # creates a new wave with scaling difficulty
         # calculates how many enemies to spawn based on wave number
@@ -14,53 +95,74 @@ class Wave:
         self.started = False
         self.done = False
         self.enemies = pygame.sprite.Group()
-        self.spawn_time = 0
-        # enemies spawn faster in later waves
-        self.spawn_gap = 3 - (number ** 0.6)
-        # exponential scaling makes higher waves much harder
-        self.spawn_count_small = int(number ** 2.5)
-        self.spawn_count_medium = int(number ** 2 - number)
-        self.spawn_count_large = int(number ** 1.7 - 4)
+        self.plan = WavePlan(number)
+        self.spawn_gap = self.plan.gap
+        # time since the wave started and the next spawn in the plan
+        self.time = 0
+        self.spawn_index = 0
+        # enemies left to spawn of each type
+        self.spawn_count_small = self.plan.counts["enemy_small"]
+        self.spawn_count_medium = self.plan.counts["enemy_medium"]
+        self.spawn_count_large = self.plan.counts["enemy_large"]
 
     def update(self, delta):
         # runs every frame to move enemies and spawn new ones
-        # spawns enemies gradually with gaps between them
+        # spawns everything that came due since last frame in one go
         self.enemies.update(delta)
 
-        # count down until next enemy spawn
-        self.spawn_time -= delta
-        if self.spawn_time > 0:
+        self.started = True
+
+        # hold the plan until a full path is ready so nothing spawns onto a partial path
+        if not self.game.level.pathfinding.is_ready():
             return
 
-        # spawn small enemies first
-        if self.started and self.spawn_count_small > 0:
-            self.spawn("enemy_small")
-            self.spawn_count_small -= 1
-        
-        # spawn medium enemies after some small ones
-        if self.started and self.spawn_count_medium > 0 and self.spawn_count_small <= self.spawn_count_medium:
-            self.spawn("enemy_medium")
-            self.spawn_count_medium -= 1
-        
-        # spawn large enemies last
-        if self.started and self.spawn_count_large > 0 and self.spawn_count_medium <= self.spawn_count_large:
-            self.spawn("enemy_large")
-            self.spawn_count_large -= 1
-            
-        # mark wave as started after first frame
-        if not self.started:
-            self.started = True
-
-        self.spawn_time = self.spawn_gap
+        self.time += delta
+
+        due = self.plan.due(self.spawn_index, self.time)
+        if due == self.spawn_index:
+            return
+
+        # group the due spawns by type so each type is created in one batch
+        batch = Counter(enemy_type for _, enemy_type in self.plan.timeline[self.spawn_index:due])
+        self.spawn_index = due
+
+        enemies = []
+        for enemy_type, count in batch.items():
+            enemies.extend(self.create(enemy_type, count))
+
+        self.enemies.add(enemies)
+
+    def create(self, enemy_type, count=1):
+        # makes new enemies and takes them off the remaining counts
+        # args: enemy_type - which type of enemy to make
+        #       count - how many to make
+        # returns: list of new enemies, not yet added to the group
+        if enemy_type == "enemy_small":
+            self.spawn_count_small -= count
+        elif enemy_type == "enemy_medium":
+            self.spawn_count_medium -= count
+        elif enemy_type == "enemy_large":
+            self.spawn_count_large -= count
+
+        return Enemy.spawn_batch(self.game, enemy_type, count, self.number)
 
     def spawn(self, enemy_type):
         # creates a new enemy and adds it to the active enemies group
         # args: enemy_type - which type of enemy to spawn
-        enemy = Enemy(self.game, enemy_type, 0, 0)
-        self.enemies.add(enemy)
+        self.enemies.add(self.create(enemy_type))
+
+    def spawn_many(self, enemy_type, count):
+        # creates several enemies of one type and adds them with a single group add
+        # args: enemy_type - which type of enemy to spawn
+        #       count - how many to spawn
+        self.enemies.add(self.create(enemy_type, count))
+
+    def remaining(self):
+        # returns: how many planned enemies have not spawned yet
+        return len(self.plan) - self.spawn_index
 
     def enemy_killed(self):
         # called whenever an enemy dies or reaches the goal
         # marks wave as complete when all enemies are gone
-        if len(self.enemies) == 0 and self.spawn_count_small <= 0 and self.spawn_count_medium <= 0:
+        if len(self.enemies) == 0 and self.remaining() <= 0:
             self.done = True
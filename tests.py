@@ -3,6 +3,18 @@ from src.window import Window
 from src.game import Game
 from src.defence import Defence
 from src.enemy import Enemy
+from src.wave import WavePlan, Wave
+from src.bullet import Bullet
+from src.explosion import Explosion
+from src.replay import Recorder, replay
+from src.pathfinding import heat, grid_neighbours, search_grid, GoalField, Executors
+from src.hierarchy import Hierarchy
+from src.atlas import Atlas
+from src.prefab import Prefab
+import os
+import random
+import tempfile
+import time
 
 pygame.init()
 
@@ -10,7 +22,37 @@ pygame.init()
 window = Window(1280, 720)
 game = Game(window)
 
-print("\n       RUNNING AUTOMATED TEST CASES     \n")
+# Shared helpers for the pathfinding tests
+def make_level(name, path_search="astar"):
+    # makes a fresh game on a level so a test doesnt depend on the shared one
+    # args: name - level to load
+    #       path_search - one of Pathfinding.SearchModes
+    # returns: the game
+    level_game = Game(Window(1280, 768), path_search=path_search)
+    level_game.load_level(name)
+    return level_game
+
+def route_cost(points):
+    # cost of walking a route with no crowding, 3 straight and 4 diagonal
+    # args: points - the route
+    # returns: the total cost
+    return sum(3 if a[0] == b[0] or a[1] == b[1] else 4 for a, b in zip(points, points[1:]))
+
+def check_random_blocks(collision, check, seed, rounds=3):
+    # blocks random tiles in batches and unblocks one each round
+    # calling check before and after each round so patched state can be compared to a rebuild
+    # args: collision - the level collision grid
+    #       check - function that asserts the patched state is right
+    #       seed - seed for which tiles change
+    #       rounds - how many rounds of changes
+    rng = random.Random(seed)
+    check()
+    for round in range(rounds):
+        with collision.batch():
+            for i in range(5):
+                collision.block_point(rng.randint(0, 39) * 32, rng.randint(0, 23) * 32)
+        collision.unblock_point(rng.randint(0, 39) * 32, rng.randint(0, 23) * 32)
+        check()
 
 
 # TEST CASE 1 — A* Pathfinding Completes Successfully
@@ -129,90 +171,729 @@ def test_undo_stack():
 
     print("Test Case 5 Passed — Undo Stack Works (LIFO)")
 
-# RUN ALL TESTS
-test_pathfinding_basic()
-test_collision_block_unblock()
-test_defence_targeting()
-test_pathfinding_repair()
-test_undo_stack()
-
-print("\n     ALL TEST CASES PASSED SUCCESSFULLY \n")
-
-import time
-
-def test_pathfinding_performance():
-    print("\n--- A* Pathfinding Performance Test ---")
-
-    sizes = [10, 20, 30]   # number of update frames to simulate
-    results = []
-
-    for frames in sizes:
-        start = time.time()
+# TEST CASE 6 — Wave Plan Covers Every Enemy At A Positive Gap
+def test_wave_plan():
+    for number in [1, 5, 7, 12]:
+        plan = WavePlan(number)
 
-        pf = game.level.pathfinding
+        assert plan.gap > 0, "Spawn gap should never be negative"
+        assert len(plan) == sum(plan.counts.values()), "Timeline should contain every planned enemy"
+        assert plan.times == sorted(plan.times), "Timeline should be sorted by time"
 
-        # force recalculation
-        for path in pf.pool:
-            path.start_search()
+        # spawns due by the end must be everything regardless of how time is split up
+        assert plan.due(0, plan.duration()) == len(plan), "All spawns should be due by the end of the plan"
 
-        # simulate frames
-        for _ in range(frames):
-            pf.update()
+    print("Test Case 6 Passed — Wave Plan Is Frame Rate Independent")
 
-        end = time.time()
-        elapsed = end - start
+# TEST CASE 7 — Batch Spawn Shares Stats And Spreads Paths
+def test_batch_spawn():
+    wave = game.wave
+    pf = game.level.pathfinding
+    before = set(wave.enemies)
 
-        print(f"Frames: {frames}, Time: {elapsed:.5f}s")
-        results.append((frames, elapsed))
+    wave.spawn_many("enemy_medium", 20)
+    batch = [e for e in wave.enemies if e not in before]
 
-    print("Pathfinding scaling test completed\n")
+    assert len(batch) == 20, "Batch spawn should add every enemy"
+    assert len(set(e.max_health for e in batch)) == 1, "Enemies in one batch should share wave scaled health"
 
-def test_targeting_performance():
-    print("\n--- Target Selection Performance Test ---")
+    # the batch should be spread over as many finished paths as it can use
+    ready = [p for p in pf.pool if p.done and p.start[0] >= game.window.resolution[0]]
+    assert len(set(id(e.path) for e in batch)) == min(20, len(ready)), "Batch should spread enemies across paths"
 
-    counts = [10, 50, 100, 200]
-    proto = game.defence_prototypes[0]
-    d = Defence(game, proto.name, 100, 100)
-    d.attack_range = 999999   # ensure all enemies are in range
+    print("Test Case 7 Passed — Batch Spawn Works")
 
-    for n in counts:
-        game.wave.enemies.empty()
+# TEST CASE 8 — Fast Bullets Hit Enemies They Pass Through
+def test_bullet_no_tunnelling():
+    # a fresh game so nothing left by other tests is in the way
+    clean = Game(Window(1280, 720))
 
-        # create n enemies
-        for i in range(n):
-            e = Enemy(game, "enemy_small", 100+i, 100)
-            game.wave.enemies.add(e)
+    enemy = Enemy(clean, "enemy_small", 0, 0)
+    enemy.rect.center = (400, 300)
+    enemy.health = 9999
+    clean.wave.enemies.add(enemy)
 
-        start = time.time()
-        d.get_target()
-        end = time.time()
+    bullet = Bullet(clean, (200, 300), (600, 300))
+    clean.bullets.add(bullet)
+    clean.projectiles.merge_pending()
 
-        print(f"Enemies: {n}, Time: {(end-start)*1000000:.2f} microseconds")
+    # fast enough to jump from well before the enemy to well past it in one frame
+    clean.projectiles.velocity[-1] = (20000, 0)
+    clean.projectiles.update(0.02)
 
-    print("Targeting scaling test completed\n")
+    assert enemy.health < 9999, "Fast bullet tunnelled through the enemy"
+    assert not bullet.alive(), "Bullet should be removed after hitting"
 
-def test_stack_performance():
-    print("\n--- Undo Stack Performance Test ---")
+    # a bullet that runs out part way through the frame stops before the enemy
+    enemy.health = 9999
+    bullet = Bullet(clean, (200, 300), (600, 300))
+    clean.bullets.add(bullet)
+    clean.projectiles.merge_pending()
+    clean.projectiles.velocity[-1] = (20000, 0)
+    clean.projectiles.age[-1] = clean.projectiles.life[-1] - 0.001
+    clean.projectiles.update(0.02)
 
-    operations = 100000
-    stack = []
+    assert enemy.health == 9999, "Bullet should not hit after its life runs out"
+    assert not bullet.alive(), "Bullet should be removed when its life runs out"
 
-    # push test
-    start = time.time()
-    for _ in range(operations):
-        stack.append(1)
-    end = time.time()
-    print(f"Push {operations} ops: {end-start:.5f}s")
+    print("Test Case 8 Passed — Swept Bullet Hits Work")
 
-    # pop test
-    start = time.time()
-    for _ in range(operations):
-        stack.pop()
-    end = time.time()
-    print(f"Pop {operations} ops: {end-start:.5f}s")
+# TEST CASE 9 — Overlapping Explosions Damage Each Enemy Once
+def test_explosion_batching():
+    enemy = Enemy(game, "enemy_small", 0, 0)
+    enemy.rect.center = (700, 500)
+    enemy.health = 9999
+    game.wave.enemies.add(enemy)
 
-    print("Stack performance test completed\n")
+    calls = []
+    enemy.take_damage = lambda damage: calls.append(damage)
+
+    # three blasts on top of the enemy in the same frame
+    for i in range(3):
+        Explosion(game, (700, 500), 70, 100)
+    game.aoe.resolve()
+
+    assert len(calls) == 1, "Enemy should take damage once per frame"
+    assert abs(calls[0] - 300) < 1e-6, "Damage from every blast should be added together"
+
+    print("Test Case 9 Passed — Explosion Damage Is Batched")
+
+# TEST CASE 10 — Recorded Session Replays To The Same State
+def test_replay_determinism():
+    filename = os.path.join(tempfile.mkdtemp(), "session.jsonl")
+
+    def state(g):
+        return (g.level.money, g.level.lives, g.wave.number, sorted((e.x, e.y) for e in g.wave.enemies))
+
+    recorder = Recorder(filename, (1280, 720), seed=7)
+    recorded = Game(Window(1280, 720), recorder)
+    recorded.headless = True
+    recorded.menu.hide()
+    for frame in range(600):
+        if frame == 200:
+            recorded.select_defence(1)
+            recorded.place_defence((640, 320))
+        recorded.update(1 / 60)
+    recorder.close()
+
+    replayed = replay(filename, Game, Window)
+
+    assert state(replayed) == state(recorded), "Replay should end in the same state as the recording"
+
+    print("Test Case 10 Passed — Replay Is Deterministic")
+
+# TEST CASE 11 — Snapshot Restores A Game That Carries On Identically
+def test_snapshot_roundtrip():
+    filename = os.path.join(tempfile.mkdtemp(), "save.bbs")
+
+    def state(g):
+        return (g.level.money, g.level.lives, g.wave.number, len(g.defences), sorted(g.level.collision.blocked_tiles),
+                sorted((e.x, e.y, e.health) for e in g.wave.enemies))
+
+    original = Game(Window(1280, 720))
+    original.headless = True
+    original.menu.hide()
+    for frame in range(300):
+        original.update(1 / 60)
+
+    original.save_game(filename)
+    restored = Game(Window(1280, 720))
+    restored.headless = True
+    restored.load_game(filename)
+
+    assert state(restored) == state(original), "Restored game should match the saved one"
+
+    # the random state is saved too so both games should keep matching
+    for frame in range(120):
+        original.update(1 / 60)
+        restored.update(1 / 60)
+
+    assert state(restored) == state(original), "Restored game should carry on the same way"
+
+    print("Test Case 11 Passed — Save And Load Work")
+
+# TEST CASE 12 — Fast Forward Runs Fixed Steps And Drops Frames When Behind
+def test_time_scale():
+    steps = []
+    fast = Game(Window(1280, 720))
+    fast.update = lambda delta: steps.append(delta)
+
+    fast.time_scale = 4
+    behind = fast.advance(1 / 60 + 1e-9)
+    assert len(steps) == 4, "4x speed should run 4 steps in one frame"
+    assert all(delta == fast.sim_step for delta in steps), "Every step should use the fixed step size"
+    assert not behind, "Fast updates should keep up"
+
+    # an update slower than a whole frame means the game falls behind
+    steps.clear()
+    fast.update = lambda delta: (steps.append(delta), time.sleep(fast.sim_step))
+    fast.time_scale = 8
+    behind = fast.advance(1 / 60)
+    assert len(steps) < 8, "Slow steps should stop once the frame time is used up"
+    assert behind, "Game should report it is behind so drawing can be skipped"
+
+    print("Test Case 12 Passed — Fast Forward Works")
+
+# TEST CASE 13 — Background Path Searches Match The Grid They Finish On
+def test_path_workers():
+    threaded = Game(Window(1280, 720), None, "thread")
+    threaded.load_level("basic")
+    pathfinding = threaded.level.pathfinding
+    collision = threaded.level.collision
+
+    for _ in range(2000):
+        pathfinding.update()
+        if all(path.done for path in pathfinding.pool):
+            break
+        time.sleep(0.001)
+
+    assert all(path.done for path in pathfinding.pool), "Background workers should finish every path"
+    path = pathfinding.pool[0]
+    assert path.points[-1][0] < 0, "Background path should reach the left edge"
+
+    # blocking a used tile keeps the old route for walking enemies until a new one arrives
+    old_points = path.points
+    x, y = old_points[len(old_points) // 2]
+    collision.block_point(x, y)
+    assert path.stale and path.done and path.points is old_points, "Old route should be kept while searching"
+
+    for _ in range(2000):
+        pathfinding.update()
+        if not path.stale:
+            break
+        time.sleep(0.001)
+
+    assert not path.stale, "Replacement route should arrive"
+    assert not any(collision.point_blocked(px, py) for px, py in path.points), "New route should avoid the blocked tile"
+
+    # the goal field estimate finds a route as cheap as the plain search
+    blocked = frozenset(collision.blocked_tiles)
+    right = threaded.window.resolution[0]
+    plain = search_grid(blocked, { }, path.start, path.res, right)
+    guided = search_grid(blocked, { }, path.start, path.res, right, pathfinding.field.distances)
+    assert route_cost(guided) == route_cost(plain), "Goal field estimate should keep routes shortest"
+
+    # loading a level cancels the old level's searches and quitting stops the pools
+    for old_path in pathfinding.pool:
+        old_path.done = False
+    pathfinding.update()
+    threaded.load_level("basic")
+    assert all(old_path.job is None for old_path in pathfinding.pool), "Old level's searches should be dropped"
+
+    threaded.quit()
+    assert len(Executors) == 0, "Quitting should stop the background pools"
+
+    print("Test Case 13 Passed — Background Pathfinding Works")
+
+# TEST CASE 14 — Placement Map Agrees With The Placement Checks
+def test_placement_map():
+    placing = make_level("path")
+    placing.menu.hide()
+    placing.level.money = 100000
+    pathfinding = placing.level.pathfinding
+    collision = placing.level.collision
+
+    for _ in range(3000):
+        pathfinding.update()
+
+    placing.placement.refresh()
+
+    # these change the grid after the map was built so it has to patch itself
+    placing.select_defence(1)
+    placing.place_defence((640, 320))
+    placing.select_defence(0)
+    placing.place_defence((320, 160))
+    placing.undo_last_purchase()
+
+    for type, prototype in enumerate(placing.defence_prototypes):
+        for row in range(collision.height):
+            for column in range(collision.width):
+                x, y = column * 32, row * 32
+                expected = not collision.rect_blocked(x, y, prototype.rect.width - 2, prototype.rect.height - 2)
+                if prototype.block and pathfinding.is_critical((x, y)):
+                    expected = False
+
+                assert placing.placement.can_place(type, x, y) == expected, "Placement map should match the full checks"
+
+    placing.level.money = 0
+    assert not placing.placement.can_place(0, 0, 0), "Defences that cost too much cant be placed"
+
+    print("Test Case 14 Passed — Placement Map Works")
+
+# TEST CASE 15 — Debug Overlay Is Cached Until Something Changes
+def test_debug_overlay():
+    debug = make_level("basic")
+    debug.abilities.toggle_heat_overlay()
+    debug.draw()
+
+    overlay = debug.menu.debug_overlay
+    heat_surface = overlay.get_heat_surface()
+    blocked_surface = debug.level.collision.get_overlay()
+    debug.draw()
+    assert overlay.get_heat_surface() is heat_surface, "Heat layer should be reused when heat didnt change"
+    assert debug.level.collision.get_overlay() is blocked_surface, "Blocked layer should be reused when the grid didnt change"
+
+    # steps that keep a tile in the same bucket dont rebuild the heat layer
+    heat[(64, 64)] = 4
+    heat_surface = overlay.get_heat_surface()
+    heat[(64, 64)] += 3
+    assert overlay.get_heat_surface() is heat_surface, "Heat layer should be reused while buckets stay the same"
+
+    heat[(64, 64)] += 1
+    debug.level.collision.block_point(96, 96)
+    assert overlay.get_heat_surface() is not heat_surface, "Heat layer should be rebuilt after heat changes bucket"
+    assert debug.level.collision.get_overlay() is not blocked_surface, "Blocked layer should be rebuilt after the grid changes"
+    assert debug.level.collision.get_overlay().get_at((100, 100)).a > 0, "Blocked tile should be shaded"
+
+    print("Test Case 15 Passed — Debug Overlay Works")
+
+# TEST CASE 16 — Atlas Packing Keeps Sprites Pixel For Pixel
+def test_atlas_packing():
+    atlas = Atlas(True, page_size=128)
+    sprites = []
+    for size in [(40, 40), (24, 24), (60, 20), (40, 40), (64, 64)]:
+        sprite = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+        sprite.fill((200, 100, 50, 120))
+        sprite.set_at((0, 0), (10, 20, 30, 255))
+        sprites.append(sprite)
+
+    packed = atlas.pack_all(sprites)
+
+    for sprite, copy in zip(sprites, packed):
+        assert copy.get_parent() in atlas.pages, "Packed sprite should be part of a page"
+        assert copy.get_size() == sprite.get_size(), "Packed sprite should keep its size"
+        assert copy.get_at((0, 0)) == sprite.get_at((0, 0)), "Solid pixels should be copied exactly"
+        assert copy.get_at((5, 5)) == sprite.get_at((5, 5)), "See through pixels should be copied exactly"
+
+    assert len(atlas.pages) < len(sprites), "Sprites should share pages"
+    assert atlas.pack(pygame.Surface((100, 100))).get_parent() is None, "Sprites over half a page stay as they are"
+
+    # prefab images come from the shared atlas
+    prefab = Prefab.load_config("enemy_small")
+    assert prefab["image"].get_parent() in Prefab.Atlases[True].pages, "Prefab images should be packed"
+
+    print("Test Case 16 Passed — Texture Atlas Works")
+
+# TEST CASE 17 — Prefab Config Is Shared Between Objects Of One Type
+def test_prefab_config():
+    first = Enemy(game, "enemy_small", 0, 0)
+    second = Enemy(game, "enemy_small", 0, 0)
+
+    assert first.config is second.config, "Enemies of one type should share their config"
+    assert type(first) is Enemy, "Enemies should keep their own class"
+    assert first.display_name == first.config["display_name"], "Config values should be readable on the enemy"
+    assert first.image is second.image, "Config images should be shared, not copied"
+    assert not set(first.config) & set(vars(first)), "Shared config values should not be copied onto each enemy"
+    assert not set(game.defence_prototypes[0].config) & set(vars(game.defence_prototypes[0])), "Shared config values should not be copied onto each defence"
+
+    first.health = 1
+    assert second.health != 1, "Changing one enemy should not change another"
+    assert not first.block and first.anim_source is None, "Optional config values should have defaults"
+    assert game.defence_prototypes[0].targeting == "first", "Defences should have their own defaults"
+
+    first.kill()
+    second.kill()
+    print("Test Case 17 Passed — Prefab Config Is Shared")
+
+# TEST CASE 18 — Batched Collision Changes Repair Paths Once
+def test_collision_batch():
+    batched = make_level("basic")
+    pathfinding = batched.level.pathfinding
+    collision = batched.level.collision
+
+    for _ in range(3000):
+        pathfinding.update()
+
+    calls = []
+    repair_many = pathfinding.repair_many
+    pathfinding.repair_many = lambda points: (calls.append(list(points)), repair_many(points))
+
+    version = collision.version
+    point = pathfinding.pool[0].points[len(pathfinding.pool[0].points) // 2]
+    collision.block_rect(point[0], point[1], 64, 64)
+
+    assert len(calls) == 1 and len(calls[0]) == 4, "A 2x2 block should repair once with all four tiles"
+    assert collision.version == version + 1, "A batch should bump the version once"
+    assert len(collision.changes_since(version)) == 4, "Every tile in the batch should be in the change log"
+
+    for path in pathfinding.pool:
+        if path.done:
+            assert not any(collision.point_blocked(x, y) for x, y in path.points), "Repaired paths should avoid the new block"
+
+    with collision.batch():
+        collision.unblock_rect(point[0], point[1], 62, 62)
+        assert collision.version == version + 1, "Version should only change when the batch ends"
+    assert collision.version == version + 2, "Unblocking should finish as one change"
+
+    print("Test Case 18 Passed — Collision Batches Work")
+
+# TEST CASE 19 — Summed Area Table Matches Tile By Tile Checks
+def test_summed_area_table():
+    sat = make_level("maze")
+    collision = sat.level.collision
+    rng = random.Random(7)
+
+    def brute_count(x, y, width, height):
+        return sum(collision.point_blocked(xPos, yPos)
+                   for xPos in range(x - x % 32, x + width, 32)
+                   for yPos in range(y - y % 32, y + height, 32))
+
+    # tiles past the right and bottom edges are only found one by one
+    collision.block_point(1280 + 32, 64)
+    collision.block_point(64, 768)
+
+    for round in range(4):
+        # change a few tiles so the table has to catch up from the log
+        with collision.batch():
+            for i in range(6):
+                collision.block_point(rng.randint(0, 39) * 32, rng.randint(0, 23) * 32)
+        collision.unblock_point(rng.randint(0, 39) * 32, rng.randint(0, 23) * 32)
+
+        for i in range(300):
+            x, y = rng.randint(-64, 1300), rng.randint(-64, 790)
+            width, height = rng.randint(0, 200), rng.randint(0, 200)
+            assert collision.count_blocked(x, y, width, height) == brute_count(x, y, width, height), "Table count should match counting tile by tile"
+            assert collision.rect_blocked(x, y, width, height) == (brute_count(x, y, width, height) > 0), "Rect check should match"
+
+    assert (collision.get_table() == collision.build_table(collision.build_grid())).all(), "Patched table should match a fresh one"
+
+    print("Test Case 19 Passed — Summed Area Table Works")
+
+# TEST CASE 20 — Cached Adjacency Matches Working Neighbours Out Directly
+def test_adjacency():
+    adjacent = make_level("maze")
+    collision = adjacent.level.collision
+    adjacency = adjacent.level.pathfinding.adjacency
+
+    def check():
+        assert collision.get_rows() == collision.build_grid().tolist(), "Patched rows should match the grid"
+        for row in range(-1, collision.height + 1):
+            for column in range(-1, collision.width + 1):
+                point = (column * 32, row * 32)
+                expected = grid_neighbours(point, collision.point_blocked, 32, 1280)
+                assert adjacency.get_neighbours(point) == expected, "Cached neighbours should match"
+
+    check_random_blocks(collision, check, 8)
+
+    print("Test Case 20 Passed — Neighbour Adjacency Works")
+
+# TEST CASE 21 — Goal Distance Field Stays Exact As Tiles Change
+def test_goal_field():
+    fielded = make_level("maze")
+    collision = fielded.level.collision
+    pathfinding = fielded.level.pathfinding
+    field = pathfinding.field
+
+    def check():
+        fresh = GoalField(pathfinding.adjacency)
+        fresh.refresh()
+        assert field.get((0, 0)) >= 0 and field.distances == fresh.distances, "Patched distances should match a rebuild"
+
+        # the estimate is never more than the real cost of an uncrowded route
+        start = pathfinding.find_start()
+        points = search_grid(collision.blocked_tiles, { }, start, 32, 1280)
+        if points is not None:
+            assert field.get(start) <= route_cost(points), "Goal distance should never be too high"
+
+    check_random_blocks(collision, check, 9)
+
+    print("Test Case 21 Passed — Goal Distance Field Works")
+
+# TEST CASE 22 — Path Pool Is Made In One Pass With Usage Kept Per Path
+def test_path_pool():
+    pooled = make_level("basic")
+    pathfinding = pooled.level.pathfinding
+
+    assert len(pathfinding.pool) == pooled.level.settings["pool_size"], "Pool should match the level setting"
+    assert all(path.done for path in pathfinding.pool), "Whole pool should be made in one pass"
+
+    def check():
+        expected = { }
+        for path in pathfinding.get_all_paths():
+            if path.done and not path.stale:
+                for point in set(path.points):
+                    expected[point] = expected.get(point, 0) + 1
+        assert dict(pathfinding.get_usage()) == expected, "Usage counts should match the pool"
+
+    check()
+    used = [point for point in pathfinding.pool[0].points if 0 <= point[0] < 1280]
+    blocked = next(point for point in used if not pathfinding.is_critical(point))
+    pooled.level.collision.block_point(*blocked)
+    check()
+
+    # counts follow single paths finishing, restarting and being dropped from the cache
+    pathfinding.partials.limit = 1
+    near = {(x + dx, y + dy) for path in pathfinding.pool for x, y in path.points for dx in (-32, 0, 32) for dy in (-32, 0, 32)}
+    free = [(x * 32, y * 32) for x in range(40) for y in range(24) if not pooled.level.collision.point_blocked(x * 32, y * 32) and (x * 32, y * 32) not in near]
+    partial, target = pathfinding.get_partial_path(free[0])
+    partial.search(None)
+    check()
+    pathfinding.get_partial_path(free[-1])
+    assert pathfinding.partials.evictions == 1, "First partial path should be dropped"
+    check()
+    pathfinding.pool[1].start_search()
+    check()
+    pathfinding.pool[1].search(None)
+    check()
+
+    overlap = pathfinding.get_overlap()
+    assert 0 <= overlap < 1, "Overlap should be a ratio"
+
+    pathfinding.pool = []
+    pathfinding.pool_changed()
+    pathfinding.precompute(5)
+    assert all(path.done for path in pathfinding.pool) and pathfinding.get_overlap() <= overlap, "Fewer paths should overlap less"
+
+    print("Test Case 22 Passed — Path Pool Works")
+
+# TEST CASE 23 — Partial Paths Are Shared And Dropped When Unused
+def test_partial_cache():
+    cached = make_level("basic")
+    pathfinding = cached.level.pathfinding
+    collision = cached.level.collision
+    partials = pathfinding.partials
+    partials.limit = 3
+
+    # tiles spread out and off every full path so each needs its own partial path
+    used = {point for path in pathfinding.pool for point in path.points}
+    near = {(x + dx, y + dy) for x, y in used for dx in (-32, 0, 32) for dy in (-32, 0, 32)}
+    free = [(x * 32, y * 32) for x in range(0, 40, 2) for y in range(0, 24, 2) if not collision.point_blocked(x * 32, y * 32) and (x * 32, y * 32) not in near]
+
+    first, target = pathfinding.get_partial_path(free[0])
+    enemy = Enemy(cached, "enemy_small", 0, 0, first)
+    cached.wave.enemies.add(enemy)
+    again, target = pathfinding.get_partial_path(free[0])
+    assert again is first and partials.hits == 1, "Same start should reuse the cached path"
+
+    for point in free[1:]:
+        pathfinding.get_partial_path(point)
+
+    assert partials.misses > 4 and len(partials) <= 3 and partials.evictions > 0, "Cache should stay within its limit"
+    assert partials.get(free[0]) is first, "Paths enemies are on should not be dropped"
+    assert all(path.start[0] >= 1280 for path in pathfinding.pool), "Partial paths should stay out of the pool"
+
+    enemy.kill()
+    assert first.load == 0, "Killing the enemy should release the path"
+
+    print("Test Case 23 Passed — Partial Path Cache Works")
+
+# TEST CASE 24 — Spawns Pick From The Ready Paths And Wait For One
+def test_ready_paths():
+    readied = make_level("basic")
+    pathfinding = readied.level.pathfinding
+
+    ready = pathfinding.get_ready()
+    assert len(ready) == len(pathfinding.pool) and pathfinding.is_ready(), "Every pooled path should be ready"
+
+    for i, path in enumerate(ready):
+        path.load = 1 if i > 0 else 0
+    assert pathfinding.get_path() is ready[0], "Least loaded path should be picked"
+    for path in ready:
+        path.load = 0
+
+    for path in pathfinding.pool:
+        path.start_search()
+    assert not pathfinding.is_ready(), "Restarted paths shouldnt be ready"
+
+    wave = Wave(readied, 1)
+    readied.wave = wave
+    wave.update(5)
+    assert wave.time == 0 and len(wave.enemies) == 0, "Wave should wait for a ready path"
+
+    while not pathfinding.pool[0].done:
+        pathfinding.update()
+    assert pathfinding.get_ready() == [pathfinding.pool[0]], "A finished path should be ready straight away"
+    wave.update(5)
+    assert wave.time == 5 and len(wave.enemies) > 0, "Wave should spawn once a path is ready"
+    assert all(enemy.path.start[0] >= 1280 for enemy in wave.enemies), "Enemies should spawn on full paths"
+
+    # paths finishing out of order still leave the list in pool order without a rescan
+    ready = pathfinding.get_ready()
+    for path in reversed(pathfinding.pool):
+        path.search(None)
+    assert pathfinding.get_ready() is ready and ready == pathfinding.pool, "Ready list should be kept in pool order"
+
+    print("Test Case 24 Passed — Ready Paths Work")
+
+# TEST CASE 25 — Enemies Walk Straight Between Path Corners
+def test_waypoints():
+    pulled = make_level("maze")
+    collision = pulled.level.collision
+    path = pulled.level.pathfinding.get_ready()[0]
+
+    # walking the waypoints from the start reaches the goal in fewer steps
+    waypoints = [path.start]
+    while path.next(waypoints[-1]):
+        waypoints.append(path.next(waypoints[-1]))
+    assert waypoints[-1] == path.points[-1] and len(waypoints) < len(path.points), "Waypoints should skip straight parts"
+    assert all(collision.line_clear(a, b) for a, b in zip(waypoints, waypoints[1:])), "Every straight line should be clear"
+
+    # any tile on the path leads to the next corner
+    middle = path.points[len(path.points) // 2]
+    assert path.next(middle) in waypoints and path.points.index(path.next(middle)) > path.points.index(middle), "Tiles should lead to the next corner"
+
+    # a diagonal slide touches the tiles beside it like a diagonal step does
+    start = next((x, y) for x in range(64, 1216, 32) for y in range(64, 704, 32) if not collision.rect_blocked(x, y, 64, 64))
+    assert collision.line_clear(start, (start[0] + 32, start[1] + 32)), "Clear slide should pass"
+    collision.block_point(start[0] + 32, start[1])
+    assert not collision.line_clear(start, (start[0] + 32, start[1] + 32)), "Slide past a blocked corner shouldnt pass"
+    collision.unblock_point(start[0] + 32, start[1])
+
+    print("Test Case 25 Passed — Waypoint Compression Works")
+
+# TEST CASE 26 — Hierarchical Search Finds Near Optimal Routes And Patches Locally
+def test_hierarchy():
+    layered = make_level("maze", "hierarchical")
+    collision = layered.level.collision
+    pathfinding = layered.level.pathfinding
+    hierarchy = pathfinding.hierarchy
+
+    assert all(path.done for path in pathfinding.pool), "Hierarchical pool should be made straight away"
+    for path in pathfinding.pool:
+        assert path.points[-1][0] < 0, "Path should reach the goal"
+        assert all(b in pathfinding.adjacency.get_neighbours(a) for a, b in zip(path.points, path.points[1:])), "Every step should be a legal move"
+
+    # without crowding the route is close to the cheapest one
+    start = pathfinding.pool[0].start
+    points = hierarchy.find_path(start)
+    cost = route_cost(points)
+    assert pathfinding.field is None, "Hierarchical search shouldnt build the goal field"
+    best = GoalField(pathfinding.adjacency).get(start)
+    assert best <= cost <= best * 1.5, "Route should be near optimal"
+
+    # a changed tile only rebuilds the clusters around it and matches a rebuild
+    point = next(point for point in points[5:] if 0 <= point[0] < 1280 and not pathfinding.is_critical(point))
+    collision.block_point(*point)
+    hierarchy.refresh()
+    assert 1 <= hierarchy.invalidated <= 5, "Only nearby clusters should be dropped"
+
+    fresh = Hierarchy(collision)
+    fresh.refresh()
+    clusters = [(i, j) for i in range(fresh.columns_count) for j in range(fresh.rows_count)]
+    assert fresh.borders == hierarchy.borders, "Patched crossings should match a rebuild"
+    assert all(fresh.get_edges(cluster) == hierarchy.get_edges(cluster) for cluster in clusters), "Patched costs should match a rebuild"
+    assert point not in hierarchy.find_path(start), "Route should avoid the new block"
+
+    print("Test Case 26 Passed — Hierarchical Pathfinding Works")
+
+# TEST CASE 27 — Jump Point Search Skips Open Floor And Stays Cheapest
+def test_jump_point_search():
+    jumping = make_level("maze", "jps")
+    pathfinding = jumping.level.pathfinding
+
+    while not all(path.done for path in pathfinding.pool):
+        for path in pathfinding.pool:
+            path.search()
+
+    for path in pathfinding.pool:
+        assert path.points[-1][0] < 0, "Path should reach the goal"
+        assert all(b in pathfinding.adjacency.get_neighbours(a) for a, b in zip(path.points, path.points[1:])), "Jumps should be filled back in one step at a time"
+
+    # with nothing crowded the open floor is jumped over and the route is still the cheapest
+    path = pathfinding.pool[0]
+    pathfinding.pool = [path]
+    pathfinding.partials.paths.clear()
+    pathfinding.pool_changed()
+    path.start_search()
+    path.search(None)
+    assert route_cost(path.points) == pathfinding.field.get(path.start), "Route should be the cheapest one"
+    assert len(path.closed_set) < len(path.points) // 2, "Open floor should be jumped over"
+
+    print("Test Case 27 Passed — Jump Point Search Works")
+
+# TEST CASE 28 — Abilities Never Seal A Choke Point
+def test_ability_choke_point():
+    spiked = make_level("path")
+    collision = spiked.level.collision
+    pathfinding = spiked.level.pathfinding
+    pathfinding.precompute(len(pathfinding.pool))
+
+    # the column with the fewest open tiles, narrower than the number of spikes
+    grid = collision.get_grid()
+    column = min(range(collision.width), key=lambda c: (~grid[:, c]).sum())
+    gap = [(column * collision.tile_size, row * collision.tile_size) for row in range(collision.height) if not grid[row, column]]
+    assert len(gap) < spiked.abilities.spike_count, "Level should have a choke point narrower than the spikes"
+
+    heat.clear()
+    for point in gap:
+        heat[point] = 100
+
+    assert spiked.abilities.use("crystal_spike"), "Ability should be used"
+    assert len(spiked.abilities.active[-1]["tiles"]) == len(gap) - 1, "Every tile but one in the gap should get a spike"
+
+    for _ in range(3000):
+        if pathfinding.is_ready():
+            break
+        pathfinding.update()
+    assert pathfinding.is_ready(), "Enemies should still have a route"
+
+    heat.clear()
+    print("Test Case 28 Passed — Abilities Keep A Route Open")
+
+# TEST CASE 29 — Closest Targeting Follows The Route
+def test_closest_targeting():
+    winding = make_level("basic")
+    path = winding.level.pathfinding.pool[0]
+
+    # a route that doubles back on itself: left, down, right, down, then left to the goal
+    def leg(start, end):
+        dx, dy = (end[0] > start[0]) - (end[0] < start[0]), (end[1] > start[1]) - (end[1] < start[1])
+        steps = max(abs(end[0] - start[0]), abs(end[1] - start[1])) // 32
+        return [(start[0] + dx * 32 * step, start[1] + dy * 32 * step) for step in range(steps)]
+
+    corners = [(640, 64), (320, 64), (320, 320), (960, 320), (960, 576), (-32, 576)]
+    path.points = [point for a, b in zip(corners, corners[1:]) for point in leg(a, b)] + [corners[-1]]
+    path.corners = None
+    path.done = True
+
+    # an enemy with less of its route left but further from the left edge
+    near = (path, path.points.index((896, 576)), (896, 576))
+    far = (path, 0, (640, 64))
+    enemies = []
+    for path, index, point in (near, far):
+        enemy = Enemy(winding, "enemy_small", 0, 0, path)
+        enemy.target = point
+        enemy.x, enemy.y = point
+        enemies.append(enemy)
+
+    winding.targeting.build(enemies)
+    keys = winding.targeting.keys("closest")
+    assert keys[0] < keys[1], "Enemy with less of its route left should be the closest"
+
+    print("Test Case 29 Passed — Closest Targeting Follows The Route")
 
-test_pathfinding_performance()
-test_targeting_performance()
-test_stack_performance()
+# RUN ALL TESTS
+if __name__ == "__main__":
+    print("\n       RUNNING AUTOMATED TEST CASES     \n")
+
+    test_pathfinding_basic()
+    test_collision_block_unblock()
+    test_defence_targeting()
+    test_pathfinding_repair()
+    test_undo_stack()
+    test_wave_plan()
+    test_batch_spawn()
+    test_bullet_no_tunnelling()
+    test_explosion_batching()
+    test_replay_determinism()
+    test_snapshot_roundtrip()
+    test_time_scale()
+    test_path_workers()
+    test_placement_map()
+    test_debug_overlay()
+    test_atlas_packing()
+    test_prefab_config()
+    test_collision_batch()
+    test_summed_area_table()
+    test_adjacency()
+    test_goal_field()
+    test_path_pool()
+    test_partial_cache()
+    test_ready_paths()
+    test_waypoints()
+    test_hierarchy()
+    test_jump_point_search()
+    test_ability_choke_point()
+    test_closest_targeting()
+
+    print("\n     ALL TEST CASES PASSED SUCCESSFULLY \n")